@@ -0,0 +1,29 @@
+"""add data_versions table for the ETag versions
+
+Revision ID: b9c0d1e2f3a
+Revises: z7a8b9c0d1e
+Create Date: 2025-03-03 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b9c0d1e2f3a'
+down_revision = 'z7a8b9c0d1e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('data_versions',
+        sa.Column('resource', sa.String(length=50), nullable=False),
+        sa.Column('scope', sa.String(length=255), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('resource', 'scope')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('data_versions')
@@ -0,0 +1,25 @@
+"""add next_attempt_at and claimed_at to ml_notifications
+
+Revision ID: c0d1e2f3a4b
+Revises: b9c0d1e2f3a
+Create Date: 2025-03-04 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c0d1e2f3a4b'
+down_revision = 'b9c0d1e2f3a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('ml_notifications', sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+    op.add_column('ml_notifications', sa.Column('claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('ml_notifications', 'claimed_at')
+    op.drop_column('ml_notifications', 'next_attempt_at')
@@ -0,0 +1,24 @@
+"""add ml_removed_at to mercado_livre_announcements
+
+Revision ID: p7q8r9s0t1u
+Revises: o6p7q8r9s0t
+Create Date: 2025-02-03 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'p7q8r9s0t1u'
+down_revision = 'o6p7q8r9s0t'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Anúncios que não aparecem mais na listagem do vendedor são marcados, não excluídos
+    op.add_column('mercado_livre_announcements', sa.Column('ml_removed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('mercado_livre_announcements', 'ml_removed_at')
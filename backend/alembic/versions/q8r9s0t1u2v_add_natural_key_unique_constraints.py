@@ -0,0 +1,46 @@
+"""add natural key unique constraints for bulk upserts
+
+Revision ID: q8r9s0t1u2v
+Revises: p7q8r9s0t1u
+Create Date: 2025-02-05 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'q8r9s0t1u2v'
+down_revision = 'p7q8r9s0t1u'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Remove duplicados mantendo o registro mais recente antes de criar as constraints
+    op.execute("""
+        DELETE FROM mercado_livre_orders a
+        USING mercado_livre_orders b
+        WHERE a.company_id = b.company_id
+          AND a.order_id = b.order_id
+          AND a.id < b.id
+    """)
+    op.execute("""
+        DELETE FROM product_ads_data a
+        USING product_ads_data b
+        WHERE a.company_id = b.company_id
+          AND a.item_id = b.item_id
+          AND a.period_days IS NOT DISTINCT FROM b.period_days
+          AND a.id < b.id
+    """)
+
+    op.create_unique_constraint(
+        'uq_ml_orders_company_order', 'mercado_livre_orders', ['company_id', 'order_id']
+    )
+    op.create_unique_constraint(
+        'uq_product_ads_company_item_period', 'product_ads_data', ['company_id', 'item_id', 'period_days']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_product_ads_company_item_period', 'product_ads_data', type_='unique')
+    op.drop_constraint('uq_ml_orders_company_order', 'mercado_livre_orders', type_='unique')
@@ -0,0 +1,43 @@
+"""add sync_jobs table
+
+Revision ID: r9s0t1u2v3w
+Revises: q8r9s0t1u2v
+Create Date: 2025-02-07 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'r9s0t1u2v3w'
+down_revision = 'q8r9s0t1u2v'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('sync_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('company_id', sa.Integer(), nullable=False),
+        sa.Column('job_type', sa.String(length=50), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('params', sa.JSON(), nullable=True),
+        sa.Column('progress_current', sa.Integer(), nullable=True),
+        sa.Column('progress_total', sa.Integer(), nullable=True),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sync_jobs_id'), 'sync_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_sync_jobs_company_id'), 'sync_jobs', ['company_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_sync_jobs_company_id'), table_name='sync_jobs')
+    op.drop_index(op.f('ix_sync_jobs_id'), table_name='sync_jobs')
+    op.drop_table('sync_jobs')
@@ -0,0 +1,41 @@
+"""add sync_checkpoints table
+
+Revision ID: s0t1u2v3w4x
+Revises: r9s0t1u2v3w
+Create Date: 2025-02-10 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 's0t1u2v3w4x'
+down_revision = 'r9s0t1u2v3w'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('sync_checkpoints',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('company_id', sa.Integer(), nullable=False),
+        sa.Column('resource', sa.String(length=50), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('cursor', sa.JSON(), nullable=True),
+        sa.Column('last_processed_id', sa.String(length=255), nullable=True),
+        sa.Column('processed_count', sa.Integer(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('company_id', 'resource', name='uq_sync_checkpoints_company_resource')
+    )
+    op.create_index(op.f('ix_sync_checkpoints_id'), 'sync_checkpoints', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_sync_checkpoints_id'), table_name='sync_checkpoints')
+    op.drop_table('sync_checkpoints')
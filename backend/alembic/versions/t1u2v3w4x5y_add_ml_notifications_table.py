@@ -0,0 +1,46 @@
+"""add ml_notifications table
+
+Revision ID: t1u2v3w4x5y
+Revises: s0t1u2v3w4x
+Create Date: 2025-02-12 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 't1u2v3w4x5y'
+down_revision = 's0t1u2v3w4x'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('ml_notifications',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('notification_id', sa.String(length=100), nullable=True),
+        sa.Column('topic', sa.String(length=50), nullable=False),
+        sa.Column('resource', sa.String(length=255), nullable=False),
+        sa.Column('ml_user_id', sa.String(length=255), nullable=False),
+        sa.Column('application_id', sa.String(length=50), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('sent', sa.DateTime(), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('processing_attempts', sa.Integer(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('received_at', sa.DateTime(), nullable=True),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('resource', 'sent', name='uq_ml_notifications_resource_sent')
+    )
+    op.create_index(op.f('ix_ml_notifications_id'), 'ml_notifications', ['id'], unique=False)
+    op.create_index(op.f('ix_ml_notifications_ml_user_id'), 'ml_notifications', ['ml_user_id'], unique=False)
+    op.create_index(op.f('ix_ml_notifications_status'), 'ml_notifications', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_ml_notifications_status'), table_name='ml_notifications')
+    op.drop_index(op.f('ix_ml_notifications_ml_user_id'), table_name='ml_notifications')
+    op.drop_index(op.f('ix_ml_notifications_id'), table_name='ml_notifications')
+    op.drop_table('ml_notifications')
@@ -0,0 +1,23 @@
+"""add high_water_mark to sync_checkpoints
+
+Revision ID: u2v3w4x5y6z
+Revises: t1u2v3w4x5y
+Create Date: 2025-02-13 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'u2v3w4x5y6z'
+down_revision = 't1u2v3w4x5y'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('sync_checkpoints', sa.Column('high_water_mark', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('sync_checkpoints', 'high_water_mark')
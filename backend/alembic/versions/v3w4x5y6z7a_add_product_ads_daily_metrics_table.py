@@ -0,0 +1,50 @@
+"""add product_ads_daily_metrics table
+
+Revision ID: v3w4x5y6z7a
+Revises: u2v3w4x5y6z
+Create Date: 2025-02-14 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'v3w4x5y6z7a'
+down_revision = 'u2v3w4x5y6z'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('product_ads_daily_metrics',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('company_id', sa.Integer(), nullable=False),
+        sa.Column('item_id', sa.String(length=255), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('clicks', sa.Integer(), nullable=True),
+        sa.Column('prints', sa.Integer(), nullable=True),
+        sa.Column('cost', sa.Numeric(precision=12, scale=2), nullable=True),
+        sa.Column('direct_items_quantity', sa.Integer(), nullable=True),
+        sa.Column('indirect_items_quantity', sa.Integer(), nullable=True),
+        sa.Column('advertising_items_quantity', sa.Integer(), nullable=True),
+        sa.Column('direct_units_quantity', sa.Integer(), nullable=True),
+        sa.Column('indirect_units_quantity', sa.Integer(), nullable=True),
+        sa.Column('units_quantity', sa.Integer(), nullable=True),
+        sa.Column('direct_amount', sa.Numeric(precision=12, scale=2), nullable=True),
+        sa.Column('indirect_amount', sa.Numeric(precision=12, scale=2), nullable=True),
+        sa.Column('total_amount', sa.Numeric(precision=12, scale=2), nullable=True),
+        sa.Column('organic_units_quantity', sa.Integer(), nullable=True),
+        sa.Column('organic_units_amount', sa.Numeric(precision=12, scale=2), nullable=True),
+        sa.Column('organic_items_quantity', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('company_id', 'item_id', 'date', name='uq_product_ads_daily_company_item_date')
+    )
+    op.create_index(op.f('ix_product_ads_daily_metrics_id'), 'product_ads_daily_metrics', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_product_ads_daily_metrics_id'), table_name='product_ads_daily_metrics')
+    op.drop_table('product_ads_daily_metrics')
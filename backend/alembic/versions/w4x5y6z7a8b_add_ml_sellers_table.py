@@ -0,0 +1,39 @@
+"""add ml_sellers table
+
+Revision ID: w4x5y6z7a8b
+Revises: v3w4x5y6z7a
+Create Date: 2025-02-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'w4x5y6z7a8b'
+down_revision = 'v3w4x5y6z7a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('ml_sellers',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('seller_id', sa.String(length=50), nullable=False),
+        sa.Column('nickname', sa.String(length=255), nullable=True),
+        sa.Column('reputation_level', sa.String(length=50), nullable=True),
+        sa.Column('power_status', sa.String(length=50), nullable=True),
+        sa.Column('transactions_total', sa.Integer(), nullable=True),
+        sa.Column('transactions', sa.JSON(), nullable=True),
+        sa.Column('fetched_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ml_sellers_id'), 'ml_sellers', ['id'], unique=False)
+    op.create_index(op.f('ix_ml_sellers_seller_id'), 'ml_sellers', ['seller_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_ml_sellers_seller_id'), table_name='ml_sellers')
+    op.drop_index(op.f('ix_ml_sellers_id'), table_name='ml_sellers')
+    op.drop_table('ml_sellers')
@@ -0,0 +1,43 @@
+"""add catalog_refresh_states table
+
+Revision ID: x5y6z7a8b9c
+Revises: w4x5y6z7a8b
+Create Date: 2025-02-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'x5y6z7a8b9c'
+down_revision = 'w4x5y6z7a8b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('catalog_refresh_states',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('company_id', sa.Integer(), nullable=False),
+        sa.Column('catalog_product_id', sa.String(length=255), nullable=False),
+        sa.Column('buy_box_item_id', sa.String(length=255), nullable=True),
+        sa.Column('buy_box_price', sa.Numeric(precision=12, scale=2), nullable=True),
+        sa.Column('refresh_interval', sa.Integer(), nullable=False),
+        sa.Column('change_count', sa.Integer(), nullable=True),
+        sa.Column('last_refreshed_at', sa.DateTime(), nullable=True),
+        sa.Column('last_changed_at', sa.DateTime(), nullable=True),
+        sa.Column('next_refresh_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('company_id', 'catalog_product_id', name='uq_catalog_refresh_company_product')
+    )
+    op.create_index(op.f('ix_catalog_refresh_states_id'), 'catalog_refresh_states', ['id'], unique=False)
+    op.create_index(op.f('ix_catalog_refresh_states_next_refresh_at'), 'catalog_refresh_states', ['next_refresh_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_catalog_refresh_states_next_refresh_at'), table_name='catalog_refresh_states')
+    op.drop_index(op.f('ix_catalog_refresh_states_id'), table_name='catalog_refresh_states')
+    op.drop_table('catalog_refresh_states')
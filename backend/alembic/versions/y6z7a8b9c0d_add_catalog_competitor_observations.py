@@ -0,0 +1,36 @@
+"""add catalog_competitor_observations table
+
+Revision ID: y6z7a8b9c0d
+Revises: x5y6z7a8b9c
+Create Date: 2025-02-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'y6z7a8b9c0d'
+down_revision = 'x5y6z7a8b9c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('catalog_competitor_observations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('catalog_product_id', sa.String(length=255), nullable=False),
+        sa.Column('item_id', sa.String(length=255), nullable=False),
+        sa.Column('observed_at', sa.DateTime(), nullable=False),
+        sa.Column('price', sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.Column('original_price', sa.Numeric(precision=12, scale=2), nullable=True),
+        sa.Column('available_quantity', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_catalog_competitor_observations_product_observed', 'catalog_competitor_observations', ['catalog_product_id', 'observed_at'], unique=False)
+    op.create_index('ix_catalog_competitor_observations_item_observed', 'catalog_competitor_observations', ['item_id', 'observed_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_catalog_competitor_observations_item_observed', table_name='catalog_competitor_observations')
+    op.drop_index('ix_catalog_competitor_observations_product_observed', table_name='catalog_competitor_observations')
+    op.drop_table('catalog_competitor_observations')
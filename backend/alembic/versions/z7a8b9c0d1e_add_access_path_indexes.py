@@ -0,0 +1,57 @@
+"""add composite indexes matching the router access paths
+
+Revision ID: z7a8b9c0d1e
+Revises: y6z7a8b9c0d
+Create Date: 2025-02-20 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'z7a8b9c0d1e'
+down_revision = 'y6z7a8b9c0d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY não bloqueia escritas, mas não pode rodar dentro de transação
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_ml_announcements_company_item', 'mercado_livre_announcements',
+            ['company_id', 'ml_item_id'], unique=True, postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_ml_orders_company_date_status', 'mercado_livre_orders',
+            ['company_id', 'date_created', 'status'], unique=False, postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_catalog_competitors_product_price', 'catalog_competitors',
+            ['catalog_product_id', 'price'], unique=False, postgresql_concurrently=True
+        )
+        # Coberto pelo prefixo de ix_catalog_competitors_product_price
+        op.drop_index(
+            'ix_catalog_competitors_catalog_product_id', table_name='catalog_competitors',
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_catalog_competitors_catalog_product_id', 'catalog_competitors',
+            ['catalog_product_id'], unique=False, postgresql_concurrently=True
+        )
+        op.drop_index(
+            'ix_catalog_competitors_product_price', table_name='catalog_competitors',
+            postgresql_concurrently=True
+        )
+        op.drop_index(
+            'ix_ml_orders_company_date_status', table_name='mercado_livre_orders',
+            postgresql_concurrently=True
+        )
+        op.drop_index(
+            'ix_ml_announcements_company_item', table_name='mercado_livre_announcements',
+            postgresql_concurrently=True
+        )
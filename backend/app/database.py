@@ -1,6 +1,12 @@
+import asyncio
+from contextlib import asynccontextmanager
 from sqlalchemy import create_engine
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
 import os
 from dotenv import load_dotenv
 
@@ -8,10 +14,19 @@ load_dotenv()
 
 # Database URL from environment variable
 DATABASE_URL = os.getenv(
-    "DATABASE_URL", 
+    "DATABASE_URL",
     "postgresql://user:password@db:5432/marketplace_db"
 )
 
+# Driver assíncrono (asyncpg) usado pelos routers; por padrão deriva de DATABASE_URL
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or DATABASE_URL.replace(
+    "postgresql://", "postgresql+asyncpg://", 1
+).replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+
+# asyncpg: sessões assíncronas nativas. threadpool: modo de transição em que as
+# mesmas chamadas usam a Session síncrona, executada no threadpool
+DB_ASYNC_MODE = os.getenv("DB_ASYNC_MODE", "asyncpg").lower()
+
 engine = create_engine(
     DATABASE_URL,
     pool_size=5,
@@ -23,6 +38,130 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+_async_engine: Optional[AsyncEngine] = None
+_async_session_factory: Optional[async_sessionmaker] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """Cria o engine assíncrono no primeiro uso (scripts e Alembic não dependem do asyncpg)."""
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            pool_size=5,
+            max_overflow=10,
+            pool_pre_ping=True,
+            pool_recycle=3600
+        )
+    return _async_engine
+
+
+def get_async_session_factory() -> async_sessionmaker:
+    global _async_session_factory
+    if _async_session_factory is None:
+        # expire_on_commit=False: atributos lidos após o commit não disparam I/O implícito
+        _async_session_factory = async_sessionmaker(
+            get_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _async_session_factory
+
+
+async def dispose_async_engine() -> None:
+    """Fecha o pool assíncrono (chamado no encerramento da aplicação)."""
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _async_session_factory = None
+
+
+class ThreadpoolSession:
+    """Interface assíncrona mínima sobre a Session síncrona (DB_ASYNC_MODE=threadpool).
+
+    Cada chamada roda no threadpool, então o event loop não fica bloqueado
+    mesmo sem o asyncpg. Os resultados são carregados na thread antes de voltar.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    async def execute(self, statement, *args, **kwargs):
+        def execute():
+            result = self.sync_session.execute(statement, *args, **kwargs)
+            # Comandos sem linhas (ex.: INSERT sem RETURNING) não têm o que carregar
+            if isinstance(result, CursorResult) and not result.returns_rows:
+                return result
+            return result.freeze()()
+        return await run_in_threadpool(execute)
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, *args, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def stream_scalars(self, statement, *args, **kwargs):
+        result = await run_in_threadpool(self.sync_session.scalars, statement, *args, **kwargs)
+        return ThreadpoolScalarResult(result)
+
+    def add(self, instance) -> None:
+        self.sync_session.add(instance)
+
+    async def flush(self) -> None:
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instance, *args, **kwargs) -> None:
+        await run_in_threadpool(self.sync_session.refresh, instance, *args, **kwargs)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
+
+
+class ThreadpoolScalarResult:
+    """Resultado em streaming da ThreadpoolSession (equivalente ao AsyncScalarResult)."""
+
+    def __init__(self, result):
+        self.result = result
+
+    async def partitions(self, size: Optional[int] = None):
+        partitions = self.result.partitions(size)
+        while True:
+            batch = await run_in_threadpool(next, partitions, None)
+            if batch is None:
+                return
+            yield batch
+
+
+async def run_in_session(db, fn, *args, **kwargs):
+    """Executa ``fn(*args, **kwargs)``, que usa a Session síncrona ``db``, no threadpool.
+
+    Usado pelos serviços que ainda recebem a Session síncrona (sincronizações,
+    jobs, workers) para não bloquear o event loop. As chamadas da mesma sessão
+    são serializadas, pois a Session não pode ser usada por duas threads ao
+    mesmo tempo (ex.: janelas de pedidos processadas em paralelo).
+    """
+    lock = db.info.get("threadpool_lock")
+    if lock is None:
+        lock = db.info["threadpool_lock"] = asyncio.Lock()
+    async with lock:
+        call = asyncio.ensure_future(run_in_threadpool(fn, *args, **kwargs))
+        try:
+            return await asyncio.shield(call)
+        except asyncio.CancelledError:
+            # A thread não é interrompida: a sessão só é liberada quando ela terminar
+            await asyncio.gather(call, return_exceptions=True)
+            raise
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -30,3 +169,25 @@ def get_db():
     finally:
         db.close()
 
+
+@asynccontextmanager
+async def open_async_session():
+    """Abre uma sessão assíncrona (AsyncSession ou ThreadpoolSession, conforme DB_ASYNC_MODE).
+
+    Usada diretamente quando a sessão precisa viver além do endpoint, como nas
+    respostas em streaming.
+    """
+    if DB_ASYNC_MODE == "threadpool":
+        db = ThreadpoolSession(SessionLocal(expire_on_commit=False))
+    else:
+        db = get_async_session_factory()()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def get_async_db():
+    """Dependência do FastAPI que fornece uma sessão assíncrona (AsyncSession ou ThreadpoolSession)."""
+    async with open_async_session() as db:
+        yield db
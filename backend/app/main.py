@@ -1,16 +1,42 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, users, mercado_livre, products
-from app.database import engine, Base
-from app.models import User, Company, MercadoLivreIntegration, CatalogCompetitor, ProductAdsData, MercadoLivreOrder  # Import models to ensure they're registered
+from app.routers import auth, users, mercado_livre, products, jobs
+from app.database import engine, Base, dispose_async_engine
+from app.services.http_client import start_http_client, close_http_client
+from app.services.catalog_sync import catalog_sync_service
+from app.services.job_runner import job_runner
+from app.services.notifications import notification_service
+from app.models import User, Company, MercadoLivreIntegration, CatalogCompetitor, ProductAdsData, MercadoLivreOrder, SyncJob, SyncCheckpoint, MercadoLivreNotification, ProductAdsDailyMetric, MercadoLivreSeller, CatalogRefreshState, CatalogCompetitorObservation  # Import models to ensure they're registered
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Cliente HTTP compartilhado (pool de conexões com o Mercado Livre)
+    await start_http_client()
+    # Jobs que estavam ativos antes de uma reinicialização não serão retomados
+    job_runner.recover_interrupted_jobs()
+    # Worker que aplica as notificações (webhooks) do Mercado Livre
+    notification_service.start()
+    # Atualização automática dos concorrentes de catálogo (ML_CATALOG_REFRESH_ENABLED)
+    catalog_sync_service.start()
+    yield
+    await catalog_sync_service.stop()
+    await notification_service.stop()
+    await job_runner.shutdown()
+    await close_http_client()
+    await dispose_async_engine()
+
 app = FastAPI(
     title="Gestão Marketplace API",
     description="API para sistema de gestão de marketplace",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # orjson serializa as respostas bem mais rápido que o json da biblioteca padrão
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -30,6 +56,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 # Include routers
@@ -37,6 +64,7 @@ app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
 app.include_router(mercado_livre.router, prefix="/api/mercado-livre", tags=["Mercado Livre Integration"])
 app.include_router(products.router, prefix="/api/mercado-livre", tags=["Products Management"])
+app.include_router(jobs.router, prefix="/api/mercado-livre", tags=["Sync Jobs"])
 
 @app.get("/")
 async def root():
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Numeric, JSON
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Text, Numeric, JSON, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -106,6 +106,9 @@ class MercadoLivreIntegration(Base):
 # Tabela para armazenar anúncios do Mercado Livre
 class MercadoLivreAnnouncement(Base):
     __tablename__ = "mercado_livre_announcements"
+    __table_args__ = (
+        Index("ix_ml_announcements_company_item", "company_id", "ml_item_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
@@ -177,6 +180,7 @@ class MercadoLivreAnnouncement(Base):
     # Timestamps
     ml_date_created = Column(DateTime, nullable=True)  # Data de criação no ML
     ml_last_updated = Column(DateTime, nullable=True)  # Data de atualização no ML
+    ml_removed_at = Column(DateTime, nullable=True)  # Quando deixou de ser retornado pelo ML
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -185,10 +189,13 @@ class MercadoLivreAnnouncement(Base):
 
 class CatalogCompetitor(Base):
     __tablename__ = "catalog_competitors"
+    __table_args__ = (
+        Index("ix_catalog_competitors_product_price", "catalog_product_id", "price"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
-    catalog_product_id = Column(String(255), nullable=False, index=True)  # Ex: MLB32810672
+    catalog_product_id = Column(String(255), nullable=False)  # Ex: MLB32810672
     
     # Dados do anúncio concorrente
     item_id = Column(String(255), nullable=False, unique=True, index=True)
@@ -232,6 +239,9 @@ class CatalogCompetitor(Base):
 # Tabela para armazenar dados de publicidade (Product Ads)
 class ProductAdsData(Base):
     __tablename__ = "product_ads_data"
+    __table_args__ = (
+        UniqueConstraint("company_id", "item_id", "period_days", name="uq_product_ads_company_item_period"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
@@ -333,8 +343,46 @@ class ProductAdsData(Base):
     company = relationship("Company")
 
 
+# Métricas diárias de publicidade (Product Ads) por anúncio
+class ProductAdsDailyMetric(Base):
+    __tablename__ = "product_ads_daily_metrics"
+    __table_args__ = (
+        UniqueConstraint("company_id", "item_id", "date", name="uq_product_ads_daily_company_item_date"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
+    item_id = Column(String(255), nullable=False)
+    date = Column(Date, nullable=False)
+    
+    # Métricas somáveis; taxas (CTR, ACOS, ROAS, CVR) são calculadas na consulta
+    clicks = Column(Integer, default=0)
+    prints = Column(Integer, default=0)
+    cost = Column(Numeric(12, 2), default=0)
+    direct_items_quantity = Column(Integer, default=0)
+    indirect_items_quantity = Column(Integer, default=0)
+    advertising_items_quantity = Column(Integer, default=0)
+    direct_units_quantity = Column(Integer, default=0)
+    indirect_units_quantity = Column(Integer, default=0)
+    units_quantity = Column(Integer, default=0)
+    direct_amount = Column(Numeric(12, 2), default=0)
+    indirect_amount = Column(Numeric(12, 2), default=0)
+    total_amount = Column(Numeric(12, 2), default=0)
+    organic_units_quantity = Column(Integer, default=0)
+    organic_units_amount = Column(Numeric(12, 2), default=0)
+    organic_items_quantity = Column(Integer, default=0)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class MercadoLivreOrder(Base):
     __tablename__ = "mercado_livre_orders"
+    __table_args__ = (
+        UniqueConstraint("company_id", "order_id", name="uq_ml_orders_company_order"),
+        Index("ix_ml_orders_company_date_status", "company_id", "date_created", "status"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
@@ -517,3 +565,158 @@ class MercadoLivreOrder(Base):
     
     # Relationships
     company = relationship("Company")
+
+
+class SyncJob(Base):
+    __tablename__ = "sync_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False, index=True)
+    
+    job_type = Column(String(50), nullable=False)  # announcements, orders, product_ads, catalog_competitors
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, completed, failed, cancelled
+    params = Column(JSON, nullable=True)  # Parâmetros da sincronização
+    
+    # Progresso
+    progress_current = Column(Integer, default=0)
+    progress_total = Column(Integer, nullable=True)
+    
+    # Resultado e erros
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    company = relationship("Company")
+
+
+class SyncCheckpoint(Base):
+    __tablename__ = "sync_checkpoints"
+    __table_args__ = (
+        UniqueConstraint("company_id", "resource", name="uq_sync_checkpoints_company_resource"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
+    resource = Column(String(50), nullable=False)  # announcements, orders
+    
+    # Posição da última página gravada
+    status = Column(String(20), nullable=False, default="running")  # running, completed, failed
+    cursor = Column(JSON, nullable=True)  # Ex: {"offset": 150} ou {"scroll_id": "..."}
+    last_processed_id = Column(String(255), nullable=True)
+    processed_count = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    high_water_mark = Column(DateTime, nullable=True)  # Início da última execução concluída
+    
+    # Timestamps
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    company = relationship("Company")
+
+
+# Notificações (webhooks) recebidas do Mercado Livre
+class MercadoLivreNotification(Base):
+    __tablename__ = "ml_notifications"
+    __table_args__ = (
+        UniqueConstraint("resource", "sent", name="uq_ml_notifications_resource_sent"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    notification_id = Column(String(100), nullable=True)  # _id enviado pelo ML
+    topic = Column(String(50), nullable=False)  # items, orders_v2, questions, price_suggestion
+    resource = Column(String(255), nullable=False)  # Ex: /items/MLB123
+    ml_user_id = Column(String(255), nullable=False, index=True)
+    application_id = Column(String(50), nullable=True)
+    attempts = Column(Integer, default=1)  # Tentativas de entrega do ML
+    sent = Column(DateTime, nullable=False)
+    payload = Column(JSON, nullable=True)
+    
+    # Processamento
+    status = Column(String(20), nullable=False, default="pending", index=True)  # pending, processing, processed, ignored, failed
+    processing_attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, nullable=True)  # Nova tentativa após falha (backoff)
+    claimed_at = Column(DateTime, nullable=True)  # Reserva pelo worker (status processing)
+    error = Column(Text, nullable=True)
+    received_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+
+
+# Cache dos perfis de vendedores do Mercado Livre (concorrentes de catálogo)
+class MercadoLivreSeller(Base):
+    __tablename__ = "ml_sellers"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    seller_id = Column(String(50), nullable=False, unique=True, index=True)
+    nickname = Column(String(255), nullable=True)
+    reputation_level = Column(String(50), nullable=True)
+    power_status = Column(String(50), nullable=True)
+    transactions_total = Column(Integer, default=0)
+    transactions = Column(JSON, nullable=True)
+    
+    # Timestamps
+    fetched_at = Column(DateTime, nullable=False)  # Última busca no ML (base do TTL)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# Agenda adaptativa de atualização dos concorrentes de cada produto de catálogo
+class CatalogRefreshState(Base):
+    __tablename__ = "catalog_refresh_states"
+    __table_args__ = (
+        UniqueConstraint("company_id", "catalog_product_id", name="uq_catalog_refresh_company_product"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
+    catalog_product_id = Column(String(255), nullable=False)
+    
+    # Buy box observada na última atualização
+    buy_box_item_id = Column(String(255), nullable=True)
+    buy_box_price = Column(Numeric(12, 2), nullable=True)
+    
+    # Intervalo adaptativo: diminui quando a buy box muda e aumenta quando fica estável
+    refresh_interval = Column(Integer, nullable=False)  # Segundos
+    change_count = Column(Integer, default=0)
+    last_refreshed_at = Column(DateTime, nullable=True)
+    last_changed_at = Column(DateTime, nullable=True)
+    next_refresh_at = Column(DateTime, nullable=False, index=True)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# Histórico de preço e estoque dos concorrentes: uma linha apenas quando algo muda
+class CatalogCompetitorObservation(Base):
+    __tablename__ = "catalog_competitor_observations"
+    __table_args__ = (
+        Index("ix_catalog_competitor_observations_product_observed", "catalog_product_id", "observed_at"),
+        Index("ix_catalog_competitor_observations_item_observed", "item_id", "observed_at"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    catalog_product_id = Column(String(255), nullable=False)
+    item_id = Column(String(255), nullable=False)
+    observed_at = Column(DateTime, nullable=False)
+    price = Column(Numeric(12, 2), nullable=False)
+    original_price = Column(Numeric(12, 2), nullable=True)
+    available_quantity = Column(Integer, nullable=True)
+
+
+# Versão dos dados de cada listagem (base das ETags): incrementada só quando algo muda
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+    
+    resource = Column(String(50), primary_key=True)  # announcements, orders, catalog_competitors
+    scope = Column(String(255), primary_key=True)  # company_id ou catalog_product_id
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
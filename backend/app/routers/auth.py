@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
-from app.database import get_db
+from app.database import get_async_db
 from app.models import User, Company
 from app.schemas import UserCreate, UserLogin, Token, UserWithCompany
 from app.auth import (
@@ -16,10 +17,10 @@ from app.auth import (
 router = APIRouter()
 
 @router.post("/register", response_model=UserWithCompany)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user and company."""
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await db.scalar(select(User).where(User.email == user_data.email))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -27,7 +28,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Check if company CNPJ already exists
-    existing_company = db.query(Company).filter(Company.cnpj == user_data.company_cnpj).first()
+    existing_company = await db.scalar(select(Company).where(Company.cnpj == user_data.company_cnpj))
     if existing_company:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -40,8 +41,8 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         cnpj=user_data.company_cnpj
     )
     db.add(company)
-    db.commit()
-    db.refresh(company)
+    await db.commit()
+    await db.refresh(company)
     
     # Create user
     hashed_password = get_password_hash(user_data.password)
@@ -52,15 +53,15 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         company_id=company.id
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user, attribute_names=["company"])
     
     return user
 
 @router.post("/login", response_model=Token)
-async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(user_credentials: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """Authenticate user and return access token."""
-    user = db.query(User).filter(User.email == user_credentials.email).first()
+    user = await db.scalar(select(User).where(User.email == user_credentials.email))
     
     if not user or not verify_password(user_credentials.password, user.hashed_password):
         raise HTTPException(
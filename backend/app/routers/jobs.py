@@ -0,0 +1,84 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.auth import get_current_user
+from app.models import SyncJob
+from app.schemas import SyncJob as SyncJobSchema
+from app.services.job_runner import job_runner, ACTIVE_STATUSES
+from typing import Optional, List
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+async def _get_company_job(db: AsyncSession, job_id: int, company_id: int) -> SyncJob:
+    job = await db.scalar(select(SyncJob).where(
+        SyncJob.id == job_id,
+        SyncJob.company_id == company_id
+    ))
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job não encontrado"
+        )
+    return job
+
+
+@router.get("/jobs", response_model=List[SyncJobSchema])
+async def list_jobs(
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    job_status: Optional[str] = Query(None, alias="status", description="Filtra pelo status do job"),
+    job_type: Optional[str] = Query(None, description="Filtra pelo tipo do job"),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Lista os jobs de sincronização mais recentes da empresa."""
+    query = select(SyncJob).where(SyncJob.company_id == current_user.company_id)
+    if job_status:
+        query = query.where(SyncJob.status == job_status)
+    if job_type:
+        query = query.where(SyncJob.job_type == job_type)
+    return (await db.execute(query.order_by(SyncJob.id.desc()).limit(limit))).scalars().all()
+
+
+@router.get("/jobs/{job_id}", response_model=SyncJobSchema)
+async def get_job(
+    job_id: int,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Consulta o status e o progresso de um job de sincronização."""
+    return await _get_company_job(db, job_id, current_user.company_id)
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=SyncJobSchema)
+async def cancel_job(
+    job_id: int,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Cancela um job de sincronização na fila ou em execução."""
+    job = await _get_company_job(db, job_id, current_user.company_id)
+
+    if job.status not in ACTIVE_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job já finalizado com status '{job.status}'"
+        )
+
+    if await job_runner.cancel(job_id):
+        # A tarefa gravou o status final em outra sessão
+        await db.refresh(job)
+    else:
+        # Job ativo sem tarefa neste processo (ex.: servidor reiniciado)
+        job.status = "cancelled"
+        job.finished_at = datetime.utcnow()
+        await db.commit()
+
+    logger.info(f"Job {job_id} cancelado (status: {job.status})")
+    return job
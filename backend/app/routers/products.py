@@ -1,13 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_async_db, run_in_session
 from app.auth import get_current_user
-from app.services.mercado_livre import mercado_livre_service
+from app.services.etag import data_version, not_modified, request_etag, version_bump
+from app.services.export import export_service, EXPORT_MEDIA_TYPES
+from app.services.http_client import get_ml_client
+from app.services.mercado_livre import mercado_livre_service, ITEM_ATTRIBUTES
+from app.services.announcement_sync import announcement_sync_service
+from app.services.catalog_sync import catalog_sync_service, HISTORY_DEFAULT_DAYS
+from app.services.job_runner import job_runner
+from app.services.order_sync import to_utc_naive
+from app.services.pagination import (
+    count_cache, decode_cursor, defer_columns, keyset_condition, page_rows, parse_include,
+    InvalidCursorError, InvalidIncludeError
+)
+from app.services.seller_cache import seller_cache
+from app.services.token_manager import token_manager, TokenRefreshError
 from app.models import MercadoLivreAnnouncement, CatalogCompetitor, User
+from app.schemas import SyncJob as SyncJobSchema, AnnouncementListItem, AnnouncementPage, CatalogCompetitorItem
 from typing import Optional, List, Dict, Any
+import asyncio
 import logging
 import httpx
-from datetime import datetime
+from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
@@ -18,127 +36,75 @@ async def get_products(
     current_user = Depends(get_current_user),
     db: Session = Depends(get_db),
     limit: int = Query(50, ge=1, le=100),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    client: httpx.AsyncClient = Depends(get_ml_client)
 ):
     """Obtém lista de produtos do usuário no Mercado Livre."""
     try:
-        # Obter token válido
-        valid_token = mercado_livre_service.get_valid_token(db, current_user.company_id)
+        # Obter token válido e user_id da integração
+        try:
+            credentials = await token_manager.get_credentials(db, current_user.company_id)
+        except TokenRefreshError:
+            credentials = None
         
-        if not valid_token:
+        if not credentials:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Token inválido ou expirado. Reconecte sua conta do Mercado Livre."
             )
         
-        # Obter user_id da integração
-        from app.models import MercadoLivreIntegration
-        integration = db.query(MercadoLivreIntegration).filter(
-            MercadoLivreIntegration.company_id == current_user.company_id,
-            MercadoLivreIntegration.is_active == True
-        ).first()
-        
-        if not integration or not integration.user_id:
+        if not credentials.user_id:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Integração com Mercado Livre não encontrada"
             )
         
+        valid_token = credentials.access_token
+        
         # Buscar produtos do usuário
-        async with httpx.AsyncClient() as client:
-            headers = {"Authorization": f"Bearer {valid_token}"}
-            
-            # Buscar itens do usuário
-            response = await client.get(
-                f"https://api.mercadolibre.com/users/{integration.user_id}/items/search",
-                headers=headers,
-                params={"limit": limit, "offset": offset}
-            )
-            
-            if response.status_code == 404:
-                # Usuário não tem produtos
-                return {"products": [], "total": 0}
-            
-            response.raise_for_status()
-            search_data = response.json()
-            
-            if not search_data.get("results"):
-                return {"products": [], "total": 0}
-            
-            # Buscar detalhes de cada produto
-            products = []
-            for item_id in search_data["results"]:
-                try:
-                    # Buscar informações básicas do item
-                    item_response = await client.get(
-                        f"https://api.mercadolibre.com/items/{item_id}",
-                        headers=headers
-                    )
-                    if item_response.status_code == 200:
-                        item_data = item_response.json()
-                        
-                        # Buscar informações de preços promocionais
-                        try:
-                            prices_response = await client.get(
-                                f"https://api.mercadolibre.com/items/{item_id}/prices",
-                                headers=headers
-                            )
-                            if prices_response.status_code == 200:
-                                prices_data = prices_response.json()
-                                
-                                # Buscar preço de venda atual (com promoções ativas)
-                                sale_price_response = await client.get(
-                                    f"https://api.mercadolibre.com/items/{item_id}/sale_price?context=channel_marketplace",
-                                    headers=headers
-                                )
-                                if sale_price_response.status_code == 200:
-                                    sale_price_data = sale_price_response.json()
-                                    
-                                    # Adicionar informações de preços promocionais ao item
-                                    item_data["sale_price_info"] = sale_price_data
-                                    item_data["prices_info"] = prices_data
-                                    
-                                    # Adicionar campos para compatibilidade com frontend
-                                    if sale_price_data.get("regular_amount") and sale_price_data.get("amount"):
-                                        item_data["original_price"] = sale_price_data["regular_amount"]
-                                        item_data["price"] = sale_price_data["amount"]
-                                    
-                        except Exception as price_error:
-                            logger.warning(f"Erro ao buscar preços do item {item_id}: {price_error}")
-                        
-                        # Buscar informações de posição no catálogo
-                        try:
-                            catalog_position_response = await client.get(
-                                f"https://api.mercadolibre.com/items/{item_id}/price_to_win?version=v2",
-                                headers=headers
-                            )
-                            if catalog_position_response.status_code == 200:
-                                catalog_position_data = catalog_position_response.json()
-                                
-                                # Adicionar informações de posição no catálogo ao item
-                                item_data["catalog_position_info"] = catalog_position_data
-                                
-                                # Adicionar campos para compatibilidade com frontend
-                                item_data["catalog_status"] = catalog_position_data.get("status", "unknown")
-                                item_data["catalog_visit_share"] = catalog_position_data.get("visit_share", "unknown")
-                                item_data["catalog_competitors_sharing"] = catalog_position_data.get("competitors_sharing_first_place", 0)
-                                item_data["catalog_price_to_win"] = catalog_position_data.get("price_to_win")
-                                
-                        except Exception as catalog_error:
-                            logger.warning(f"Erro ao buscar posição no catálogo do item {item_id}: {catalog_error}")
-                        
-                        products.append(item_data)
-                except Exception as e:
-                    logger.warning(f"Erro ao buscar detalhes do item {item_id}: {e}")
-                    continue
-            
-            return {
-                "products": products,
-                "total": search_data.get("paging", {}).get("total", len(products)),
-                "limit": limit,
-                "offset": offset
-            }
-            
+        headers = {"Authorization": f"Bearer {valid_token}"}
+        
+        # Buscar itens do usuário
+        response = await client.get(
+            f"https://api.mercadolibre.com/users/{credentials.user_id}/items/search",
+            headers=headers,
+            params={"limit": limit, "offset": offset}
+        )
+        
+        if response.status_code == 404:
+            # Usuário não tem produtos
+            return {"products": [], "total": 0}
+        
+        response.raise_for_status()
+        search_data = response.json()
+        
+        if not search_data.get("results"):
+            return {"products": [], "total": 0}
+        
+        # Buscar dados básicos em lote (multiget) e completar preços/catálogo em paralelo
+        item_ids = search_data["results"]
+        items = await mercado_livre_service.get_items(client, headers, item_ids, attributes=ITEM_ATTRIBUTES)
+        semaphore = announcement_sync_service.get_company_semaphore(current_user.company_id)
+        
+        async def enrich_product(item_id: str, item_data: dict) -> dict:
+            async with semaphore:
+                await asyncio.gather(
+                    announcement_sync_service.fetch_price_info(client, headers, item_id, item_data),
+                    announcement_sync_service.fetch_catalog_position(client, headers, item_id, item_data)
+                )
+            return item_data
+        
+        products = await asyncio.gather(
+            *(enrich_product(item_id, items[item_id]) for item_id in item_ids if item_id in items)
+        )
+        
+        return {
+            "products": list(products),
+            "total": search_data.get("paging", {}).get("total", len(products)),
+            "limit": limit,
+            "offset": offset
+        }
+        
     except httpx.HTTPStatusError as e:
         logger.error(f"Erro HTTP ao buscar produtos: {e}")
         raise HTTPException(
@@ -152,21 +118,63 @@ async def get_products(
             detail="Erro interno ao buscar produtos"
         )
 
+# Colunas JSON da listagem de anúncios lidas só quando pedidas (include=)
+ANNOUNCEMENT_HEAVY_FIELDS = ("attributes", "pictures", "prices_info", "catalog_position_info", "full_data")
+
+def build_announcements_query(company_id: int, include_removed: bool):
+    """Consulta de anúncios da empresa com os filtros da listagem."""
+    query = select(MercadoLivreAnnouncement).where(MercadoLivreAnnouncement.company_id == company_id)
+    if not include_removed:
+        query = query.where(MercadoLivreAnnouncement.ml_removed_at.is_(None))
+    return query
+
+# Antes de /announcements/{announcement_id}, que capturaria "export"
+@router.get("/announcements/export")
+async def export_announcements(
+    current_user = Depends(get_current_user),
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description="ndjson ou csv"),
+    include_removed: bool = Query(False, description="Inclui anúncios que não existem mais no ML"),
+    include: Optional[str] = Query(
+        None, description=f"Campos JSON extras, separados por vírgula: {', '.join(ANNOUNCEMENT_HEAVY_FIELDS)}"
+    )
+):
+    """Exporta todos os anúncios em NDJSON ou CSV, em streaming.
+    
+    Aceita os mesmos filtros de /announcements. Os anúncios são lidos em lotes
+    com cursor no servidor, sem carregar a exportação inteira na memória.
+    """
+    try:
+        included = parse_include(include, ANNOUNCEMENT_HEAVY_FIELDS)
+    except InvalidIncludeError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    query = build_announcements_query(current_user.company_id, include_removed).order_by(
+        MercadoLivreAnnouncement.ml_item_id
+    ).options(*defer_columns(MercadoLivreAnnouncement, ANNOUNCEMENT_HEAVY_FIELDS, included))
+    
+    logger.info(f"Exportando anúncios da empresa {current_user.company_id} em {export_format}")
+    filename = f"anuncios-{datetime.utcnow():%Y%m%d-%H%M%S}.{export_format}"
+    return StreamingResponse(
+        export_service.stream(query, AnnouncementListItem, export_format, included),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.get("/announcements/{announcement_id}")
 async def get_announcement(
     announcement_id: str,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtém detalhes de um anúncio específico do banco local."""
     try:
         from app.models import MercadoLivreAnnouncement
         
         # Buscar anúncio no banco local
-        announcement = db.query(MercadoLivreAnnouncement).filter(
+        announcement = await db.scalar(select(MercadoLivreAnnouncement).where(
             MercadoLivreAnnouncement.ml_item_id == announcement_id,
             MercadoLivreAnnouncement.company_id == current_user.company_id
-        ).first()
+        ))
         
         if not announcement:
             raise HTTPException(
@@ -243,17 +251,17 @@ async def update_announcement_costs(
     announcement_id: str,
     costs_data: Dict[str, Any],
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Atualiza os custos adicionais de um anúncio."""
     try:
         from app.models import MercadoLivreAnnouncement
         
         # Buscar anúncio no banco local
-        announcement = db.query(MercadoLivreAnnouncement).filter(
+        announcement = await db.scalar(select(MercadoLivreAnnouncement).where(
             MercadoLivreAnnouncement.ml_item_id == announcement_id,
             MercadoLivreAnnouncement.company_id == current_user.company_id
-        ).first()
+        ))
         
         if not announcement:
             raise HTTPException(
@@ -276,8 +284,8 @@ async def update_announcement_costs(
             announcement.additional_notes = costs_data["additional_notes"]
         
         # Salvar as alterações
-        db.commit()
-        db.refresh(announcement)
+        await db.execute(version_bump("announcements", current_user.company_id))
+        await db.commit()
         
         return {
             "message": "Custos atualizados com sucesso",
@@ -297,11 +305,12 @@ async def update_announcement_costs(
 async def get_product(
     product_id: str,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    client: httpx.AsyncClient = Depends(get_ml_client)
 ):
     """Obtém detalhes de um produto específico."""
     try:
-        valid_token = mercado_livre_service.get_valid_token(db, current_user.company_id)
+        valid_token = await mercado_livre_service.get_valid_token(db, current_user.company_id)
         
         if not valid_token:
             raise HTTPException(
@@ -309,16 +318,15 @@ async def get_product(
                 detail="Token inválido ou expirado"
             )
         
-        async with httpx.AsyncClient() as client:
-            headers = {"Authorization": f"Bearer {valid_token}"}
-            response = await client.get(
-                f"https://api.mercadolibre.com/items/{product_id}",
-                headers=headers
-            )
-            
-            response.raise_for_status()
-            return response.json()
-            
+        headers = {"Authorization": f"Bearer {valid_token}"}
+        response = await client.get(
+            f"https://api.mercadolibre.com/items/{product_id}",
+            headers=headers
+        )
+        
+        response.raise_for_status()
+        return response.json()
+        
     except httpx.HTTPStatusError as e:
         if e.response.status_code == 404:
             raise HTTPException(
@@ -340,11 +348,12 @@ async def get_product(
 async def create_product(
     product_data: Dict[str, Any],
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    client: httpx.AsyncClient = Depends(get_ml_client)
 ):
     """Cria um novo produto no Mercado Livre."""
     try:
-        valid_token = mercado_livre_service.get_valid_token(db, current_user.company_id)
+        valid_token = await mercado_livre_service.get_valid_token(db, current_user.company_id)
         
         if not valid_token:
             raise HTTPException(
@@ -379,26 +388,25 @@ async def create_product(
                 "plain_text": product_data["description"]
             }
         
-        async with httpx.AsyncClient() as client:
-            headers = {
-                "Authorization": f"Bearer {valid_token}",
-                "Content-Type": "application/json"
-            }
-            
-            response = await client.post(
-                "https://api.mercadolibre.com/items",
-                headers=headers,
-                json=ml_product_data
-            )
-            
-            response.raise_for_status()
-            created_product = response.json()
-            
-            return {
-                "message": "Produto criado com sucesso",
-                "product": created_product
-            }
-            
+        headers = {
+            "Authorization": f"Bearer {valid_token}",
+            "Content-Type": "application/json"
+        }
+        
+        response = await client.post(
+            "https://api.mercadolibre.com/items",
+            headers=headers,
+            json=ml_product_data
+        )
+        
+        response.raise_for_status()
+        created_product = response.json()
+        
+        return {
+            "message": "Produto criado com sucesso",
+            "product": created_product
+        }
+        
     except httpx.HTTPStatusError as e:
         error_detail = "Erro ao criar produto"
         try:
@@ -424,11 +432,12 @@ async def update_product(
     product_id: str,
     product_data: Dict[str, Any],
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    client: httpx.AsyncClient = Depends(get_ml_client)
 ):
     """Atualiza um produto existente no Mercado Livre."""
     try:
-        valid_token = mercado_livre_service.get_valid_token(db, current_user.company_id)
+        valid_token = await mercado_livre_service.get_valid_token(db, current_user.company_id)
         
         if not valid_token:
             raise HTTPException(
@@ -458,26 +467,25 @@ async def update_product(
                 detail="Nenhum campo para atualizar"
             )
         
-        async with httpx.AsyncClient() as client:
-            headers = {
-                "Authorization": f"Bearer {valid_token}",
-                "Content-Type": "application/json"
-            }
-            
-            response = await client.put(
-                f"https://api.mercadolibre.com/items/{product_id}",
-                headers=headers,
-                json=update_data
-            )
-            
-            response.raise_for_status()
-            updated_product = response.json()
-            
-            return {
-                "message": "Produto atualizado com sucesso",
-                "product": updated_product
-            }
-            
+        headers = {
+            "Authorization": f"Bearer {valid_token}",
+            "Content-Type": "application/json"
+        }
+        
+        response = await client.put(
+            f"https://api.mercadolibre.com/items/{product_id}",
+            headers=headers,
+            json=update_data
+        )
+        
+        response.raise_for_status()
+        updated_product = response.json()
+        
+        return {
+            "message": "Produto atualizado com sucesso",
+            "product": updated_product
+        }
+        
     except httpx.HTTPStatusError as e:
         if e.response.status_code == 404:
             raise HTTPException(
@@ -508,11 +516,12 @@ async def update_product(
 async def delete_product(
     product_id: str,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    client: httpx.AsyncClient = Depends(get_ml_client)
 ):
     """Exclui um produto do Mercado Livre."""
     try:
-        valid_token = mercado_livre_service.get_valid_token(db, current_user.company_id)
+        valid_token = await mercado_livre_service.get_valid_token(db, current_user.company_id)
         
         if not valid_token:
             raise HTTPException(
@@ -520,39 +529,38 @@ async def delete_product(
                 detail="Token inválido ou expirado"
             )
         
-        async with httpx.AsyncClient() as client:
-            headers = {"Authorization": f"Bearer {valid_token}"}
-            
-            # Primeiro, pausar o produto
-            pause_response = await client.put(
+        headers = {"Authorization": f"Bearer {valid_token}"}
+        
+        # Primeiro, pausar o produto
+        pause_response = await client.put(
+            f"https://api.mercadolibre.com/items/{product_id}",
+            headers=headers,
+            json={"status": "paused"}
+        )
+        
+        if pause_response.status_code == 200:
+            return {
+                "message": "Produto pausado com sucesso",
+                "product_id": product_id
+            }
+        else:
+            # Se não conseguir pausar, tenta excluir diretamente
+            delete_response = await client.delete(
                 f"https://api.mercadolibre.com/items/{product_id}",
-                headers=headers,
-                json={"status": "paused"}
+                headers=headers
             )
             
-            if pause_response.status_code == 200:
+            if delete_response.status_code == 200:
                 return {
-                    "message": "Produto pausado com sucesso",
+                    "message": "Produto excluído com sucesso",
                     "product_id": product_id
                 }
             else:
-                # Se não conseguir pausar, tenta excluir diretamente
-                delete_response = await client.delete(
-                    f"https://api.mercadolibre.com/items/{product_id}",
-                    headers=headers
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Não foi possível excluir o produto"
                 )
-                
-                if delete_response.status_code == 200:
-                    return {
-                        "message": "Produto excluído com sucesso",
-                        "product_id": product_id
-                    }
-                else:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="Não foi possível excluir o produto"
-                    )
-            
+        
     except httpx.HTTPStatusError as e:
         if e.response.status_code == 404:
             raise HTTPException(
@@ -574,15 +582,15 @@ async def delete_product(
 
 @router.get("/categories")
 async def get_categories(
-    site_id: str = Query("MLB", description="ID do site (MLB para Brasil)")
+    site_id: str = Query("MLB", description="ID do site (MLB para Brasil)"),
+    client: httpx.AsyncClient = Depends(get_ml_client)
 ):
     """Obtém lista de categorias do Mercado Livre."""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"https://api.mercadolibre.com/sites/{site_id}/categories")
-            response.raise_for_status()
-            return response.json()
-            
+        response = await client.get(f"https://api.mercadolibre.com/sites/{site_id}/categories")
+        response.raise_for_status()
+        return response.json()
+        
     except Exception as e:
         logger.error(f"Erro ao buscar categorias: {e}")
         raise HTTPException(
@@ -592,15 +600,15 @@ async def get_categories(
 
 @router.get("/categories/{category_id}")
 async def get_category_attributes(
-    category_id: str
+    category_id: str,
+    client: httpx.AsyncClient = Depends(get_ml_client)
 ):
     """Obtém atributos de uma categoria específica."""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"https://api.mercadolibre.com/categories/{category_id}/attributes")
-            response.raise_for_status()
-            return response.json()
-            
+        response = await client.get(f"https://api.mercadolibre.com/categories/{category_id}/attributes")
+        response.raise_for_status()
+        return response.json()
+        
     except Exception as e:
         logger.error(f"Erro ao buscar atributos da categoria: {e}")
         raise HTTPException(
@@ -608,94 +616,93 @@ async def get_category_attributes(
             detail="Erro ao buscar atributos da categoria"
         )
 
-@router.get("/announcements")
+@router.get("/announcements", response_model=AnnouncementPage)
 async def get_announcements(
+    request: Request,
+    response: Response,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     limit: int = Query(50, ge=1, le=100),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0, description="Obsoleto: prefira o cursor"),
+    cursor: Optional[str] = Query(None, description="Valor de next_cursor da página anterior"),
+    include_total: bool = Query(True, description="Inclui o total (pode estar até alguns segundos desatualizado)"),
+    include_removed: bool = Query(False, description="Inclui anúncios que não existem mais no ML"),
+    include: Optional[str] = Query(
+        None, description=f"Campos JSON extras, separados por vírgula: {', '.join(ANNOUNCEMENT_HEAVY_FIELDS)}"
+    )
 ):
-    """Obtém anúncios salvos no banco de dados local."""
+    """Obtém anúncios salvos no banco de dados local.
+    
+    A paginação usa o cursor (ml_item_id do último anúncio da página), que
+    segue o índice (company_id, ml_item_id) sem percorrer as páginas anteriores.
+    Os campos JSON pesados só são lidos do banco quando pedidos em ``include``.
+    Com If-None-Match e nenhum anúncio alterado, responde 304 sem ler os anúncios.
+    ``cursor`` e ``offset`` não podem ser usados juntos.
+    """
     try:
         from app.models import MercadoLivreAnnouncement
         
-        # Buscar anúncios do banco local
-        announcements = db.query(MercadoLivreAnnouncement).filter(
-            MercadoLivreAnnouncement.company_id == current_user.company_id
-        ).offset(offset).limit(limit).all()
+        if cursor and offset:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Use cursor ou offset, não os dois"
+            )
         
-        total = db.query(MercadoLivreAnnouncement).filter(
-            MercadoLivreAnnouncement.company_id == current_user.company_id
-        ).count()
+        try:
+            included = parse_include(include, ANNOUNCEMENT_HEAVY_FIELDS)
+        except InvalidIncludeError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         
-        # Converter para formato compatível com o frontend
+        version = await data_version(db, "announcements", current_user.company_id)
+        unchanged = not_modified(
+            request, response, request_etag(request, "announcements", current_user.company_id, version)
+        )
+        if unchanged:
+            return unchanged
+        
+        query = build_announcements_query(current_user.company_id, include_removed)
+        
+        total = None
+        if include_total:
+            total = await count_cache.count(
+                db, ("announcements", current_user.company_id, include_removed), query
+            )
+        
+        page_query = query.order_by(MercadoLivreAnnouncement.ml_item_id).options(
+            *defer_columns(MercadoLivreAnnouncement, ANNOUNCEMENT_HEAVY_FIELDS, included)
+        )
+        if cursor:
+            try:
+                cursor_values = decode_cursor(cursor, (str,))
+            except InvalidCursorError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+            page_query = page_query.where(
+                keyset_condition([MercadoLivreAnnouncement.ml_item_id], cursor_values)
+            )
+        
+        # Buscar anúncios do banco local (um a mais para saber se há próxima página)
+        rows = (await db.execute(page_query.offset(offset).limit(limit + 1))).scalars().all()
+        announcements, next_cursor = page_rows(rows, limit, lambda last: [last.ml_item_id])
+        
+        # Converter para o formato do frontend (números e datas são serializados pelo Pydantic)
         products = []
         for announcement in announcements:
-            product_data = {
-                "id": announcement.ml_item_id,
-                "title": announcement.title,
-                "price": float(announcement.price),
-                "currency_id": announcement.currency_id,
-                "available_quantity": announcement.available_quantity,
-                "sold_quantity": announcement.sold_quantity,
-                "condition": announcement.condition,
-                "status": announcement.status,
-                "permalink": announcement.permalink,
-                "thumbnail": announcement.thumbnail,
-                "listing_type_id": announcement.listing_type_id,
-                "listing_type_name": announcement.listing_type_name,
-                "listing_exposure": announcement.listing_exposure,
-                "category_id": announcement.category_id,
-                "domain_id": announcement.domain_id,
-                
-                # Campos de custos
-                "listing_fee_amount": float(announcement.listing_fee_amount) if announcement.listing_fee_amount else None,
-                "sale_fee_amount": float(announcement.sale_fee_amount) if announcement.sale_fee_amount else None,
-                "sale_fee_percentage": float(announcement.sale_fee_percentage) if announcement.sale_fee_percentage else None,
-                "sale_fee_fixed": float(announcement.sale_fee_fixed) if announcement.sale_fee_fixed else None,
-                "total_cost": float(announcement.total_cost) if announcement.total_cost else None,
-                "requires_picture": announcement.requires_picture,
-                "free_relist": announcement.free_relist,
-                
-                # Campos de informações adicionais de custos
-                "product_cost": float(announcement.product_cost) if announcement.product_cost else None,
-                "taxes": announcement.taxes,
-                "ads_cost": announcement.ads_cost,
-                "shipping_cost": float(announcement.shipping_cost) if announcement.shipping_cost else None,
-                "additional_fees": announcement.additional_fees,
-                "additional_notes": announcement.additional_notes,
-                
-                "catalog_listing": announcement.catalog_listing,
-                "catalog_product_id": announcement.catalog_product_id,
-                "family_name": announcement.family_name,
-                "family_id": announcement.family_id,
-                "user_product_id": announcement.user_product_id,
-                "inventory_id": announcement.inventory_id,
-                "base_price": float(announcement.base_price) if announcement.base_price else None,
-                "original_price": float(announcement.original_price) if announcement.original_price else None,
-                "sale_price": float(announcement.sale_price) if announcement.sale_price else None,
-                "catalog_status": announcement.catalog_status,
-                "catalog_visit_share": announcement.catalog_visit_share,
-                "catalog_competitors_sharing": announcement.catalog_competitors_sharing,
-                "catalog_price_to_win": float(announcement.catalog_price_to_win) if announcement.catalog_price_to_win else None,
-                "sale_price_info": announcement.sale_price_info,
-                "prices_info": announcement.prices_info,
-                "catalog_position_info": announcement.catalog_position_info,
-                "attributes": announcement.attributes,
-                "pictures": announcement.pictures,
-                "tags": announcement.tags,
-                "date_created": announcement.ml_date_created.isoformat() if announcement.ml_date_created else None,
-                "last_updated": announcement.ml_last_updated.isoformat() if announcement.ml_last_updated else None,
-            }
-            products.append(product_data)
+            product = AnnouncementListItem.model_validate(announcement)
+            for field in included:
+                setattr(product, field, getattr(announcement, field))
+            products.append(product)
         
         return {
             "products": products,
             "total": total,
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "has_more": next_cursor is not None,
+            "next_cursor": next_cursor
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro ao buscar anúncios do banco local: {e}")
         raise HTTPException(
@@ -706,287 +713,60 @@ async def get_announcements(
 @router.post("/sync-announcements")
 async def sync_announcements(
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    incremental: bool = Query(False, description="Ignora itens sem alteração desde a última sincronização"),
+    resume: bool = Query(True, description="Continua do último checkpoint se a execução anterior não terminou"),
+    background: bool = Query(False, description="Executa em segundo plano e retorna o job"),
+    client: httpx.AsyncClient = Depends(get_ml_client)
 ):
     """Sincroniza anúncios do Mercado Livre com o banco de dados local."""
     try:
-        from app.models import MercadoLivreAnnouncement
-        from datetime import datetime
-        
-        # Obter token válido
-        valid_token = mercado_livre_service.get_valid_token(db, current_user.company_id)
+        # Obter token válido e user_id da integração
+        try:
+            credentials = await token_manager.get_credentials(db, current_user.company_id)
+        except TokenRefreshError:
+            credentials = None
         
-        if not valid_token:
+        if not credentials:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Token inválido ou expirado. Reconecte sua conta do Mercado Livre."
             )
         
-        # Obter user_id da integração
-        from app.models import MercadoLivreIntegration
-        integration = db.query(MercadoLivreIntegration).filter(
-            MercadoLivreIntegration.company_id == current_user.company_id,
-            MercadoLivreIntegration.is_active == True
-        ).first()
-        
-        if not integration or not integration.user_id:
+        if not credentials.user_id:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Integração com Mercado Livre não encontrada"
             )
         
-        # Buscar todos os produtos do usuário
-        async with httpx.AsyncClient() as client:
-            headers = {"Authorization": f"Bearer {valid_token}"}
-            
-            # Buscar todos os itens do usuário usando paginação
-            all_item_ids = []
-            offset = 0
-            limit = 50  # Limite por página da API do ML
-            
-            while True:
-                response = await client.get(
-                    f"https://api.mercadolibre.com/users/{integration.user_id}/items/search",
-                    headers=headers,
-                    params={"limit": limit, "offset": offset}
-                )
-                
-                if response.status_code == 404:
-                    break
-                
-                response.raise_for_status()
-                search_data = response.json()
-                
-                if not search_data.get("results"):
-                    break
-                
-                all_item_ids.extend(search_data["results"])
-                
-                # Verificar se há mais páginas
-                paging = search_data.get("paging", {})
-                total = paging.get("total", 0)
-                current_offset = paging.get("offset", 0)
-                
-                if current_offset + len(search_data["results"]) >= total:
-                    break
-                
-                offset += limit
-            
-            if not all_item_ids:
-                return {"message": "Nenhum anúncio encontrado", "synced": 0, "updated": 0}
-            
-            synced_count = 0
-            updated_count = 0
-            
-            # Processar cada item
-            for item_id in all_item_ids:
-                try:
-                    # Buscar informações básicas do item
-                    item_response = await client.get(
-                        f"https://api.mercadolibre.com/items/{item_id}",
-                        headers=headers
-                    )
-                    if item_response.status_code != 200:
-                        continue
-                        
-                    item_data = item_response.json()
-                    
-                    # Buscar informações de preços promocionais
-                    try:
-                        prices_response = await client.get(
-                            f"https://api.mercadolibre.com/items/{item_id}/prices",
-                            headers=headers
-                        )
-                        if prices_response.status_code == 200:
-                            prices_data = prices_response.json()
-                            
-                            # Buscar preço de venda atual (com promoções ativas)
-                            sale_price_response = await client.get(
-                                f"https://api.mercadolibre.com/items/{item_id}/sale_price?context=channel_marketplace",
-                                headers=headers
-                            )
-                            if sale_price_response.status_code == 200:
-                                sale_price_data = sale_price_response.json()
-                                
-                                # Adicionar informações de preços promocionais ao item
-                                item_data["sale_price_info"] = sale_price_data
-                                item_data["prices_info"] = prices_data
-                                
-                                # Adicionar campos para compatibilidade
-                                if sale_price_data.get("regular_amount") and sale_price_data.get("amount"):
-                                    item_data["original_price"] = sale_price_data["regular_amount"]
-                                    item_data["price"] = sale_price_data["amount"]
-                                
-                    except Exception as price_error:
-                        logger.warning(f"Erro ao buscar preços do item {item_id}: {price_error}")
-                    
-                    # Buscar informações de posição no catálogo
-                    try:
-                        catalog_position_response = await client.get(
-                            f"https://api.mercadolibre.com/items/{item_id}/price_to_win?version=v2",
-                            headers=headers
-                        )
-                        if catalog_position_response.status_code == 200:
-                            catalog_position_data = catalog_position_response.json()
-                            item_data["catalog_position_info"] = catalog_position_data
-                            
-                            # Adicionar campos para compatibilidade
-                            item_data["catalog_status"] = catalog_position_data.get("status", "unknown")
-                            item_data["catalog_visit_share"] = catalog_position_data.get("visit_share", "unknown")
-                            item_data["catalog_competitors_sharing"] = catalog_position_data.get("competitors_sharing_first_place", 0)
-                            item_data["catalog_price_to_win"] = catalog_position_data.get("price_to_win")
-                            
-                    except Exception as catalog_error:
-                        logger.warning(f"Erro ao buscar posição no catálogo do item {item_id}: {catalog_error}")
-                    
-                    # Buscar informações de custos usando a API oficial listing_prices
-                    try:
-                        price = item_data.get("price", 0)
-                        category_id = item_data.get("category_id")
-                        listing_type_id = item_data.get("listing_type_id")
-                        currency_id = item_data.get("currency_id", "BRL")
-                        site_id = item_data.get("site_id", "MLB")
-                        
-                        if price and category_id:
-                            listing_prices_url = f"https://api.mercadolibre.com/sites/{site_id}/listing_prices"
-                            params = {
-                                "price": price,
-                                "category_id": category_id,
-                                "currency_id": currency_id
-                            }
-                            
-                            if listing_type_id:
-                                params["listing_type_id"] = listing_type_id
-                            
-                            listing_prices_response = await client.get(
-                                listing_prices_url,
-                                params=params,
-                                headers=headers
-                            )
-                            
-                            if listing_prices_response.status_code == 200:
-                                listing_prices_data = listing_prices_response.json()
-                                
-                                # Processar dados de custos
-                                if isinstance(listing_prices_data, list):
-                                    if listing_type_id:
-                                        current_listing_data = next(
-                                            (item for item in listing_prices_data if item.get("listing_type_id") == listing_type_id),
-                                            listing_prices_data[0] if listing_prices_data else None
-                                        )
-                                    else:
-                                        current_listing_data = listing_prices_data[0] if listing_prices_data else None
-                                else:
-                                    current_listing_data = listing_prices_data
-                                
-                                if current_listing_data:
-                                    # Adicionar dados de custos ao item
-                                    item_data["listing_type_name"] = current_listing_data.get("listing_type_name")
-                                    item_data["listing_exposure"] = current_listing_data.get("listing_exposure")
-                                    item_data["listing_fee_amount"] = current_listing_data.get("listing_fee_amount", 0)
-                                    item_data["sale_fee_amount"] = current_listing_data.get("sale_fee_amount", 0)
-                                    item_data["requires_picture"] = current_listing_data.get("requires_picture", True)
-                                    item_data["free_relist"] = current_listing_data.get("free_relist", False)
-                                    
-                                    # Extrair detalhes da taxa de venda
-                                    sale_fee_details = current_listing_data.get("sale_fee_details", {})
-                                    item_data["sale_fee_percentage"] = sale_fee_details.get("percentage_fee")
-                                    item_data["sale_fee_fixed"] = sale_fee_details.get("fixed_fee")
-                                    
-                                    # Calcular custo total
-                                    listing_fee = current_listing_data.get("listing_fee_amount", 0)
-                                    sale_fee = current_listing_data.get("sale_fee_amount", 0)
-                                    item_data["total_cost"] = listing_fee + sale_fee
-                                    
-                    except Exception as costs_error:
-                        logger.warning(f"Erro ao buscar custos do item {item_id}: {costs_error}")
-                    
-                    # Verificar se o anúncio já existe
-                    existing_announcement = db.query(MercadoLivreAnnouncement).filter(
-                        MercadoLivreAnnouncement.ml_item_id == item_id,
-                        MercadoLivreAnnouncement.company_id == current_user.company_id
-                    ).first()
-                    
-                    # Preparar dados para inserção/atualização
-                    announcement_data = {
-                        "company_id": current_user.company_id,
-                        "ml_item_id": item_id,
-                        "title": item_data.get("title", ""),
-                        "price": float(item_data.get("price", 0)),
-                        "currency_id": item_data.get("currency_id", "BRL"),
-                        "available_quantity": item_data.get("available_quantity", 0),
-                        "sold_quantity": item_data.get("sold_quantity", 0),
-                        "condition": item_data.get("condition", ""),
-                        "status": item_data.get("status", ""),
-                        "permalink": item_data.get("permalink"),
-                        "thumbnail": item_data.get("thumbnail"),
-                        "listing_type_id": item_data.get("listing_type_id"),
-                        "listing_type_name": item_data.get("listing_type_name"),
-                        "listing_exposure": item_data.get("listing_exposure"),
-                        "category_id": item_data.get("category_id"),
-                        "domain_id": item_data.get("domain_id"),
-                        
-                        # Campos de custos
-                        "listing_fee_amount": float(item_data.get("listing_fee_amount", 0)) if item_data.get("listing_fee_amount") is not None else None,
-                        "sale_fee_amount": float(item_data.get("sale_fee_amount", 0)) if item_data.get("sale_fee_amount") is not None else None,
-                        "sale_fee_percentage": float(item_data.get("sale_fee_percentage", 0)) if item_data.get("sale_fee_percentage") is not None else None,
-                        "sale_fee_fixed": float(item_data.get("sale_fee_fixed", 0)) if item_data.get("sale_fee_fixed") is not None else None,
-                        "total_cost": float(item_data.get("total_cost", 0)) if item_data.get("total_cost") is not None else None,
-                        "requires_picture": item_data.get("requires_picture"),
-                        "free_relist": item_data.get("free_relist"),
-                        "catalog_listing": item_data.get("catalog_listing", False),
-                        "catalog_product_id": item_data.get("catalog_product_id"),
-                        "family_name": item_data.get("family_name"),
-                        "family_id": item_data.get("family_id"),
-                        "user_product_id": item_data.get("user_product_id"),
-                        "inventory_id": item_data.get("inventory_id"),
-                        "base_price": float(item_data.get("base_price", 0)) if item_data.get("base_price") else None,
-                        "original_price": float(item_data.get("original_price", 0)) if item_data.get("original_price") else None,
-                        "sale_price": float(item_data.get("sale_price", 0)) if item_data.get("sale_price") else None,
-                        "catalog_status": item_data.get("catalog_status"),
-                        "catalog_visit_share": item_data.get("catalog_visit_share"),
-                        "catalog_competitors_sharing": item_data.get("catalog_competitors_sharing"),
-                        "catalog_price_to_win": float(item_data.get("catalog_price_to_win", 0)) if item_data.get("catalog_price_to_win") else None,
-                        "full_data": item_data,
-                        "sale_price_info": item_data.get("sale_price_info"),
-                        "prices_info": item_data.get("prices_info"),
-                        "catalog_position_info": item_data.get("catalog_position_info"),
-                        "attributes": item_data.get("attributes"),
-                        "pictures": item_data.get("pictures"),
-                        "tags": item_data.get("tags"),
-                        "ml_date_created": datetime.fromisoformat(item_data.get("date_created", "").replace("Z", "+00:00")) if item_data.get("date_created") else None,
-                        "ml_last_updated": datetime.fromisoformat(item_data.get("last_updated", "").replace("Z", "+00:00")) if item_data.get("last_updated") else None,
-                        "updated_at": datetime.utcnow()
-                    }
-                    
-                    if existing_announcement:
-                        # Atualizar anúncio existente
-                        for key, value in announcement_data.items():
-                            if key != "company_id" and key != "ml_item_id":
-                                setattr(existing_announcement, key, value)
-                        updated_count += 1
-                    else:
-                        # Criar novo anúncio
-                        announcement_data["created_at"] = datetime.utcnow()
-                        new_announcement = MercadoLivreAnnouncement(**announcement_data)
-                        db.add(new_announcement)
-                        synced_count += 1
-                        
-                except Exception as e:
-                    logger.warning(f"Erro ao processar item {item_id}: {e}")
-                    continue
-            
-            # Salvar todas as mudanças
-            db.commit()
-            
-            return {
-                "message": f"Sincronização concluída com sucesso!",
-                "synced": synced_count,
-                "updated": updated_count,
-                "total_processed": synced_count + updated_count,
-                "total_found": len(all_item_ids)
-            }
-            
+        valid_token = credentials.access_token
+        
+        # Valores copiados antes do commit do job, que expira os objetos da sessão
+        company_id = current_user.company_id
+        
+        async def run_sync(job_db: Session, progress, access_token: str):
+            return await announcement_sync_service.sync_announcements(
+                job_db,
+                client,
+                access_token,
+                company_id,
+                credentials.user_id,
+                incremental=incremental,
+                progress=progress,
+                resume=resume
+            )
+        
+        if background:
+            job = await job_runner.submit(
+                db, company_id, "announcements", run_sync,
+                params={"incremental": incremental, "resume": resume}
+            )
+            return SyncJobSchema.from_orm(job)
+        
+        return await run_sync(db, None, valid_token)
+        
+    except HTTPException:
+        raise
     except httpx.HTTPStatusError as e:
         logger.error(f"Erro HTTP ao sincronizar anúncios: {e}")
         raise HTTPException(
@@ -1004,14 +784,15 @@ async def sync_announcements(
 async def get_catalog_competitors(
     product_id: str,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    client: httpx.AsyncClient = Depends(get_ml_client)
 ):
     """Obtém lista de concorrentes no catálogo para um produto específico."""
     try:
         # Primeiro, tentar buscar do banco de dados
-        competitors_from_db = db.query(CatalogCompetitor).filter(
+        competitors_from_db = await run_in_session(db, lambda: db.query(CatalogCompetitor).filter(
             CatalogCompetitor.catalog_product_id == product_id
-        ).order_by(CatalogCompetitor.price.asc()).all()
+        ).order_by(CatalogCompetitor.price.asc()).all())
         
         if competitors_from_db:
             # Converter para formato compatível com o frontend
@@ -1055,7 +836,7 @@ async def get_catalog_competitors(
         logger.info(f"Nenhum concorrente encontrado no banco para produto {product_id}, buscando da API")
         
         # Obter token válido
-        valid_token = mercado_livre_service.get_valid_token(db, current_user.company_id)
+        valid_token = await mercado_livre_service.get_valid_token(db, current_user.company_id)
         
         if not valid_token:
             logger.warning(f"Token inválido ou expirado para empresa {current_user.company_id}")
@@ -1065,79 +846,66 @@ async def get_catalog_competitors(
             )
         
         # Buscar concorrentes do catálogo usando a API do Mercado Livre
-        async with httpx.AsyncClient() as client:
-            headers = {"Authorization": f"Bearer {valid_token}"}
-            
-            # Usar o endpoint recomendado pela documentação para obter concorrentes do catálogo
-            response = await client.get(
-                f"https://api.mercadolibre.com/products/{product_id}/items",
-                headers=headers
-            )
-            
-            if response.status_code == 404:
-                return []
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            logger.info(f"Dados recebidos da API: {data}")
-            
-            # Processar os resultados para extrair informações relevantes
-            competitors = []
-            for item in data.get("results", []):
-                # Obter informações do vendedor
-                seller_info = {}
-                if item.get("seller_id"):
-                    try:
-                        seller_response = await client.get(
-                            f"https://api.mercadolibre.com/users/{item.get('seller_id')}",
-                            headers=headers
-                        )
-                        if seller_response.status_code == 200:
-                            seller_data = seller_response.json()
-                            seller_info = {
-                                "nickname": seller_data.get("nickname"),
-                                "reputation_level_id": seller_data.get("seller_reputation", {}).get("level_id"),
-                                "power_seller_status": seller_data.get("seller_reputation", {}).get("power_seller_status"),
-                                "transactions": seller_data.get("seller_reputation", {}).get("transactions", {})
-                            }
-                    except Exception as e:
-                        logger.warning(f"Erro ao obter informações do vendedor {item.get('seller_id')}: {e}")
-                
-                # Usar os dados diretamente da resposta da API de concorrentes
-                competitor = {
-                    "item_id": item.get("item_id"),
-                    "price": item.get("price"),
-                    "original_price": item.get("original_price"),
-                    "condition": item.get("condition"),
-                    "available_quantity": item.get("available_quantity", 0),
-                    "sold_quantity": item.get("sold_quantity", 0),
-                    "shipping": {
-                        "free_shipping": item.get("shipping", {}).get("free_shipping", False),
-                        "mode": item.get("shipping", {}).get("mode"),
-                        "logistic_type": item.get("shipping", {}).get("logistic_type"),
-                        "tags": item.get("shipping", {}).get("tags", [])
-                    },
-                    "seller": {
-                        "nickname": seller_info.get("nickname", "Vendedor"),
-                        "reputation_level_id": seller_info.get("reputation_level_id"),
-                        "seller_id": item.get("seller_id"),
-                        "power_seller_status": seller_info.get("power_seller_status"),
-                        "transactions": seller_info.get("transactions", {})
-                    },
-                    "listing_type_id": item.get("listing_type_id"),
-                    "tags": item.get("tags", []),
-                    "deal_ids": item.get("deal_ids", []),
-                    "title": item.get("title", ""),
-                    "permalink": item.get("permalink", "")
-                }
-                competitors.append(competitor)
-            
-            # Ordenar por preço (menor primeiro)
-            competitors.sort(key=lambda x: x.get("price", 0))
-            
-            return competitors
+        headers = {"Authorization": f"Bearer {valid_token}"}
+        
+        # Usar o endpoint recomendado pela documentação para obter concorrentes do catálogo
+        response = await client.get(
+            f"https://api.mercadolibre.com/products/{product_id}/items",
+            headers=headers
+        )
+        
+        if response.status_code == 404:
+            return []
+        
+        response.raise_for_status()
+        data = response.json()
+        
+        logger.info(f"Dados recebidos da API: {data}")
+        
+        # Perfis dos vendedores vêm do cache; só os desconhecidos são buscados
+        sellers = await seller_cache.get_sellers(
+            client, headers, (item.get("seller_id") for item in data.get("results", []))
+        )
+        
+        # Processar os resultados para extrair informações relevantes
+        competitors = []
+        for item in data.get("results", []):
+            seller_info = sellers.get(str(item.get("seller_id")), {})
             
+            # Usar os dados diretamente da resposta da API de concorrentes
+            competitor = {
+                "item_id": item.get("item_id"),
+                "price": item.get("price"),
+                "original_price": item.get("original_price"),
+                "condition": item.get("condition"),
+                "available_quantity": item.get("available_quantity", 0),
+                "sold_quantity": item.get("sold_quantity", 0),
+                "shipping": {
+                    "free_shipping": item.get("shipping", {}).get("free_shipping", False),
+                    "mode": item.get("shipping", {}).get("mode"),
+                    "logistic_type": item.get("shipping", {}).get("logistic_type"),
+                    "tags": item.get("shipping", {}).get("tags", [])
+                },
+                "seller": {
+                    "nickname": seller_info.get("nickname", "Vendedor"),
+                    "reputation_level_id": seller_info.get("reputation_level"),
+                    "seller_id": item.get("seller_id"),
+                    "power_seller_status": seller_info.get("power_status"),
+                    "transactions": seller_info.get("transactions", {})
+                },
+                "listing_type_id": item.get("listing_type_id"),
+                "tags": item.get("tags", []),
+                "deal_ids": item.get("deal_ids", []),
+                "title": item.get("title", ""),
+                "permalink": item.get("permalink", "")
+            }
+            competitors.append(competitor)
+        
+        # Ordenar por preço (menor primeiro)
+        competitors.sort(key=lambda x: x.get("price", 0))
+        
+        return competitors
+        
     except httpx.HTTPStatusError as e:
         logger.error(f"Erro HTTP ao buscar concorrentes: {e}")
         if e.response.status_code == 404:
@@ -1158,170 +926,113 @@ async def get_catalog_competitors(
             detail="Erro interno ao buscar concorrentes"
         )
 
+@router.post("/catalog-competitors/sync")
+async def sync_all_catalog_competitors(
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    due_only: bool = Query(True, description="Atualiza apenas os produtos cujo intervalo de atualização venceu"),
+    background: bool = Query(True, description="Executa em segundo plano e retorna o job"),
+    client: httpx.AsyncClient = Depends(get_ml_client)
+):
+    """Atualiza os concorrentes de todos os anúncios de catálogo da empresa.
+    
+    Cada produto tem um intervalo de atualização adaptativo: menor quando a
+    buy box muda com frequência e maior enquanto ela fica estável.
+    """
+    try:
+        try:
+            credentials = await token_manager.get_credentials(db, current_user.company_id)
+        except TokenRefreshError:
+            credentials = None
+        
+        if not credentials:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Token inválido ou expirado. Reconecte sua conta do Mercado Livre."
+            )
+        
+        valid_token = credentials.access_token
+        
+        # Valores copiados antes do commit do job, que expira os objetos da sessão
+        company_id = current_user.company_id
+        
+        async def run_sync(job_db: Session, progress, access_token: str):
+            return await catalog_sync_service.sync_company(
+                job_db,
+                client,
+                access_token,
+                company_id,
+                due_only=due_only,
+                progress=progress
+            )
+        
+        if background:
+            job = await job_runner.submit(
+                db, company_id, "catalog_competitors_bulk", run_sync,
+                params={"due_only": due_only}
+            )
+            return SyncJobSchema.from_orm(job)
+        
+        return await run_sync(db, None, valid_token)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao atualizar concorrentes dos produtos de catálogo: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro interno ao atualizar concorrentes"
+        )
+
 @router.post("/catalog-competitors/sync/{catalog_product_id}")
 async def sync_catalog_competitors(
     catalog_product_id: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    background: bool = Query(False, description="Executa em segundo plano e retorna o job"),
+    client: httpx.AsyncClient = Depends(get_ml_client)
 ):
     """Sincroniza concorrentes do catálogo salvando no banco de dados."""
     try:
         # Buscar qualquer integração ativa (dados públicos)
         from app.models import MercadoLivreIntegration
-        integration = db.query(MercadoLivreIntegration).filter(
+        integration = await run_in_session(db, lambda: db.query(MercadoLivreIntegration).filter(
             MercadoLivreIntegration.is_active == True
-        ).first()
+        ).first())
         
-        if not integration:
+        valid_token = None
+        if integration:
+            valid_token = await mercado_livre_service.get_valid_token(db, integration.company_id)
+        
+        if not valid_token:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Nenhuma integração ativa encontrada."
             )
         
-        valid_token = integration.access_token
+        # Valores copiados antes do commit do job, que expira os objetos da sessão
+        company_id = integration.company_id
+        
+        async def run_sync(job_db: Session, progress, access_token: str):
+            return await catalog_sync_service.sync_catalog_product(
+                job_db,
+                client,
+                access_token,
+                company_id,
+                catalog_product_id,
+                progress=progress
+            )
         
-        # Buscar concorrentes do catálogo usando a API do Mercado Livre
-        async with httpx.AsyncClient() as client:
-            headers = {"Authorization": f"Bearer {valid_token}"}
-            
-            response = await client.get(
-                f"https://api.mercadolibre.com/products/{catalog_product_id}/items",
-                headers=headers
+        if background:
+            job = await job_runner.submit(
+                db, company_id, "catalog_competitors", run_sync,
+                params={"catalog_product_id": catalog_product_id}
             )
-            
-            if response.status_code == 404:
-                return {"message": "Produto do catálogo não encontrado", "synced": 0, "removed": 0}
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            # Obter lista atual de concorrentes no banco para este produto
-            existing_competitors = db.query(CatalogCompetitor).filter(
-                CatalogCompetitor.catalog_product_id == catalog_product_id
-            ).all()
-            
-            existing_item_ids = {comp.item_id for comp in existing_competitors}
-            current_item_ids = set()
-            
-            # Processar os resultados da API
-            synced_count = 0
-            for item in data.get("results", []):
-                item_id = item.get("item_id")
-                if not item_id:
-                    continue
-                    
-                current_item_ids.add(item_id)
-                
-                # Obter informações do vendedor
-                seller_info = {}
-                if item.get("seller_id"):
-                    try:
-                        seller_response = await client.get(
-                            f"https://api.mercadolibre.com/users/{item.get('seller_id')}",
-                            headers=headers
-                        )
-                        if seller_response.status_code == 200:
-                            seller_data = seller_response.json()
-                            seller_info = {
-                                "nickname": seller_data.get("nickname"),
-                                "reputation_level": seller_data.get("seller_reputation", {}).get("level_id"),
-                                "power_status": seller_data.get("seller_reputation", {}).get("power_seller_status"),
-                                "transactions_total": seller_data.get("seller_reputation", {}).get("transactions", {}).get("total", 0)
-                            }
-                    except Exception as e:
-                        logger.warning(f"Erro ao obter informações do vendedor {item.get('seller_id')}: {e}")
-                
-                # Obter informações de preços (original_price se houver desconto)
-                original_price = None
-                if item.get("original_price") and item.get("original_price") != item.get("price"):
-                    original_price = item.get("original_price")
-                
-                # Criar URL do anúncio
-                product_title = item.get("title", "")
-                import re
-                clean_title = re.sub(r'[^a-z0-9\s-]', '', product_title.lower())
-                clean_title = re.sub(r'\s+', '-', clean_title)
-                clean_title = re.sub(r'-+', '-', clean_title)
-                clean_title = clean_title.strip('-')
-                item_url = f"https://produto.mercadolivre.com.br/{item_id}-{clean_title}"
-                
-                # Verificar se já existe no banco
-                existing_competitor = db.query(CatalogCompetitor).filter(
-                    CatalogCompetitor.item_id == item_id
-                ).first()
-                
-                if existing_competitor:
-                    # Atualizar dados existentes
-                    existing_competitor.title = item.get("title", "")
-                    existing_competitor.price = item.get("price", 0)
-                    existing_competitor.original_price = item.get("original_price")
-                    existing_competitor.condition = item.get("condition", "")
-                    existing_competitor.available_quantity = item.get("available_quantity", 0)
-                    existing_competitor.sold_quantity = item.get("sold_quantity", 0)
-                    existing_competitor.permalink = item.get("permalink", "")
-                    existing_competitor.url = item_url
-                    existing_competitor.seller_nickname = seller_info.get("nickname")
-                    existing_competitor.seller_reputation_level = seller_info.get("reputation_level")
-                    existing_competitor.seller_power_status = seller_info.get("power_status")
-                    existing_competitor.seller_transactions_total = seller_info.get("transactions_total", 0)
-                    existing_competitor.shipping_mode = item.get("shipping", {}).get("mode")
-                    existing_competitor.shipping_logistic_type = item.get("shipping", {}).get("logistic_type")
-                    existing_competitor.shipping_free = item.get("shipping", {}).get("free_shipping", False)
-                    existing_competitor.shipping_tags = item.get("shipping", {}).get("tags", [])
-                    existing_competitor.listing_type_id = item.get("listing_type_id")
-                    existing_competitor.tags = item.get("tags", [])
-                    existing_competitor.deal_ids = item.get("deal_ids", [])
-                    existing_competitor.ml_date_created = datetime.fromisoformat(item.get("date_created", "").replace("Z", "+00:00")) if item.get("date_created") else None
-                    existing_competitor.ml_last_updated = datetime.fromisoformat(item.get("last_updated", "").replace("Z", "+00:00")) if item.get("last_updated") else None
-                    existing_competitor.updated_at = datetime.utcnow()
-                else:
-                    # Criar novo registro
-                    new_competitor = CatalogCompetitor(
-                        company_id=integration.company_id,
-                        catalog_product_id=catalog_product_id,
-                        item_id=item_id,
-                        title=item.get("title", ""),
-                        price=item.get("price", 0),
-                        original_price=item.get("original_price"),
-                        condition=item.get("condition", ""),
-                        available_quantity=item.get("available_quantity", 0),
-                        sold_quantity=item.get("sold_quantity", 0),
-                        permalink=item.get("permalink", ""),
-                        url=item_url,
-                        seller_id=str(item.get("seller_id", "")),
-                        seller_nickname=seller_info.get("nickname"),
-                        seller_reputation_level=seller_info.get("reputation_level"),
-                        seller_power_status=seller_info.get("power_status"),
-                        seller_transactions_total=seller_info.get("transactions_total", 0),
-                        shipping_mode=item.get("shipping", {}).get("mode"),
-                        shipping_logistic_type=item.get("shipping", {}).get("logistic_type"),
-                        shipping_free=item.get("shipping", {}).get("free_shipping", False),
-                        shipping_tags=item.get("shipping", {}).get("tags", []),
-                        listing_type_id=item.get("listing_type_id"),
-                        tags=item.get("tags", []),
-                        deal_ids=item.get("deal_ids", []),
-                        ml_date_created=datetime.fromisoformat(item.get("date_created", "").replace("Z", "+00:00")) if item.get("date_created") else None,
-                        ml_last_updated=datetime.fromisoformat(item.get("last_updated", "").replace("Z", "+00:00")) if item.get("last_updated") else None
-                    )
-                    db.add(new_competitor)
-                
-                synced_count += 1
-            
-            # Remover concorrentes que não estão mais na API
-            removed_count = 0
-            for competitor in existing_competitors:
-                if competitor.item_id not in current_item_ids:
-                    db.delete(competitor)
-                    removed_count += 1
-            
-            db.commit()
-            
-            return {
-                "message": f"Sincronização concluída para o produto {catalog_product_id}",
-                "synced": synced_count,
-                "removed": removed_count,
-                "total_current": len(current_item_ids)
-            }
-            
+            return SyncJobSchema.from_orm(job)
+        
+        return await run_sync(db, None, valid_token)
+        
+    except HTTPException:
+        raise
     except httpx.HTTPStatusError as e:
         logger.error(f"Erro HTTP ao sincronizar concorrentes: {e}")
         if e.response.status_code == 404:
@@ -1337,52 +1048,33 @@ async def sync_catalog_competitors(
             detail="Erro interno ao sincronizar concorrentes"
         )
 
-@router.get("/catalog-competitors/db/{catalog_product_id}")
+@router.get("/catalog-competitors/db/{catalog_product_id}", response_model=List[CatalogCompetitorItem])
 async def get_catalog_competitors_from_db(
     catalog_product_id: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Obtém concorrentes do catálogo salvos no banco de dados."""
+    """Obtém concorrentes do catálogo salvos no banco de dados.
+    
+    Com If-None-Match e nenhum concorrente alterado, responde 304 sem ler os concorrentes.
+    """
     try:
-        competitors = db.query(CatalogCompetitor).filter(
-            CatalogCompetitor.catalog_product_id == catalog_product_id
-        ).order_by(CatalogCompetitor.price.asc()).all()
+        version = await data_version(db, "catalog_competitors", catalog_product_id)
+        unchanged = not_modified(
+            request, response, request_etag(request, "catalog_competitors", catalog_product_id, version)
+        )
+        if unchanged:
+            return unchanged
         
-        # Converter para formato compatível com o frontend
-        result = []
-        for comp in competitors:
-            competitor_data = {
-                "item_id": comp.item_id,
-                "title": comp.title,
-                "price": float(comp.price),
-                "original_price": float(comp.original_price) if comp.original_price else None,
-                "condition": comp.condition,
-                "available_quantity": comp.available_quantity,
-                "sold_quantity": comp.sold_quantity,
-                "url": comp.url,
-                "manual_url": comp.manual_url,
-                "seller": {
-                    "seller_id": comp.seller_id,
-                    "nickname": comp.seller_nickname,
-                    "reputation_level_id": comp.seller_reputation_level,
-                    "power_seller_status": comp.seller_power_status,
-                    "transactions": {
-                        "total": comp.seller_transactions_total
-                    }
-                },
-                "shipping": {
-                    "mode": comp.shipping_mode,
-                    "logistic_type": comp.shipping_logistic_type,
-                    "free_shipping": comp.shipping_free,
-                    "tags": comp.shipping_tags or []
-                },
-                "listing_type_id": comp.listing_type_id,
-                "tags": comp.tags or [],
-                "deal_ids": comp.deal_ids or []
-            }
-            result.append(competitor_data)
+        competitors = (await db.execute(
+            select(CatalogCompetitor).where(
+                CatalogCompetitor.catalog_product_id == catalog_product_id
+            ).order_by(CatalogCompetitor.price.asc())
+        )).scalars().all()
         
-        return result
+        # Converter para formato compatível com o frontend
+        return [CatalogCompetitorItem.model_validate(comp) for comp in competitors]
         
     except Exception as e:
         logger.error(f"Erro ao buscar concorrentes do banco: {e}")
@@ -1391,19 +1083,52 @@ async def get_catalog_competitors_from_db(
             detail="Erro interno ao buscar concorrentes"
         )
 
+@router.get("/catalog-competitors/db/{catalog_product_id}/history")
+async def get_catalog_competitors_history(
+    catalog_product_id: str,
+    item_id: Optional[str] = Query(None, description="Filtra um único concorrente"),
+    date_from: Optional[datetime] = Query(None, description="Início do período (padrão: 30 dias atrás)"),
+    date_to: Optional[datetime] = Query(None, description="Fim do período (padrão: agora)"),
+    points: int = Query(200, ge=2, le=2000, description="Número máximo de pontos por concorrente"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Histórico de preço e estoque dos concorrentes, reduzido para gráficos."""
+    try:
+        date_to = to_utc_naive(date_to) or datetime.utcnow()
+        date_from = to_utc_naive(date_from) or date_to - timedelta(days=HISTORY_DEFAULT_DAYS)
+        if date_from >= date_to:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="date_from deve ser anterior a date_to"
+            )
+        
+        return await db.run_sync(
+            catalog_sync_service.get_price_history,
+            catalog_product_id, date_from, date_to, points, item_id=item_id
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao buscar histórico de concorrentes: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro interno ao buscar histórico de concorrentes"
+        )
+
 @router.put("/catalog-competitors/{item_id}/manual-url")
 async def update_manual_url(
     item_id: str,
     request_data: dict,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Atualiza a URL manual de um concorrente do catálogo."""
     try:
         manual_url = request_data.get("manual_url", "")
         
-        competitor = db.query(CatalogCompetitor).filter(
+        competitor = await db.scalar(select(CatalogCompetitor).where(
             CatalogCompetitor.item_id == item_id
-        ).first()
+        ))
         
         if not competitor:
             raise HTTPException(
@@ -1413,7 +1138,8 @@ async def update_manual_url(
         
         competitor.manual_url = manual_url
         competitor.updated_at = datetime.utcnow()
-        db.commit()
+        await db.execute(version_bump("catalog_competitors", competitor.catalog_product_id))
+        await db.commit()
         
         return {"message": "URL manual atualizada com sucesso", "item_id": item_id, "manual_url": manual_url}
         
@@ -1431,15 +1157,15 @@ async def update_announcement_additional_info(
     item_id: str,
     additional_info: dict,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Atualizar informações adicionais de um anúncio"""
     try:
         # Buscar o anúncio
-        announcement = db.query(MercadoLivreAnnouncement).filter(
+        announcement = await db.scalar(select(MercadoLivreAnnouncement).where(
             MercadoLivreAnnouncement.ml_item_id == item_id,
             MercadoLivreAnnouncement.company_id == current_user.company_id
-        ).first()
+        ))
         
         if not announcement:
             raise HTTPException(status_code=404, detail="Anúncio não encontrado")
@@ -1459,8 +1185,8 @@ async def update_announcement_additional_info(
             announcement.additional_notes = additional_info["additional_notes"]
         
         # Salvar no banco
-        db.commit()
-        db.refresh(announcement)
+        await db.execute(version_bump("announcements", current_user.company_id))
+        await db.commit()
         
         return {"message": "Informações adicionais atualizadas com sucesso"}
         
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models import User, Company
-from app.schemas import UserWithCompany, Company
+from app.schemas import UserWithCompany, Company as CompanySchema
 from app.auth import get_current_user
 
 router = APIRouter()
@@ -16,25 +17,25 @@ async def read_user_me(current_user: User = Depends(get_current_user)):
 async def update_user_me(
     name: str = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update current user information."""
     if name:
         current_user.name = name
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user, attribute_names=["name", "updated_at", "company"])
     return current_user
 
-@router.put("/company", response_model=Company)
+@router.put("/company", response_model=CompanySchema)
 async def update_user_company(
     company_name: str = None,
     company_cnpj: str = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update current user's company information."""
-    company = db.query(Company).filter(Company.id == current_user.company_id).first()
+    company = await db.scalar(select(Company).where(Company.id == current_user.company_id))
     
     if not company:
         raise HTTPException(
@@ -47,10 +48,10 @@ async def update_user_company(
     
     if company_cnpj:
         # Check if CNPJ already exists for another company
-        existing_company = db.query(Company).filter(
+        existing_company = await db.scalar(select(Company).where(
             Company.cnpj == company_cnpj,
             Company.id != company.id
-        ).first()
+        ))
         if existing_company:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -58,7 +59,7 @@ async def update_user_company(
             )
         company.cnpj = company_cnpj
     
-    db.commit()
-    db.refresh(company)
+    await db.commit()
+    await db.refresh(company)
     return company
 
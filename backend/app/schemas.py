@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
+from typing import Any, Optional, List
+from datetime import date, datetime
 from decimal import Decimal
 
 # Company Schemas
@@ -198,6 +198,24 @@ class ProductResponse(BaseModel):
     family_id: Optional[str] = None
     inventory_id: Optional[str] = None  # Campo para identificar produtos Full
 
+# Sync Job Schemas
+class SyncJob(BaseModel):
+    id: int
+    company_id: int
+    job_type: str
+    status: str
+    params: Optional[dict] = None
+    progress_current: Optional[int] = None
+    progress_total: Optional[int] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
 class ProductCreate(BaseModel):
     title: str
     price: float
@@ -217,3 +235,347 @@ class ProductUpdate(BaseModel):
     category_id: Optional[str] = None
     pictures: Optional[List[str]] = None
     attributes: Optional[List[dict]] = None
+
+# Listagens do banco local
+# Lidas direto dos objetos do SQLAlchemy (from_attributes); Decimal e datetime
+# são convertidos na serialização do Pydantic, sem passar pelo jsonable_encoder.
+
+class AnnouncementListItem(BaseModel):
+    id: str = Field(validation_alias="ml_item_id")
+    title: str
+    price: float
+    currency_id: str
+    available_quantity: Optional[int] = None
+    sold_quantity: Optional[int] = None
+    condition: str
+    status: str
+    permalink: Optional[str] = None
+    thumbnail: Optional[str] = None
+    listing_type_id: Optional[str] = None
+    listing_type_name: Optional[str] = None
+    listing_exposure: Optional[str] = None
+    category_id: Optional[str] = None
+    domain_id: Optional[str] = None
+    
+    # Campos de custos
+    listing_fee_amount: Optional[float] = None
+    sale_fee_amount: Optional[float] = None
+    sale_fee_percentage: Optional[float] = None
+    sale_fee_fixed: Optional[float] = None
+    total_cost: Optional[float] = None
+    requires_picture: Optional[bool] = None
+    free_relist: Optional[bool] = None
+    
+    # Campos de informações adicionais de custos
+    product_cost: Optional[float] = None
+    taxes: Optional[str] = None
+    ads_cost: Optional[str] = None
+    shipping_cost: Optional[float] = None
+    additional_fees: Optional[str] = None
+    additional_notes: Optional[str] = None
+    
+    catalog_listing: Optional[bool] = None
+    catalog_product_id: Optional[str] = None
+    family_name: Optional[str] = None
+    family_id: Optional[str] = None
+    user_product_id: Optional[str] = None
+    inventory_id: Optional[str] = None
+    base_price: Optional[float] = None
+    original_price: Optional[float] = None
+    sale_price: Optional[float] = None
+    catalog_status: Optional[str] = None
+    catalog_visit_share: Optional[str] = None
+    catalog_competitors_sharing: Optional[int] = None
+    catalog_price_to_win: Optional[float] = None
+    sale_price_info: Optional[Any] = None
+    tags: Optional[Any] = None
+    date_created: Optional[datetime] = Field(None, validation_alias="ml_date_created")
+    last_updated: Optional[datetime] = Field(None, validation_alias="ml_last_updated")
+    removed_at: Optional[datetime] = Field(None, validation_alias="ml_removed_at")
+    
+    class Config:
+        from_attributes = True
+        # Campos JSON pedidos em include= entram como extras
+        extra = "allow"
+
+class AnnouncementPage(BaseModel):
+    products: List[AnnouncementListItem]
+    total: Optional[int] = None
+    limit: int
+    offset: int
+    has_more: bool
+    next_cursor: Optional[str] = None
+
+class OrderBuyer(BaseModel):
+    id: str
+    nickname: Optional[str] = None
+    email: Optional[str] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    phone: Optional[str] = None
+
+class OrderSeller(BaseModel):
+    id: str
+    nickname: Optional[str] = None
+    email: Optional[str] = None
+
+class OrderShipping(BaseModel):
+    id: Optional[str] = None
+    status: Optional[str] = None
+    cost: Optional[float] = None
+
+class OrderPayment(BaseModel):
+    method_id: Optional[str] = None
+    type: Optional[str] = None
+    status: Optional[str] = None
+    installments: Optional[int] = None
+
+class OrderFeedbackEntry(BaseModel):
+    rating: Optional[str] = None
+    fulfilled: Optional[bool] = None
+
+class OrderFeedback(BaseModel):
+    sale: OrderFeedbackEntry
+    purchase: OrderFeedbackEntry
+
+class OrderListItem(BaseModel):
+    id: int
+    order_id: str
+    status: str
+    total_amount: float
+    paid_amount: Optional[float] = None
+    currency_id: str
+    date_created: Optional[datetime] = None
+    date_closed: Optional[datetime] = None
+    buyer: OrderBuyer
+    seller: OrderSeller
+    shipping: OrderShipping
+    payment: OrderPayment
+    feedback: OrderFeedback
+    ml_date_created: Optional[datetime] = None
+    ml_last_updated: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+        # Campos JSON pedidos em include= entram como extras
+        extra = "allow"
+    
+    @model_validator(mode="before")
+    @classmethod
+    def group_columns(cls, order: Any) -> Any:
+        """Agrupa as colunas planas do pedido (buyer_*, shipping_* etc.) nos objetos da resposta."""
+        if isinstance(order, dict):
+            return order
+        return {
+            "id": order.id,
+            "order_id": order.order_id,
+            "status": order.status,
+            "total_amount": order.total_amount,
+            "paid_amount": order.paid_amount,
+            "currency_id": order.currency_id,
+            "date_created": order.date_created,
+            "date_closed": order.date_closed,
+            "buyer": {
+                "id": order.buyer_id,
+                "nickname": order.buyer_nickname,
+                "email": order.buyer_email,
+                "first_name": order.buyer_first_name,
+                "last_name": order.buyer_last_name,
+                "phone": order.buyer_phone
+            },
+            "seller": {
+                "id": order.seller_id,
+                "nickname": order.seller_nickname,
+                "email": order.seller_email
+            },
+            "shipping": {
+                "id": order.shipping_id,
+                "status": order.shipping_status,
+                "cost": order.shipping_cost
+            },
+            "payment": {
+                "method_id": order.payment_method_id,
+                "type": order.payment_type,
+                "status": order.payment_status,
+                "installments": order.payment_installments
+            },
+            "feedback": {
+                "sale": {
+                    "rating": order.feedback_sale_rating,
+                    "fulfilled": order.feedback_sale_fulfilled
+                },
+                "purchase": {
+                    "rating": order.feedback_purchase_rating,
+                    "fulfilled": order.feedback_purchase_fulfilled
+                }
+            },
+            "ml_date_created": order.ml_date_created,
+            "ml_last_updated": order.ml_last_updated
+        }
+
+class OrderPagination(BaseModel):
+    total: Optional[int] = None
+    limit: int
+    offset: int
+    has_more: bool
+    next_cursor: Optional[str] = None
+
+class OrderPage(BaseModel):
+    success: bool = True
+    orders: List[OrderListItem]
+    pagination: OrderPagination
+    timestamp: datetime
+
+class CatalogCompetitorTransactions(BaseModel):
+    total: Optional[int] = None
+
+class CatalogCompetitorSeller(BaseModel):
+    seller_id: str
+    nickname: Optional[str] = None
+    reputation_level_id: Optional[str] = None
+    power_seller_status: Optional[str] = None
+    transactions: CatalogCompetitorTransactions
+
+class CatalogCompetitorShipping(BaseModel):
+    mode: Optional[str] = None
+    logistic_type: Optional[str] = None
+    free_shipping: Optional[bool] = None
+    tags: List[Any] = []
+
+class CatalogCompetitorItem(BaseModel):
+    item_id: str
+    title: str
+    price: float
+    original_price: Optional[float] = None
+    condition: str
+    available_quantity: Optional[int] = None
+    sold_quantity: Optional[int] = None
+    url: Optional[str] = None
+    manual_url: Optional[str] = None
+    seller: CatalogCompetitorSeller
+    shipping: CatalogCompetitorShipping
+    listing_type_id: Optional[str] = None
+    tags: List[Any] = []
+    deal_ids: List[Any] = []
+    
+    class Config:
+        from_attributes = True
+    
+    @model_validator(mode="before")
+    @classmethod
+    def group_columns(cls, competitor: Any) -> Any:
+        """Agrupa as colunas do vendedor e do envio nos objetos esperados pelo frontend."""
+        if isinstance(competitor, dict):
+            return competitor
+        return {
+            "item_id": competitor.item_id,
+            "title": competitor.title,
+            "price": competitor.price,
+            "original_price": competitor.original_price,
+            "condition": competitor.condition,
+            "available_quantity": competitor.available_quantity,
+            "sold_quantity": competitor.sold_quantity,
+            "url": competitor.url,
+            "manual_url": competitor.manual_url,
+            "seller": {
+                "seller_id": competitor.seller_id,
+                "nickname": competitor.seller_nickname,
+                "reputation_level_id": competitor.seller_reputation_level,
+                "power_seller_status": competitor.seller_power_status,
+                "transactions": {
+                    "total": competitor.seller_transactions_total
+                }
+            },
+            "shipping": {
+                "mode": competitor.shipping_mode,
+                "logistic_type": competitor.shipping_logistic_type,
+                "free_shipping": competitor.shipping_free,
+                "tags": competitor.shipping_tags or []
+            },
+            "listing_type_id": competitor.listing_type_id,
+            "tags": competitor.tags or [],
+            "deal_ids": competitor.deal_ids or []
+        }
+
+class ProductAdsDataItem(BaseModel):
+    id: int
+    item_id: str
+    campaign_id: Optional[int] = None
+    advertiser_id: Optional[int] = None
+    title: str
+    price: float
+    status: str
+    has_discount: Optional[bool] = None
+    catalog_listing: Optional[bool] = None
+    logistic_type: Optional[str] = None
+    listing_type_id: Optional[str] = None
+    domain_id: Optional[str] = None
+    buy_box_winner: Optional[bool] = None
+    channel: Optional[str] = None
+    official_store_id: Optional[int] = None
+    brand_value_id: Optional[str] = None
+    brand_value_name: Optional[str] = None
+    condition: Optional[str] = None
+    current_level: Optional[str] = None
+    deferred_stock: Optional[bool] = None
+    picture_id: Optional[str] = None
+    thumbnail: Optional[str] = None
+    permalink: Optional[str] = None
+    recommended: Optional[bool] = None
+    clicks: Optional[int] = None
+    prints: Optional[int] = None
+    ctr: Optional[float] = None
+    cost: float = 0
+    cpc: Optional[float] = None
+    acos: Optional[float] = None
+    tacos: Optional[float] = None
+    organic_units_quantity: Optional[int] = None
+    organic_units_amount: float = 0
+    organic_items_quantity: Optional[int] = None
+    direct_items_quantity: Optional[int] = None
+    direct_units_quantity: Optional[int] = None
+    direct_amount: float = 0
+    indirect_items_quantity: Optional[int] = None
+    indirect_units_quantity: Optional[int] = None
+    indirect_amount: float = 0
+    advertising_items_quantity: Optional[int] = None
+    units_quantity: Optional[int] = None
+    total_amount: float = 0
+    cvr: Optional[float] = None
+    roas: Optional[float] = None
+    sov: Optional[float] = None
+    period_days: Optional[int] = None
+    impression_share: Optional[float] = None
+    top_impression_share: Optional[float] = None
+    lost_impression_share_by_budget: Optional[float] = None
+    lost_impression_share_by_ad_rank: Optional[float] = None
+    acos_benchmark: Optional[float] = None
+    campaign_name: Optional[str] = None
+    campaign_status: Optional[str] = None
+    campaign_budget: Optional[float] = None
+    campaign_acos_target: Optional[float] = None
+    campaign_strategy: Optional[str] = None
+    ml_date_created: Optional[datetime] = None
+    ml_last_updated: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    # Preenchidos quando as métricas vêm das métricas diárias
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    days_with_data: Optional[int] = None
+    
+    class Config:
+        from_attributes = True
+    
+    @field_validator("cost", "organic_units_amount", "direct_amount", "indirect_amount", "total_amount", mode="before")
+    @classmethod
+    def zero_if_missing(cls, value: Any) -> Any:
+        return value or 0
+
+class ProductAdsDbResponse(BaseModel):
+    success: bool
+    message: Optional[str] = None
+    item_id: str
+    source: Optional[str] = None
+    ads_data: Optional[ProductAdsDataItem] = None
+    timestamp: datetime
@@ -0,0 +1,532 @@
+import asyncio
+import os
+import logging
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple, Callable
+import httpx
+from sqlalchemy.orm import Session
+from app.database import run_in_session
+from app.models import MercadoLivreAnnouncement, SyncCheckpoint
+from app.services.bulk_upsert import bulk_upsert
+from app.services.etag import bump_versions
+from app.services.sync_checkpoint import sync_checkpoint_service
+from app.services.mercado_livre import mercado_livre_service, ITEM_ATTRIBUTES, ITEMS_MULTIGET_LIMIT
+
+logger = logging.getLogger(__name__)
+
+ML_API_URL = "https://api.mercadolibre.com"
+
+# Limites de concorrência (requisições simultâneas por empresa)
+DEFAULT_SYNC_CONCURRENCY = int(os.getenv("ML_SYNC_CONCURRENCY", "8"))
+MAX_SYNC_CONCURRENCY = int(os.getenv("ML_SYNC_MAX_CONCURRENCY", "32"))
+COMPANY_SYNC_CONCURRENCY = max(1, min(DEFAULT_SYNC_CONCURRENCY, MAX_SYNC_CONCURRENCY))
+
+
+def parse_ml_datetime(value: Optional[str]) -> Optional[datetime]:
+    """Converte datas ISO do Mercado Livre (com sufixo Z) para datetime."""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def select_listing_price(listing_prices_data: Any, listing_type_id: Optional[str]) -> Optional[dict]:
+    """Seleciona a entrada de listing_prices correspondente ao tipo de anúncio."""
+    if isinstance(listing_prices_data, list):
+        if listing_type_id:
+            return next(
+                (item for item in listing_prices_data if item.get("listing_type_id") == listing_type_id),
+                listing_prices_data[0] if listing_prices_data else None
+            )
+        return listing_prices_data[0] if listing_prices_data else None
+    return listing_prices_data
+
+
+class AnnouncementSyncService:
+    """Sincronização concorrente de anúncios do Mercado Livre com o banco local."""
+
+    def __init__(self):
+        # Um semáforo por empresa, com o limite configurado
+        self._company_semaphores: Dict[int, asyncio.Semaphore] = {}
+
+    def get_company_semaphore(self, company_id: int) -> asyncio.Semaphore:
+        """Obtém o semáforo da empresa, compartilhado entre sincronizações simultâneas.
+
+        O limite vem só da configuração: nenhuma chamada troca o semáforo em uso,
+        então sincronizações simultâneas da empresa nunca somam limites diferentes.
+        """
+        semaphore = self._company_semaphores.get(company_id)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(COMPANY_SYNC_CONCURRENCY)
+            self._company_semaphores[company_id] = semaphore
+        return semaphore
+
+    async def _get_json(self, client: httpx.AsyncClient, url: str, headers: dict, params: dict = None) -> Optional[Any]:
+        """GET que retorna o JSON em caso de 200 e None caso contrário."""
+        response = await client.get(url, headers=headers, params=params)
+        if response.status_code != 200:
+            return None
+        return response.json()
+
+    async def fetch_price_info(self, client: httpx.AsyncClient, headers: dict, item_id: str, item_data: dict) -> None:
+        """Busca /prices e /sale_price em paralelo e aplica os preços promocionais ao item."""
+        try:
+            prices_data, sale_price_data = await asyncio.gather(
+                self._get_json(client, f"{ML_API_URL}/items/{item_id}/prices", headers),
+                self._get_json(
+                    client,
+                    f"{ML_API_URL}/items/{item_id}/sale_price",
+                    headers,
+                    params={"context": "channel_marketplace"}
+                )
+            )
+            if prices_data is not None and sale_price_data is not None:
+                item_data["sale_price_info"] = sale_price_data
+                item_data["prices_info"] = prices_data
+
+                if sale_price_data.get("regular_amount") and sale_price_data.get("amount"):
+                    item_data["original_price"] = sale_price_data["regular_amount"]
+                    item_data["price"] = sale_price_data["amount"]
+        except Exception as price_error:
+            logger.warning(f"Erro ao buscar preços do item {item_id}: {price_error}")
+
+    async def fetch_catalog_position(self, client: httpx.AsyncClient, headers: dict, item_id: str, item_data: dict) -> None:
+        """Busca a posição no catálogo (price_to_win) e aplica ao item."""
+        try:
+            catalog_position_data = await self._get_json(
+                client,
+                f"{ML_API_URL}/items/{item_id}/price_to_win",
+                headers,
+                params={"version": "v2"}
+            )
+            if catalog_position_data is not None:
+                item_data["catalog_position_info"] = catalog_position_data
+                item_data["catalog_status"] = catalog_position_data.get("status", "unknown")
+                item_data["catalog_visit_share"] = catalog_position_data.get("visit_share", "unknown")
+                item_data["catalog_competitors_sharing"] = catalog_position_data.get("competitors_sharing_first_place", 0)
+                item_data["catalog_price_to_win"] = catalog_position_data.get("price_to_win")
+        except Exception as catalog_error:
+            logger.warning(f"Erro ao buscar posição no catálogo do item {item_id}: {catalog_error}")
+
+    async def fetch_listing_costs(self, client: httpx.AsyncClient, headers: dict, item_id: str, item_data: dict) -> None:
+        """Busca os custos oficiais (listing_prices) para o preço atual do item."""
+        try:
+            price = item_data.get("price", 0)
+            category_id = item_data.get("category_id")
+            listing_type_id = item_data.get("listing_type_id")
+            site_id = item_data.get("site_id", "MLB")
+
+            if not (price and category_id):
+                return
+
+            params = {
+                "price": price,
+                "category_id": category_id,
+                "currency_id": item_data.get("currency_id", "BRL")
+            }
+            if listing_type_id:
+                params["listing_type_id"] = listing_type_id
+
+            listing_prices_data = await self._get_json(
+                client, f"{ML_API_URL}/sites/{site_id}/listing_prices", headers, params=params
+            )
+            if listing_prices_data is None:
+                return
+
+            current_listing_data = select_listing_price(listing_prices_data, listing_type_id)
+            if not current_listing_data:
+                return
+
+            item_data["listing_type_name"] = current_listing_data.get("listing_type_name")
+            item_data["listing_exposure"] = current_listing_data.get("listing_exposure")
+            item_data["listing_fee_amount"] = current_listing_data.get("listing_fee_amount", 0)
+            item_data["sale_fee_amount"] = current_listing_data.get("sale_fee_amount", 0)
+            item_data["requires_picture"] = current_listing_data.get("requires_picture", True)
+            item_data["free_relist"] = current_listing_data.get("free_relist", False)
+
+            sale_fee_details = current_listing_data.get("sale_fee_details", {})
+            item_data["sale_fee_percentage"] = sale_fee_details.get("percentage_fee")
+            item_data["sale_fee_fixed"] = sale_fee_details.get("fixed_fee")
+
+            listing_fee = current_listing_data.get("listing_fee_amount", 0)
+            sale_fee = current_listing_data.get("sale_fee_amount", 0)
+            item_data["total_cost"] = listing_fee + sale_fee
+        except Exception as costs_error:
+            logger.warning(f"Erro ao buscar custos do item {item_id}: {costs_error}")
+
+    async def enrich_item(self, client: httpx.AsyncClient, headers: dict, item_id: str, item_data: dict) -> dict:
+        """Executa as sub-requisições independentes do item em paralelo.
+
+        Preços e posição no catálogo rodam juntos; os custos dependem do preço
+        final (promocional) e por isso são buscados em seguida.
+        """
+        await asyncio.gather(
+            self.fetch_price_info(client, headers, item_id, item_data),
+            self.fetch_catalog_position(client, headers, item_id, item_data)
+        )
+        await self.fetch_listing_costs(client, headers, item_id, item_data)
+        return item_data
+
+    async def fetch_items(
+        self,
+        client: httpx.AsyncClient,
+        headers: dict,
+        item_ids: List[str],
+        statuses: Optional[Dict[str, int]] = None
+    ) -> Dict[str, dict]:
+        """Busca os dados básicos de um lote de itens via multiget com projeção."""
+        return await mercado_livre_service.get_items(
+            client, headers, item_ids, attributes=ITEM_ATTRIBUTES, statuses=statuses
+        )
+
+    async def refresh_items(
+        self,
+        db: Session,
+        client: httpx.AsyncClient,
+        access_token: str,
+        company_id: int,
+        item_ids: List[str]
+    ) -> Tuple[int, int, List[str]]:
+        """Busca novamente e regrava apenas os itens informados (ex.: notificações).
+
+        Não faz commit. Retorna (inseridos, atualizados, IDs que não puderam ser
+        buscados). Itens que não existem mais (404) não contam como falha.
+        """
+        headers = {"Authorization": f"Bearer {access_token}"}
+        semaphore = self.get_company_semaphore(company_id)
+        statuses: Dict[str, int] = {}
+        items = await self.fetch_items(client, headers, item_ids, statuses=statuses)
+        failed_ids = [
+            item_id for item_id in item_ids
+            if item_id not in items and statuses.get(item_id) != 404
+        ]
+
+        async def enrich_with_limit(item_id: str, item_data: dict) -> dict:
+            async with semaphore:
+                return await self.enrich_item(client, headers, item_id, item_data)
+
+        enriched = await asyncio.gather(
+            *(enrich_with_limit(item_id, item_data) for item_id, item_data in items.items())
+        )
+        rows = [
+            self.build_announcement_data(company_id, item_id, item_data)
+            for item_id, item_data in zip(items.keys(), enriched)
+        ]
+        if not rows:
+            return 0, 0, failed_ids
+        inserted, updated = await run_in_session(db, self.save_announcements, db, rows)
+        return inserted, updated, failed_ids
+
+    async def list_item_ids(self, client: httpx.AsyncClient, headers: dict, ml_user_id: str) -> List[str]:
+        """Lista todos os IDs de anúncios do vendedor usando paginação."""
+        all_item_ids = []
+        offset = 0
+        limit = 50  # Limite por página da API do ML
+
+        while True:
+            response = await client.get(
+                f"{ML_API_URL}/users/{ml_user_id}/items/search",
+                headers=headers,
+                params={"limit": limit, "offset": offset}
+            )
+
+            if response.status_code == 404:
+                break
+
+            response.raise_for_status()
+            search_data = response.json()
+
+            if not search_data.get("results"):
+                break
+
+            all_item_ids.extend(search_data["results"])
+
+            paging = search_data.get("paging", {})
+            total = paging.get("total", 0)
+            current_offset = paging.get("offset", 0)
+
+            if current_offset + len(search_data["results"]) >= total:
+                break
+
+            offset += limit
+
+        return all_item_ids
+
+    def build_announcement_data(self, company_id: int, item_id: str, item_data: dict) -> dict:
+        """Converte o payload do item para as colunas de MercadoLivreAnnouncement."""
+        return {
+            "company_id": company_id,
+            "ml_item_id": item_id,
+            "title": item_data.get("title", ""),
+            "price": float(item_data.get("price", 0)),
+            "currency_id": item_data.get("currency_id", "BRL"),
+            "available_quantity": item_data.get("available_quantity", 0),
+            "sold_quantity": item_data.get("sold_quantity", 0),
+            "condition": item_data.get("condition", ""),
+            "status": item_data.get("status", ""),
+            "permalink": item_data.get("permalink"),
+            "thumbnail": item_data.get("thumbnail"),
+            "listing_type_id": item_data.get("listing_type_id"),
+            "listing_type_name": item_data.get("listing_type_name"),
+            "listing_exposure": item_data.get("listing_exposure"),
+            "category_id": item_data.get("category_id"),
+            "domain_id": item_data.get("domain_id"),
+
+            # Campos de custos
+            "listing_fee_amount": float(item_data.get("listing_fee_amount", 0)) if item_data.get("listing_fee_amount") is not None else None,
+            "sale_fee_amount": float(item_data.get("sale_fee_amount", 0)) if item_data.get("sale_fee_amount") is not None else None,
+            "sale_fee_percentage": float(item_data.get("sale_fee_percentage", 0)) if item_data.get("sale_fee_percentage") is not None else None,
+            "sale_fee_fixed": float(item_data.get("sale_fee_fixed", 0)) if item_data.get("sale_fee_fixed") is not None else None,
+            "total_cost": float(item_data.get("total_cost", 0)) if item_data.get("total_cost") is not None else None,
+            "requires_picture": item_data.get("requires_picture"),
+            "free_relist": item_data.get("free_relist"),
+            "catalog_listing": item_data.get("catalog_listing", False),
+            "catalog_product_id": item_data.get("catalog_product_id"),
+            "family_name": item_data.get("family_name"),
+            "family_id": item_data.get("family_id"),
+            "user_product_id": item_data.get("user_product_id"),
+            "inventory_id": item_data.get("inventory_id"),
+            "base_price": float(item_data.get("base_price", 0)) if item_data.get("base_price") else None,
+            "original_price": float(item_data.get("original_price", 0)) if item_data.get("original_price") else None,
+            "sale_price": float(item_data.get("sale_price", 0)) if item_data.get("sale_price") else None,
+            "catalog_status": item_data.get("catalog_status"),
+            "catalog_visit_share": item_data.get("catalog_visit_share"),
+            "catalog_competitors_sharing": item_data.get("catalog_competitors_sharing"),
+            "catalog_price_to_win": float(item_data.get("catalog_price_to_win", 0)) if item_data.get("catalog_price_to_win") else None,
+            "full_data": item_data,
+            "sale_price_info": item_data.get("sale_price_info"),
+            "prices_info": item_data.get("prices_info"),
+            "catalog_position_info": item_data.get("catalog_position_info"),
+            "attributes": item_data.get("attributes"),
+            "pictures": item_data.get("pictures"),
+            "tags": item_data.get("tags"),
+            "ml_date_created": parse_ml_datetime(item_data.get("date_created")),
+            "ml_last_updated": parse_ml_datetime(item_data.get("last_updated")),
+            "ml_removed_at": None,
+            "updated_at": datetime.utcnow()
+        }
+
+    def load_sync_state(self, db: Session, company_id: int) -> Dict[str, Tuple[Optional[datetime], Optional[datetime]]]:
+        """Carrega (ml_last_updated, ml_removed_at) de todos os anúncios da empresa."""
+        rows = db.query(
+            MercadoLivreAnnouncement.ml_item_id,
+            MercadoLivreAnnouncement.ml_last_updated,
+            MercadoLivreAnnouncement.ml_removed_at
+        ).filter(
+            MercadoLivreAnnouncement.company_id == company_id
+        ).all()
+        return {row.ml_item_id: (row.ml_last_updated, row.ml_removed_at) for row in rows}
+
+    def is_unchanged(self, stored: Optional[Tuple[Optional[datetime], Optional[datetime]]], item_data: dict) -> bool:
+        """Indica se o item não mudou no ML desde a última sincronização."""
+        if stored is None:
+            return False
+        stored_last_updated, removed_at = stored
+        last_updated = parse_ml_datetime(item_data.get("last_updated"))
+        if removed_at is not None or stored_last_updated is None or last_updated is None:
+            return False
+        # As colunas DateTime não guardam fuso horário
+        return stored_last_updated == last_updated.replace(tzinfo=None)
+
+    def mark_removed(self, db: Session, company_id: int, removed_ids: List[str]) -> int:
+        """Marca como removidos os anúncios que não vieram mais na listagem do ML.
+
+        Os registros são mantidos porque guardam custos preenchidos manualmente.
+        """
+        if not removed_ids:
+            return 0
+        now = datetime.utcnow()
+        removed_count = db.query(MercadoLivreAnnouncement).filter(
+            MercadoLivreAnnouncement.company_id == company_id,
+            MercadoLivreAnnouncement.ml_item_id.in_(removed_ids),
+            MercadoLivreAnnouncement.ml_removed_at.is_(None)
+        ).update({"ml_removed_at": now, "updated_at": now}, synchronize_session=False)
+        if removed_count:
+            bump_versions(db, "announcements", [company_id])
+        return removed_count
+
+    def save_announcements(self, db: Session, rows: List[dict]) -> Tuple[int, int]:
+        """Grava um lote de anúncios em um único upsert. Retorna (inseridos, atualizados).
+
+        Um ml_item_id que pertença a outra empresa não é sobrescrito, e anúncios
+        idênticos aos gravados não são reescritos nem mudam a versão (ETag).
+        """
+        inserted, updated = bulk_upsert(
+            db,
+            MercadoLivreAnnouncement,
+            rows,
+            conflict_columns=["ml_item_id"],
+            where=lambda excluded: MercadoLivreAnnouncement.company_id == excluded.company_id,
+            skip_unchanged=True
+        )
+        if inserted or updated:
+            bump_versions(db, "announcements", {row["company_id"] for row in rows})
+        return inserted, updated
+
+    def save_batch(
+        self,
+        db: Session,
+        rows: List[dict],
+        checkpoint: SyncCheckpoint,
+        last_id: Optional[str]
+    ) -> Tuple[int, int]:
+        """Grava um lote e move o checkpoint até ``last_id`` na mesma transação.
+
+        Bloqueante: chamado via run_in_session. Retorna (inseridos, atualizados).
+        """
+        inserted, updated = self.save_announcements(db, rows) if rows else (0, 0)
+        if last_id is not None:
+            sync_checkpoint_service.advance(checkpoint, {"after_id": last_id}, last_processed_id=last_id)
+        db.commit()
+        return inserted, updated
+
+    def finish_sync(self, db: Session, checkpoint: SyncCheckpoint, company_id: int, removed_ids: List[str]) -> int:
+        """Marca os removidos e conclui o checkpoint. Bloqueante: chamado via run_in_session."""
+        removed_count = self.mark_removed(db, company_id, removed_ids)
+        sync_checkpoint_service.complete(db, checkpoint)
+        return removed_count
+
+    async def sync_announcements(
+        self,
+        db: Session,
+        client: httpx.AsyncClient,
+        access_token: str,
+        company_id: int,
+        ml_user_id: str,
+        incremental: bool = False,
+        progress: Optional[Callable[[int, Optional[int]], None]] = None,
+        resume: bool = True
+    ) -> Dict[str, Any]:
+        """Sincroniza todos os anúncios da empresa com concorrência limitada.
+
+        Os dados básicos chegam em lotes de até 20 itens (multiget) e as
+        sub-requisições de cada item rodam em paralelo (até ML_SYNC_CONCURRENCY
+        por empresa). Os itens são gravados no banco à medida que ficam prontos, de
+        modo que o tempo total depende do limite de concorrência e não da
+        quantidade de itens.
+
+        No modo ``incremental`` os itens cujo ``last_updated`` não mudou desde a
+        última sincronização não são enriquecidos nem regravados. Em ambos os
+        modos, anúncios que sumiram da listagem do vendedor são marcados em
+        ``ml_removed_at``.
+
+        Os IDs são processados em ordem e cada lote é confirmado (commit) junto
+        com o checkpoint da empresa. Se a execução anterior falhou ou foi
+        interrompida, ``resume`` faz esta continuar após o último ID confirmado.
+
+        ``progress`` é chamado com (itens processados, total) a cada lote gravado.
+        """
+        headers = {"Authorization": f"Bearer {access_token}"}
+
+        all_item_ids = sorted(await self.list_item_ids(client, headers, ml_user_id))
+        if not all_item_ids:
+            return {"message": "Nenhum anúncio encontrado", "synced": 0, "updated": 0}
+
+        # O acesso ao banco roda no threadpool (run_in_session) para não bloquear o event loop
+        checkpoint = await run_in_session(
+            db, sync_checkpoint_service.start, db, company_id, "announcements", resume=resume
+        )
+        checkpoint_id = checkpoint.id
+        resumed_after = None
+        pending_item_ids = all_item_ids
+        if sync_checkpoint_service.is_resuming(checkpoint):
+            resumed_after = checkpoint.cursor.get("after_id")
+            if resumed_after:
+                pending_item_ids = [item_id for item_id in all_item_ids if item_id > resumed_after]
+
+        sync_state = await run_in_session(db, self.load_sync_state, db, company_id)
+        semaphore = self.get_company_semaphore(company_id)
+        skipped_count = 0
+        processed_count = len(all_item_ids) - len(pending_item_ids)
+        if progress:
+            progress(processed_count, len(all_item_ids))
+
+        # Falhas de um lote não são engolidas: a exceção interrompe a execução,
+        # o checkpoint fica no primeiro lote não confirmado e é marcado como falho
+        async def enrich_with_limit(item_id: str, item_data: dict) -> Tuple[str, dict]:
+            async with semaphore:
+                return item_id, await self.enrich_item(client, headers, item_id, item_data)
+
+        async def fetch_batch(index: int, batch: List[str]) -> Tuple[int, List[Tuple[str, dict]]]:
+            nonlocal skipped_count
+            # O semáforo é liberado antes do enriquecimento para não bloquear os itens do lote
+            async with semaphore:
+                try:
+                    items = await self.fetch_items(client, headers, batch)
+                except Exception as e:
+                    logger.error(f"Erro ao buscar lote de itens {batch[0]}..{batch[-1]}: {e}")
+                    raise
+            if incremental:
+                changed = {
+                    item_id: item_data for item_id, item_data in items.items()
+                    if not self.is_unchanged(sync_state.get(item_id), item_data)
+                }
+                skipped_count += len(items) - len(changed)
+                items = changed
+            return index, await asyncio.gather(
+                *(enrich_with_limit(item_id, item_data) for item_id, item_data in items.items())
+            )
+
+        batches = [
+            pending_item_ids[start:start + ITEMS_MULTIGET_LIMIT]
+            for start in range(0, len(pending_item_ids), ITEMS_MULTIGET_LIMIT)
+        ]
+        tasks = [asyncio.create_task(fetch_batch(index, batch)) for index, batch in enumerate(batches)]
+
+        synced_count = 0
+        updated_count = 0
+        # Os lotes terminam fora de ordem; o cursor só avança até o maior
+        # prefixo contínuo de lotes já confirmados
+        completed_batches = set()
+        next_cursor_batch = 0
+        try:
+            # Grava cada lote em um único upsert conforme as buscas terminam
+            for next_batch in asyncio.as_completed(tasks):
+                index, results = await next_batch
+                rows = [
+                    self.build_announcement_data(company_id, item_id, item_data)
+                    for item_id, item_data in results
+                ]
+
+                completed_batches.add(index)
+                cursor_moved = next_cursor_batch in completed_batches
+                while next_cursor_batch in completed_batches:
+                    next_cursor_batch += 1
+                last_id = batches[next_cursor_batch - 1][-1] if cursor_moved else None
+
+                inserted, updated = await run_in_session(db, self.save_batch, db, rows, checkpoint, last_id)
+                synced_count += inserted
+                updated_count += updated
+
+                processed_count += len(batches[index])
+                if progress:
+                    progress(processed_count)
+
+            # Remoções só são marcadas com a listagem completa processada
+            current_ids = set(all_item_ids)
+            removed_count = await run_in_session(
+                db, self.finish_sync, db, checkpoint, company_id,
+                [item_id for item_id in sync_state if item_id not in current_ids]
+            )
+        except BaseException as e:
+            await run_in_session(db, sync_checkpoint_service.fail, db, checkpoint_id, str(e) or e.__class__.__name__)
+            raise
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        return {
+            "message": f"Sincronização concluída com sucesso!",
+            "synced": synced_count,
+            "updated": updated_count,
+            "skipped": skipped_count,
+            "removed": removed_count,
+            "total_processed": synced_count + updated_count,
+            "total_found": len(all_item_ids),
+            "concurrency": COMPANY_SYNC_CONCURRENCY,
+            "incremental": incremental,
+            "resumed_after": resumed_after
+        }
+
+
+# Instância global do serviço
+announcement_sync_service = AnnouncementSyncService()
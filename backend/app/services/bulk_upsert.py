@@ -0,0 +1,125 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import JSON, and_, cast, literal_column, or_
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+# Colunas que nunca são sobrescritas quando o registro já existe
+PRESERVED_COLUMNS = {"id", "created_at"}
+
+# Colunas que mudam a cada gravação e não indicam alteração do registro
+VOLATILE_COLUMNS = {"created_at", "updated_at"}
+
+
+def changed_condition(table, excluded, columns: Sequence[str]):
+    """Condição verdadeira quando alguma das colunas difere do valor recebido.
+
+    O tipo json do PostgreSQL não tem operador de igualdade: compara como jsonb.
+    """
+    conditions = []
+    for column in columns:
+        current, incoming = table.c[column], excluded[column]
+        if isinstance(table.c[column].type, JSON):
+            current, incoming = cast(current, JSONB), cast(incoming, JSONB)
+        conditions.append(current.is_distinct_from(incoming))
+    return or_(*conditions)
+
+
+def bulk_upsert(
+    db: Session,
+    model,
+    rows: Iterable[Dict[str, Any]],
+    conflict_columns: Sequence[str],
+    update_columns: Optional[Sequence[str]] = None,
+    where=None,
+    skip_unchanged: bool = False,
+    ignored_columns: Sequence[str] = (),
+    changed_keys: Optional[Set[tuple]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> Tuple[int, int]:
+    """Grava registros em lote com INSERT ... ON CONFLICT DO UPDATE (PostgreSQL).
+
+    ``conflict_columns`` deve corresponder a uma constraint única da tabela.
+    Sem ``update_columns``, todas as colunas informadas (exceto a chave, ``id``
+    e ``created_at``) são atualizadas. ``where`` recebe a pseudo-tabela
+    ``excluded`` e devolve a condição para atualizar o registro existente;
+    linhas que não satisfazem a condição são ignoradas.
+
+    Com ``skip_unchanged``, registros idênticos aos recebidos não são
+    reescritos (nem o updated_at) e não contam como atualizados; as colunas
+    de ``VOLATILE_COLUMNS`` e de ``ignored_columns`` ficam fora da comparação.
+    ``changed_keys`` recebe a chave (``conflict_columns``) de cada registro
+    inserido ou atualizado.
+
+    Registros repetidos no mesmo lote são reduzidos ao último. Não faz commit.
+
+    Retorna a tupla (inseridos, atualizados).
+    """
+    table = model.__table__
+    now = datetime.utcnow()
+
+    # Deduplica pela chave natural (o ON CONFLICT não aceita a mesma linha duas vezes)
+    unique_rows: Dict[tuple, Dict[str, Any]] = {}
+    for row in rows:
+        row = dict(row)
+        if "updated_at" in table.c and "updated_at" not in row:
+            row["updated_at"] = now
+        if "created_at" in table.c and "created_at" not in row:
+            row["created_at"] = now
+        unique_rows[tuple(row[column] for column in conflict_columns)] = row
+
+    # Um INSERT com vários VALUES exige o mesmo conjunto de colunas em todas as linhas
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for row in unique_rows.values():
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+
+    inserted = 0
+    updated = 0
+    for columns, group in groups.items():
+        columns_to_update = [
+            column for column in (update_columns or columns)
+            if column in columns and column not in conflict_columns and column not in PRESERVED_COLUMNS
+        ]
+
+        compared_columns = [
+            column for column in columns_to_update
+            if column not in VOLATILE_COLUMNS and column not in ignored_columns
+        ]
+
+        for start in range(0, len(group), batch_size):
+            batch = group[start:start + batch_size]
+            stmt = insert(table).values(batch)
+            if columns_to_update:
+                conditions = []
+                if where is not None:
+                    conditions.append(where(stmt.excluded))
+                if skip_unchanged and compared_columns:
+                    conditions.append(changed_condition(table, stmt.excluded, compared_columns))
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=list(conflict_columns),
+                    set_={column: stmt.excluded[column] for column in columns_to_update},
+                    where=and_(*conditions) if conditions else None
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=list(conflict_columns))
+
+            # xmax = 0 identifica as linhas recém-inseridas
+            result = db.execute(stmt.returning(
+                literal_column("(xmax = 0)").label("inserted"),
+                *(table.c[column] for column in conflict_columns)
+            ))
+            for was_inserted, *key in result:
+                if was_inserted:
+                    inserted += 1
+                else:
+                    updated += 1
+                if changed_keys is not None:
+                    changed_keys.add(tuple(key))
+
+    logger.debug(f"Upsert em {table.name}: {inserted} inseridos, {updated} atualizados")
+    return inserted, updated
@@ -0,0 +1,602 @@
+import re
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import httpx
+from sqlalchemy import and_, delete, func, or_
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, run_in_session
+from app.models import (
+    CatalogCompetitor, CatalogCompetitorObservation, CatalogRefreshState,
+    MercadoLivreAnnouncement, MercadoLivreIntegration
+)
+from app.services.announcement_sync import announcement_sync_service, parse_ml_datetime
+from app.services.bulk_upsert import bulk_upsert
+from app.services.etag import bump_versions
+from app.services.http_client import get_http_client
+from app.services.seller_cache import seller_cache
+from app.services.token_manager import token_manager, TokenRefreshError
+
+logger = logging.getLogger(__name__)
+
+ML_API_URL = "https://api.mercadolibre.com"
+
+_SLUG_INVALID_CHARS = re.compile(r'[^a-z0-9\s-]')
+_SLUG_SPACES = re.compile(r'\s+')
+_SLUG_DASHES = re.compile(r'-+')
+
+# Colunas definidas na criação do concorrente e não sobrescritas nas atualizações
+COMPETITOR_INSERT_ONLY_COLUMNS = {"company_id", "catalog_product_id", "seller_id"}
+
+# Intervalo adaptativo por produto (segundos): cai pela metade quando a buy box
+# muda e cresce pelo fator configurado enquanto ela fica estável
+CATALOG_REFRESH_MIN_INTERVAL = int(os.getenv("ML_CATALOG_REFRESH_MIN_INTERVAL", "300"))
+CATALOG_REFRESH_MAX_INTERVAL = int(os.getenv("ML_CATALOG_REFRESH_MAX_INTERVAL", "21600"))
+CATALOG_REFRESH_BACKOFF_FACTOR = float(os.getenv("ML_CATALOG_REFRESH_BACKOFF_FACTOR", "1.5"))
+CATALOG_REFRESH_BATCH_SIZE = 50  # Produtos gravados por upsert/commit
+
+# Campos acompanhados no histórico de concorrentes
+OBSERVED_FIELDS = ("price", "original_price", "available_quantity")
+HISTORY_DEFAULT_DAYS = 30
+
+# Atualização automática em segundo plano (desligada por padrão)
+CATALOG_REFRESH_ENABLED = os.getenv("ML_CATALOG_REFRESH_ENABLED", "false").lower() in ("1", "true", "yes")
+CATALOG_REFRESH_TICK_SECONDS = float(os.getenv("ML_CATALOG_REFRESH_TICK_SECONDS", "60"))
+
+
+def build_item_url(item_id: str, title: str) -> str:
+    """Monta a URL pública do anúncio a partir do título."""
+    clean_title = _SLUG_INVALID_CHARS.sub('', (title or "").lower())
+    clean_title = _SLUG_SPACES.sub('-', clean_title)
+    clean_title = _SLUG_DASHES.sub('-', clean_title)
+    clean_title = clean_title.strip('-')
+    return f"https://produto.mercadolivre.com.br/{item_id}-{clean_title}"
+
+
+def next_refresh_interval(current: Optional[int], changed: bool) -> int:
+    """Calcula o próximo intervalo de atualização a partir da mudança da buy box."""
+    if current is None:
+        return CATALOG_REFRESH_MIN_INTERVAL
+    interval = current / 2 if changed else current * CATALOG_REFRESH_BACKOFF_FACTOR
+    return int(max(CATALOG_REFRESH_MIN_INTERVAL, min(CATALOG_REFRESH_MAX_INTERVAL, interval)))
+
+
+def to_money(value: Any) -> Optional[Decimal]:
+    """Normaliza preços para Decimal com duas casas (como gravado no banco)."""
+    if value is None:
+        return None
+    return Decimal(str(value)).quantize(Decimal("0.01"))
+
+
+class CatalogSyncService:
+    """Sincronização dos concorrentes de produtos de catálogo."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def build_competitor_data(
+        self,
+        company_id: int,
+        catalog_product_id: str,
+        item: dict,
+        seller_info: dict
+    ) -> dict:
+        """Converte um item de /products/{id}/items para as colunas de CatalogCompetitor."""
+        item_id = item.get("item_id")
+        shipping = item.get("shipping") or {}
+        return {
+            "company_id": company_id,
+            "catalog_product_id": catalog_product_id,
+            "item_id": item_id,
+            "title": item.get("title", ""),
+            "price": item.get("price", 0),
+            "original_price": item.get("original_price"),
+            "condition": item.get("condition", ""),
+            "available_quantity": item.get("available_quantity", 0),
+            "sold_quantity": item.get("sold_quantity", 0),
+            "permalink": item.get("permalink", ""),
+            "url": build_item_url(item_id, item.get("title", "")),
+            "seller_id": str(item.get("seller_id", "")),
+            "seller_nickname": seller_info.get("nickname"),
+            "seller_reputation_level": seller_info.get("reputation_level"),
+            "seller_power_status": seller_info.get("power_status"),
+            "seller_transactions_total": seller_info.get("transactions_total", 0),
+            "shipping_mode": shipping.get("mode"),
+            "shipping_logistic_type": shipping.get("logistic_type"),
+            "shipping_free": shipping.get("free_shipping", False),
+            "shipping_tags": shipping.get("tags", []),
+            "listing_type_id": item.get("listing_type_id"),
+            "tags": item.get("tags", []),
+            "deal_ids": item.get("deal_ids", []),
+            "ml_date_created": parse_ml_datetime(item.get("date_created")),
+            "ml_last_updated": parse_ml_datetime(item.get("last_updated"))
+        }
+
+    def latest_observations(
+        self,
+        db: Session,
+        item_ids: Optional[List[str]] = None,
+        catalog_product_id: Optional[str] = None,
+        before: Optional[datetime] = None
+    ) -> Dict[str, CatalogCompetitorObservation]:
+        """Última observação de cada item, dos itens ou do produto informados (opcionalmente anterior a ``before``)."""
+        latest = db.query(
+            CatalogCompetitorObservation.item_id,
+            func.max(CatalogCompetitorObservation.observed_at).label("observed_at")
+        )
+        if item_ids is not None:
+            latest = latest.filter(CatalogCompetitorObservation.item_id.in_(item_ids))
+        if catalog_product_id is not None:
+            latest = latest.filter(CatalogCompetitorObservation.catalog_product_id == catalog_product_id)
+        if before is not None:
+            latest = latest.filter(CatalogCompetitorObservation.observed_at < before)
+        latest = latest.group_by(CatalogCompetitorObservation.item_id).subquery()
+
+        observations = db.query(CatalogCompetitorObservation).join(
+            latest,
+            and_(
+                CatalogCompetitorObservation.item_id == latest.c.item_id,
+                CatalogCompetitorObservation.observed_at == latest.c.observed_at
+            )
+        ).all()
+        return {observation.item_id: observation for observation in observations}
+
+    def record_observations(self, db: Session, rows: List[dict], observed_at: Optional[datetime] = None) -> int:
+        """Acrescenta ao histórico os itens cujo preço ou estoque mudou desde a última observação.
+
+        Retorna quantas observações foram gravadas. Não faz commit.
+        """
+        if not rows:
+            return 0
+        observed_at = observed_at or datetime.utcnow()
+        previous = self.latest_observations(db, item_ids=list({row["item_id"] for row in rows}))
+
+        observations = {}
+        for row in rows:
+            current = {
+                "price": to_money(row.get("price") or 0),
+                "original_price": to_money(row.get("original_price")),
+                "available_quantity": row.get("available_quantity")
+            }
+            last = previous.get(row["item_id"])
+            if last is not None and all(getattr(last, field) == current[field] for field in OBSERVED_FIELDS):
+                continue
+            observations[row["item_id"]] = {
+                "catalog_product_id": row["catalog_product_id"],
+                "item_id": row["item_id"],
+                "observed_at": observed_at,
+                **current
+            }
+
+        if observations:
+            db.execute(CatalogCompetitorObservation.__table__.insert(), list(observations.values()))
+        return len(observations)
+
+    def save_competitors(self, db: Session, rows: List[dict]) -> Tuple[int, int]:
+        """Grava os concorrentes em um único upsert e registra as mudanças no histórico.
+
+        Concorrentes idênticos aos gravados não são reescritos; a versão (ETag)
+        muda só nos produtos com algum concorrente inserido ou alterado.
+        Retorna (inseridos, atualizados).
+        """
+        self.record_observations(db, rows)
+        update_columns = [
+            column.name for column in CatalogCompetitor.__table__.c
+            if column.name not in COMPETITOR_INSERT_ONLY_COLUMNS
+        ]
+        changed_keys = set()
+        inserted, updated = bulk_upsert(
+            db,
+            CatalogCompetitor,
+            rows,
+            conflict_columns=["item_id"],
+            update_columns=update_columns,
+            skip_unchanged=True,
+            changed_keys=changed_keys
+        )
+        product_by_item = {row["item_id"]: row["catalog_product_id"] for row in rows}
+        bump_versions(db, "catalog_competitors", {product_by_item[item_id] for (item_id,) in changed_keys})
+        return inserted, updated
+
+    def remove_missing_competitors(self, db: Session, catalog_product_ids: List[str], current_item_ids: set) -> int:
+        """Remove os concorrentes que não estão mais no catálogo dos produtos informados."""
+        stmt = delete(CatalogCompetitor).where(
+            CatalogCompetitor.catalog_product_id.in_(catalog_product_ids)
+        )
+        if current_item_ids:
+            stmt = stmt.where(CatalogCompetitor.item_id.notin_(current_item_ids))
+        removed_products = db.execute(stmt.returning(CatalogCompetitor.catalog_product_id)).scalars().all()
+        bump_versions(db, "catalog_competitors", removed_products)
+        return len(removed_products)
+
+    async def fetch_competitor_rows(
+        self,
+        client: httpx.AsyncClient,
+        headers: dict,
+        company_id: int,
+        catalog_product_id: str
+    ) -> Optional[List[dict]]:
+        """Busca os concorrentes de um produto. Retorna None se o produto não existe mais.
+
+        A ordem da API é preservada: o primeiro item é o vencedor da buy box.
+        """
+        response = await client.get(f"{ML_API_URL}/products/{catalog_product_id}/items", headers=headers)
+        if response.status_code == 404:
+            return None
+
+        response.raise_for_status()
+        results = [item for item in response.json().get("results", []) if item.get("item_id")]
+
+        # Perfis dos vendedores vêm do cache; só os desconhecidos são buscados
+        sellers = await seller_cache.get_sellers(client, headers, (item.get("seller_id") for item in results))
+        return [
+            self.build_competitor_data(
+                company_id, catalog_product_id, item, sellers.get(str(item.get("seller_id")), {})
+            )
+            for item in results
+        ]
+
+    def update_refresh_states(
+        self,
+        db: Session,
+        company_id: int,
+        products: Dict[str, List[dict]],
+        now: Optional[datetime] = None
+    ) -> int:
+        """Agenda a próxima atualização de cada produto conforme a buy box mudou ou não.
+
+        Retorna quantos produtos tiveram a buy box alterada. Não faz commit.
+        """
+        if not products:
+            return 0
+        now = now or datetime.utcnow()
+        states = {
+            state.catalog_product_id: state
+            for state in db.query(CatalogRefreshState).filter(
+                CatalogRefreshState.company_id == company_id,
+                CatalogRefreshState.catalog_product_id.in_(list(products))
+            ).all()
+        }
+
+        rows = []
+        changes = 0
+        for catalog_product_id, competitor_rows in products.items():
+            winner = competitor_rows[0] if competitor_rows else {}
+            buy_box_item_id = winner.get("item_id")
+            buy_box_price = Decimal(str(winner["price"])) if winner.get("price") is not None else None
+
+            state = states.get(catalog_product_id)
+            changed = state is not None and (
+                state.buy_box_item_id != buy_box_item_id or state.buy_box_price != buy_box_price
+            )
+            changes += changed
+            interval = next_refresh_interval(state.refresh_interval if state else None, changed)
+            rows.append({
+                "company_id": company_id,
+                "catalog_product_id": catalog_product_id,
+                "buy_box_item_id": buy_box_item_id,
+                "buy_box_price": buy_box_price,
+                "refresh_interval": interval,
+                "change_count": (state.change_count or 0) + changed if state else 0,
+                "last_refreshed_at": now,
+                "last_changed_at": now if changed else (state.last_changed_at if state else None),
+                "next_refresh_at": now + timedelta(seconds=interval)
+            })
+
+        bulk_upsert(db, CatalogRefreshState, rows, conflict_columns=["company_id", "catalog_product_id"])
+        return changes
+
+    def postpone_missing_products(self, db: Session, company_id: int, catalog_product_ids: List[str]) -> None:
+        """Adia para o intervalo máximo os produtos que não existem mais no catálogo. Não faz commit."""
+        if not catalog_product_ids:
+            return
+        now = datetime.utcnow()
+        bulk_upsert(
+            db,
+            CatalogRefreshState,
+            [
+                {
+                    "company_id": company_id,
+                    "catalog_product_id": catalog_product_id,
+                    "refresh_interval": CATALOG_REFRESH_MAX_INTERVAL,
+                    "last_refreshed_at": now,
+                    "next_refresh_at": now + timedelta(seconds=CATALOG_REFRESH_MAX_INTERVAL)
+                }
+                for catalog_product_id in catalog_product_ids
+            ],
+            conflict_columns=["company_id", "catalog_product_id"]
+        )
+
+    def save_products(
+        self,
+        db: Session,
+        company_id: int,
+        products: Dict[str, List[dict]],
+        not_found: List[str] = ()
+    ) -> Tuple[int, int]:
+        """Grava os concorrentes de um lote de produtos e agenda as próximas atualizações.
+
+        Um upsert, uma remoção e um commit por lote. Bloqueante: chamado via
+        run_in_session. Retorna (concorrentes removidos, buy boxes alteradas).
+        """
+        rows = [row for product_rows in products.values() for row in product_rows]
+        if rows:
+            self.save_competitors(db, rows)
+        removed_count = 0
+        buy_box_changes = 0
+        if products:
+            removed_count = self.remove_missing_competitors(db, list(products), {row["item_id"] for row in rows})
+            buy_box_changes = self.update_refresh_states(db, company_id, products)
+        self.postpone_missing_products(db, company_id, list(not_found))
+        db.commit()
+        return removed_count, buy_box_changes
+
+    async def sync_catalog_product(
+        self,
+        db: Session,
+        client: httpx.AsyncClient,
+        access_token: str,
+        company_id: int,
+        catalog_product_id: str,
+        progress: Optional[Callable[[int, Optional[int]], None]] = None
+    ) -> Dict[str, Any]:
+        """Sincroniza os concorrentes de um produto de catálogo em um único upsert."""
+        headers = {"Authorization": f"Bearer {access_token}"}
+
+        if progress:
+            progress(0, 1)
+        rows = await self.fetch_competitor_rows(client, headers, company_id, catalog_product_id)
+        if rows is None:
+            return {"message": "Produto do catálogo não encontrado", "synced": 0, "removed": 0}
+
+        current_item_ids = {row["item_id"] for row in rows}
+
+        # Remove os concorrentes que não estão mais na API (no threadpool, fora do event loop)
+        removed_count, _ = await run_in_session(db, self.save_products, db, company_id, {catalog_product_id: rows})
+        if progress:
+            progress(1, 1)
+
+        return {
+            "message": f"Sincronização concluída para o produto {catalog_product_id}",
+            "synced": len(rows),
+            "removed": removed_count,
+            "total_current": len(current_item_ids)
+        }
+
+    def get_price_history(
+        self,
+        db: Session,
+        catalog_product_id: str,
+        date_from: datetime,
+        date_to: datetime,
+        points: int,
+        item_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Série de preço e estoque por concorrente, reduzida a no máximo ``points`` intervalos.
+
+        Como o histórico só guarda mudanças, o valor vigente no início do período
+        vem da última observação anterior a ``date_from``. Cada intervalo traz o
+        último valor observado (fechamento) e o menor e o maior preço do intervalo.
+        """
+        bucket_seconds = max(1.0, (date_to - date_from).total_seconds() / points)
+        initial = self.latest_observations(
+            db,
+            item_ids=[item_id] if item_id else None,
+            catalog_product_id=catalog_product_id,
+            before=date_from
+        )
+
+        query = db.query(
+            CatalogCompetitorObservation.item_id,
+            CatalogCompetitorObservation.observed_at,
+            CatalogCompetitorObservation.price,
+            CatalogCompetitorObservation.original_price,
+            CatalogCompetitorObservation.available_quantity
+        ).filter(
+            CatalogCompetitorObservation.catalog_product_id == catalog_product_id,
+            CatalogCompetitorObservation.observed_at >= date_from,
+            CatalogCompetitorObservation.observed_at <= date_to
+        )
+        if item_id:
+            query = query.filter(CatalogCompetitorObservation.item_id == item_id)
+
+        series: Dict[str, List[dict]] = {}
+        buckets: Dict[str, int] = {}
+        for observation in initial.values():
+            buckets[observation.item_id] = 0
+            series[observation.item_id] = [{
+                "timestamp": date_from.isoformat(),
+                "price": float(observation.price),
+                "min_price": float(observation.price),
+                "max_price": float(observation.price),
+                "original_price": float(observation.original_price) if observation.original_price is not None else None,
+                "available_quantity": observation.available_quantity
+            }]
+
+        for obs_item_id, observed_at, price, original_price, available_quantity in query.order_by(
+            CatalogCompetitorObservation.item_id,
+            CatalogCompetitorObservation.observed_at
+        ).yield_per(1000):
+            bucket = int((observed_at - date_from).total_seconds() // bucket_seconds)
+            price = float(price)
+            item_points = series.setdefault(obs_item_id, [])
+            if buckets.get(obs_item_id) == bucket and item_points:
+                point = item_points[-1]
+                point["min_price"] = min(point["min_price"], price)
+                point["max_price"] = max(point["max_price"], price)
+            else:
+                buckets[obs_item_id] = bucket
+                point = {
+                    "timestamp": (date_from + timedelta(seconds=bucket * bucket_seconds)).isoformat(),
+                    "price": price,
+                    "min_price": price,
+                    "max_price": price
+                }
+                item_points.append(point)
+            point["price"] = price
+            point["original_price"] = float(original_price) if original_price is not None else None
+            point["available_quantity"] = available_quantity
+
+        return {
+            "catalog_product_id": catalog_product_id,
+            "date_from": date_from.isoformat(),
+            "date_to": date_to.isoformat(),
+            "bucket_seconds": int(bucket_seconds),
+            "series": [
+                {"item_id": series_item_id, "points": item_points}
+                for series_item_id, item_points in sorted(series.items())
+            ]
+        }
+
+    def get_catalog_product_ids(self, db: Session, company_id: int, due_only: bool = True) -> List[str]:
+        """Produtos de catálogo dos anúncios da empresa; com due_only, só os com atualização vencida."""
+        query = db.query(
+            MercadoLivreAnnouncement.catalog_product_id,
+            CatalogRefreshState.next_refresh_at
+        ).outerjoin(
+            CatalogRefreshState,
+            (CatalogRefreshState.company_id == MercadoLivreAnnouncement.company_id)
+            & (CatalogRefreshState.catalog_product_id == MercadoLivreAnnouncement.catalog_product_id)
+        ).filter(
+            MercadoLivreAnnouncement.company_id == company_id,
+            MercadoLivreAnnouncement.catalog_listing == True,
+            MercadoLivreAnnouncement.catalog_product_id.isnot(None)
+        )
+        if due_only:
+            query = query.filter(or_(
+                CatalogRefreshState.id.is_(None),
+                CatalogRefreshState.next_refresh_at <= datetime.utcnow()
+            ))
+        # Os que nunca foram atualizados (ou estão mais atrasados) primeiro
+        query = query.distinct().order_by(
+            CatalogRefreshState.next_refresh_at.asc().nullsfirst(),
+            MercadoLivreAnnouncement.catalog_product_id
+        )
+        return [catalog_product_id for catalog_product_id, _ in query.all()]
+
+    async def sync_company(
+        self,
+        db: Session,
+        client: httpx.AsyncClient,
+        access_token: str,
+        company_id: int,
+        due_only: bool = True,
+        progress: Optional[Callable[[int, Optional[int]], None]] = None
+    ) -> Dict[str, Any]:
+        """Atualiza os concorrentes de todos os produtos de catálogo da empresa.
+
+        Os produtos são buscados em paralelo (semáforo da empresa e rate limit do
+        cliente HTTP) e gravados em lotes: um upsert, uma remoção e um commit por
+        lote. Com due_only, apenas os produtos cujo intervalo adaptativo venceu.
+        """
+        headers = {"Authorization": f"Bearer {access_token}"}
+        semaphore = announcement_sync_service.get_company_semaphore(company_id)
+        catalog_product_ids = await run_in_session(db, self.get_catalog_product_ids, db, company_id, due_only)
+        total = len(catalog_product_ids)
+        stats = {"refreshed": 0, "not_found": 0, "errors": 0, "competitors": 0, "removed": 0, "buy_box_changes": 0}
+
+        async def fetch_with_limit(catalog_product_id: str) -> Optional[List[dict]]:
+            async with semaphore:
+                return await self.fetch_competitor_rows(client, headers, company_id, catalog_product_id)
+
+        if progress:
+            progress(0, total)
+
+        for start in range(0, total, CATALOG_REFRESH_BATCH_SIZE):
+            batch = catalog_product_ids[start:start + CATALOG_REFRESH_BATCH_SIZE]
+            results = await asyncio.gather(*(fetch_with_limit(pid) for pid in batch), return_exceptions=True)
+
+            products: Dict[str, List[dict]] = {}
+            not_found = []
+            for catalog_product_id, result in zip(batch, results):
+                if isinstance(result, asyncio.CancelledError):
+                    raise result
+                if isinstance(result, Exception):
+                    stats["errors"] += 1
+                    logger.warning(f"Erro ao atualizar concorrentes do produto {catalog_product_id}: {result}")
+                elif result is None:
+                    not_found.append(catalog_product_id)
+                else:
+                    products[catalog_product_id] = result
+
+            removed_count, buy_box_changes = await run_in_session(
+                db, self.save_products, db, company_id, products, not_found
+            )
+
+            stats["removed"] += removed_count
+            stats["buy_box_changes"] += buy_box_changes
+            stats["refreshed"] += len(products)
+            stats["not_found"] += len(not_found)
+            stats["competitors"] += sum(len(product_rows) for product_rows in products.values())
+            if progress:
+                progress(min(start + len(batch), total), total)
+
+        logger.info(
+            f"Concorrentes da empresa {company_id}: {stats['refreshed']}/{total} produtos atualizados, "
+            f"{stats['buy_box_changes']} buy boxes alteradas, {stats['errors']} erros"
+        )
+        return {
+            "message": f"Concorrentes atualizados para {stats['refreshed']} produtos de catálogo",
+            "products": total,
+            **stats,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    def start(self) -> None:
+        """Inicia a atualização automática (chamado na inicialização da aplicação)."""
+        if not CATALOG_REFRESH_ENABLED or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._loop())
+        logger.info("Atualização automática de concorrentes de catálogo iniciada")
+
+    async def stop(self) -> None:
+        """Encerra a atualização automática (chamado no encerramento da aplicação)."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(CATALOG_REFRESH_TICK_SECONDS)
+            try:
+                await self.refresh_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erro na atualização automática de concorrentes: {e}")
+
+    async def refresh_due(self) -> None:
+        """Atualiza os produtos com atualização vencida de todas as empresas integradas."""
+        db = SessionLocal()
+        try:
+            company_ids = await run_in_session(db, self.get_active_company_ids, db)
+            for company_id in company_ids:
+                try:
+                    credentials = await token_manager.get_credentials(db, company_id)
+                    if not credentials:
+                        continue
+                    await self.sync_company(db, get_http_client(), credentials.access_token, company_id)
+                except TokenRefreshError as e:
+                    logger.warning(f"Token inválido ao atualizar concorrentes da empresa {company_id}: {e}")
+                except Exception as e:
+                    await run_in_session(db, db.rollback)
+                    logger.error(f"Erro ao atualizar concorrentes da empresa {company_id}: {e}")
+        finally:
+            await run_in_session(db, db.close)
+
+    def get_active_company_ids(self, db: Session) -> List[int]:
+        """Empresas com integração ativa com o Mercado Livre."""
+        return [
+            company_id for (company_id,) in db.query(MercadoLivreIntegration.company_id).filter(
+                MercadoLivreIntegration.is_active == True
+            ).distinct().all()
+        ]
+
+
+# Instância global do serviço
+catalog_sync_service = CatalogSyncService()
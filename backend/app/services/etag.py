@@ -0,0 +1,70 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Iterable, Optional
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.models import DataVersion
+
+# O navegador guarda a resposta, mas sempre revalida com If-None-Match
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """ETag fraca a partir da versão dos dados e dos parâmetros da requisição."""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Compara If-None-Match com a ETag (comparação fraca: ignora o prefixo W/)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def version_bump(resource: str, scope: Any):
+    """Comando que incrementa a versão da listagem ``resource`` de ``scope``.
+
+    Deve rodar na mesma transação da escrita, e só quando algum registro mudou.
+    """
+    stmt = insert(DataVersion).values(resource=resource, scope=str(scope), version=1, updated_at=datetime.utcnow())
+    return stmt.on_conflict_do_update(
+        index_elements=["resource", "scope"],
+        set_={"version": DataVersion.version + 1, "updated_at": stmt.excluded.updated_at}
+    )
+
+
+def bump_versions(db: Session, resource: str, scopes: Iterable[Any]) -> None:
+    """Incrementa a versão de cada escopo. Não faz commit.
+
+    Os escopos são ordenados para que escritas concorrentes travem as linhas na mesma ordem.
+    """
+    for scope in sorted({str(scope) for scope in scopes}):
+        db.execute(version_bump(resource, scope))
+
+
+async def data_version(db, resource: str, scope: Any) -> int:
+    """Versão atual da listagem (0 enquanto nada foi gravado): uma leitura pela chave primária."""
+    version = await db.scalar(
+        select(DataVersion.version).where(DataVersion.resource == resource, DataVersion.scope == str(scope))
+    )
+    return version or 0
+
+
+def request_etag(request: Request, resource: str, *version: Any) -> str:
+    """ETag da listagem: recurso, versão dos dados e parâmetros da URL (página, filtros...)."""
+    return make_etag(resource, *version, sorted(request.query_params.multi_items()))
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Devolve a resposta 304 se o cliente já tem esta versão; senão marca a ETag na resposta."""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
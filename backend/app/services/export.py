@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, Sequence, Type
+from pydantic import BaseModel
+from app.database import open_async_session
+
+logger = logging.getLogger(__name__)
+
+# Registros lidos do cursor no servidor a cada lote da exportação
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def flatten_row(row: Dict[str, Any], schema: Type[BaseModel]) -> Dict[str, Any]:
+    """Achata os objetos aninhados do schema (buyer, seller...) em colunas "grupo.campo".
+
+    Campos JSON livres (listas e objetos) viram texto, para que todas as linhas
+    tenham as mesmas colunas.
+    """
+    flat = {}
+    for key, value in row.items():
+        field = schema.model_fields.get(key)
+        nested = field.annotation if field else None
+        if isinstance(nested, type) and issubclass(nested, BaseModel) and isinstance(value, dict):
+            for nested_key, nested_value in flatten_row(value, nested).items():
+                flat[f"{key}.{nested_key}"] = nested_value
+        elif isinstance(value, (dict, list)):
+            flat[key] = json.dumps(value, ensure_ascii=False)
+        else:
+            flat[key] = value
+    return flat
+
+
+class ExportService:
+    """Exportação das listagens em NDJSON ou CSV, lote a lote.
+
+    A consulta roda em uma sessão própria com cursor no servidor (yield_per),
+    então a memória usada não depende do tamanho da exportação.
+    """
+
+    async def stream(
+        self,
+        statement,
+        schema: Type[BaseModel],
+        export_format: str,
+        included: Sequence[str] = ()
+    ) -> AsyncIterator[str]:
+        """Gera o conteúdo do arquivo, um bloco de texto por lote de registros."""
+        exported = 0
+        header = None
+        try:
+            async with open_async_session() as db:
+                result = await db.stream_scalars(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+                async for batch in result.partitions():
+                    rows = []
+                    for record in batch:
+                        row = schema.model_validate(record)
+                        for field in included:
+                            setattr(row, field, getattr(record, field))
+                        rows.append(row)
+
+                    if export_format == "ndjson":
+                        chunk = "".join(row.model_dump_json() + "\n" for row in rows)
+                    else:
+                        buffer = io.StringIO()
+                        flat_rows = [flatten_row(row.model_dump(mode="json"), schema) for row in rows]
+                        if header is None and flat_rows:
+                            header = list(flat_rows[0].keys())
+                            csv.writer(buffer).writerow(header)
+                        csv.DictWriter(buffer, fieldnames=header, extrasaction="ignore").writerows(flat_rows)
+                        chunk = buffer.getvalue()
+
+                    exported += len(rows)
+                    yield chunk
+        except Exception as e:
+            # O status 200 já foi enviado; o arquivo fica incompleto
+            logger.error(f"Erro na exportação após {exported} registros: {e}")
+            raise
+        logger.info(f"Exportação {export_format} concluída: {exported} registros")
+
+
+# Instância global do serviço
+export_service = ExportService()
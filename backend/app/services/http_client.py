@@ -0,0 +1,86 @@
+import os
+import logging
+from typing import Optional
+import httpx
+from app.services.rate_limiter import RateLimitedTransport, rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Configuração do pool de conexões com a API do Mercado Livre
+ML_HTTP_CONNECT_TIMEOUT = float(os.getenv("ML_HTTP_CONNECT_TIMEOUT", "5"))
+ML_HTTP_READ_TIMEOUT = float(os.getenv("ML_HTTP_READ_TIMEOUT", "30"))
+ML_HTTP_WRITE_TIMEOUT = float(os.getenv("ML_HTTP_WRITE_TIMEOUT", "30"))
+ML_HTTP_POOL_TIMEOUT = float(os.getenv("ML_HTTP_POOL_TIMEOUT", "10"))
+ML_HTTP_MAX_CONNECTIONS = int(os.getenv("ML_HTTP_MAX_CONNECTIONS", "100"))
+ML_HTTP_MAX_KEEPALIVE = int(os.getenv("ML_HTTP_MAX_KEEPALIVE", "20"))
+ML_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("ML_HTTP_KEEPALIVE_EXPIRY", "30"))
+ML_HTTP2 = os.getenv("ML_HTTP2", "false").lower() in ("1", "true", "yes")
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    """HTTP/2 depende do pacote opcional h2 (pip install httpx[http2])."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Cria o cliente HTTP com keep-alive, limites de conexão e timeouts explícitos."""
+    http2 = ML_HTTP2
+    if http2 and not _http2_available():
+        logger.warning("ML_HTTP2 habilitado, mas o pacote h2 não está instalado. Usando HTTP/1.1.")
+        http2 = False
+
+    # Com transport customizado, http2 e limits são configurados no transport base
+    transport = httpx.AsyncHTTPTransport(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=ML_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=ML_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=ML_HTTP_KEEPALIVE_EXPIRY
+        )
+    )
+
+    return httpx.AsyncClient(
+        transport=RateLimitedTransport(transport, rate_limiter),
+        timeout=httpx.Timeout(
+            connect=ML_HTTP_CONNECT_TIMEOUT,
+            read=ML_HTTP_READ_TIMEOUT,
+            write=ML_HTTP_WRITE_TIMEOUT,
+            pool=ML_HTTP_POOL_TIMEOUT
+        )
+    )
+
+
+async def start_http_client() -> None:
+    """Cria o cliente compartilhado (chamado na inicialização da aplicação)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+        logger.info("Cliente HTTP do Mercado Livre inicializado")
+
+
+async def close_http_client() -> None:
+    """Fecha o cliente compartilhado (chamado no encerramento da aplicação)."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+        logger.info("Cliente HTTP do Mercado Livre encerrado")
+    _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Retorna o cliente compartilhado, criando-o se a aplicação ainda não o iniciou."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+    return _client
+
+
+async def get_ml_client() -> httpx.AsyncClient:
+    """Dependência do FastAPI que fornece o cliente HTTP compartilhado."""
+    return get_http_client()
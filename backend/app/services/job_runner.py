@@ -0,0 +1,241 @@
+import asyncio
+import os
+import time
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.database import SessionLocal, run_in_session
+from app.models import SyncJob
+from app.services.token_manager import token_manager, TokenRefreshError
+
+logger = logging.getLogger(__name__)
+
+# Limites de jobs executando ao mesmo tempo
+SYNC_JOBS_MAX_CONCURRENT = int(os.getenv("SYNC_JOBS_MAX_CONCURRENT", "4"))
+SYNC_JOBS_MAX_PER_COMPANY = int(os.getenv("SYNC_JOBS_MAX_PER_COMPANY", "1"))
+
+# Intervalo mínimo entre gravações de progresso no banco (segundos)
+PROGRESS_FLUSH_INTERVAL = 1.0
+
+# Espera máxima pelo término de um job cancelado antes de responder (segundos)
+JOB_CANCEL_WAIT_SECONDS = 5.0
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+class JobProgress:
+    """Callback de progresso passado aos serviços de sincronização.
+
+    Grava no banco no máximo uma vez por segundo, usando uma sessão própria
+    para não interferir na transação da sincronização. A gravação roda no
+    threadpool em segundo plano; enquanto uma estiver em andamento as
+    seguintes são descartadas (a conclusão do job grava o progresso final).
+    """
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self.current = 0
+        self.total: Optional[int] = None
+        self._flushed_at = 0.0
+        self._pending: Optional[asyncio.Future] = None
+
+    def __call__(self, current: int, total: Optional[int] = None) -> None:
+        self.current = current
+        if total is not None:
+            self.total = total
+        now = time.monotonic()
+        if self._pending is not None and not self._pending.done():
+            return
+        if now - self._flushed_at >= PROGRESS_FLUSH_INTERVAL or (self.total and current >= self.total):
+            self._flushed_at = now
+            self._pending = asyncio.ensure_future(run_in_threadpool(
+                job_runner.update_job, self.job_id, progress_current=self.current, progress_total=self.total
+            ))
+
+    async def wait(self) -> None:
+        """Aguarda a gravação de progresso em andamento, antes do status final do job."""
+        if self._pending is not None:
+            await asyncio.gather(self._pending, return_exceptions=True)
+
+
+# Recebe a sessão do job, o callback de progresso e o access token resolvido na execução
+JobFunction = Callable[[Session, JobProgress, str], Awaitable[Dict[str, Any]]]
+
+
+class JobRunner:
+    """Executa sincronizações longas em tarefas asyncio no próprio processo.
+
+    O estado de cada job fica na tabela sync_jobs para consulta (polling).
+    Jobs excedentes aguardam na fila respeitando os limites global e por empresa.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._global_semaphore: Optional[asyncio.Semaphore] = None
+        self._company_semaphores: Dict[int, asyncio.Semaphore] = {}
+
+    def _get_global_semaphore(self) -> asyncio.Semaphore:
+        if self._global_semaphore is None:
+            self._global_semaphore = asyncio.Semaphore(SYNC_JOBS_MAX_CONCURRENT)
+        return self._global_semaphore
+
+    def _get_company_semaphore(self, company_id: int) -> asyncio.Semaphore:
+        semaphore = self._company_semaphores.get(company_id)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(SYNC_JOBS_MAX_PER_COMPANY)
+            self._company_semaphores[company_id] = semaphore
+        return semaphore
+
+    def update_job(self, job_id: int, **values) -> None:
+        """Atualiza campos do job em uma sessão própria (bloqueante: no event loop use update_job_async)."""
+        db = SessionLocal()
+        try:
+            db.query(SyncJob).filter(SyncJob.id == job_id).update(
+                {**values, "updated_at": datetime.utcnow()}, synchronize_session=False
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Erro ao atualizar job {job_id}: {e}")
+        finally:
+            db.close()
+
+    async def update_job_async(self, job_id: int, **values) -> None:
+        """update_job executado no threadpool."""
+        await run_in_threadpool(self.update_job, job_id, **values)
+
+    async def submit(
+        self,
+        db: Session,
+        company_id: int,
+        job_type: str,
+        func: JobFunction,
+        params: Optional[dict] = None
+    ) -> SyncJob:
+        """Registra o job e agenda sua execução. Retorna imediatamente.
+
+        Se já houver um job do mesmo tipo e parâmetros ativo para a empresa, ele é
+        reaproveitado em vez de criar outro.
+        """
+        job = await run_in_session(db, self._find_or_create, db, company_id, job_type, params)
+        if job.id in self._tasks:
+            return job
+
+        job_id = job.id
+        task = asyncio.create_task(self._run(job_id, company_id, job_type, func))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        logger.info(f"Job {job_id} ({job_type}) agendado para a empresa {company_id}")
+        return job
+
+    def _find_or_create(
+        self,
+        db: Session,
+        company_id: int,
+        job_type: str,
+        params: Optional[dict]
+    ) -> SyncJob:
+        """Job ativo igual com tarefa neste processo ou um novo job pendente."""
+        active_jobs = db.query(SyncJob).filter(
+            SyncJob.company_id == company_id,
+            SyncJob.job_type == job_type,
+            SyncJob.status.in_(ACTIVE_STATUSES)
+        ).all()
+        for active_job in active_jobs:
+            if active_job.params == params and active_job.id in self._tasks:
+                return active_job
+
+        job = SyncJob(company_id=company_id, job_type=job_type, status="pending", params=params)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    async def _run(self, job_id: int, company_id: int, job_type: str, func: JobFunction) -> None:
+        progress = JobProgress(job_id)
+        try:
+            async with self._get_global_semaphore(), self._get_company_semaphore(company_id):
+                await self.update_job_async(job_id, status="running", started_at=datetime.utcnow())
+                logger.info(f"Job {job_id} ({job_type}) iniciado")
+
+                # O token é obtido agora, e não no agendamento: um job que esperou
+                # na fila não começa com um token já expirado
+                credentials = await token_manager.get_credentials(None, company_id)
+                if credentials is None:
+                    raise TokenRefreshError("Integração com o Mercado Livre não encontrada")
+
+                db = SessionLocal()
+                try:
+                    result = await func(db, progress, credentials.access_token)
+                except BaseException:
+                    await run_in_session(db, db.rollback)
+                    raise
+                finally:
+                    await run_in_session(db, db.close)
+
+            await progress.wait()
+            await self.update_job_async(
+                job_id,
+                status="completed",
+                result=result,
+                progress_current=progress.current,
+                progress_total=progress.total,
+                finished_at=datetime.utcnow()
+            )
+            logger.info(f"Job {job_id} ({job_type}) concluído")
+        except asyncio.CancelledError:
+            await progress.wait()
+            await self.update_job_async(job_id, status="cancelled", finished_at=datetime.utcnow())
+            logger.info(f"Job {job_id} ({job_type}) cancelado")
+        except Exception as e:
+            await progress.wait()
+            await self.update_job_async(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+            logger.error(f"Job {job_id} ({job_type}) falhou: {e}")
+
+    async def cancel(self, job_id: int) -> bool:
+        """Cancela um job em execução ou na fila e aguarda o status final ser gravado.
+
+        A espera é limitada a JOB_CANCEL_WAIT_SECONDS; se a tarefa demorar mais,
+        o status "cancelled" é gravado por ela ao terminar.
+        """
+        task = self._tasks.get(job_id)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        await asyncio.wait([task], timeout=JOB_CANCEL_WAIT_SECONDS)
+        return True
+
+    def recover_interrupted_jobs(self) -> None:
+        """Marca como falhos os jobs que estavam ativos quando o processo parou."""
+        db = SessionLocal()
+        try:
+            count = db.query(SyncJob).filter(SyncJob.status.in_(ACTIVE_STATUSES)).update(
+                {
+                    "status": "failed",
+                    "error": "Interrompido pela reinicialização do servidor",
+                    "finished_at": datetime.utcnow()
+                },
+                synchronize_session=False
+            )
+            db.commit()
+            if count:
+                logger.warning(f"{count} jobs interrompidos marcados como falhos")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Erro ao recuperar jobs interrompidos: {e}")
+        finally:
+            db.close()
+
+    async def shutdown(self) -> None:
+        """Cancela os jobs ativos (chamado no encerramento da aplicação)."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Instância global do executor
+job_runner = JobRunner()
@@ -1,14 +1,31 @@
 import httpx
 import os
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from sqlalchemy.orm import Session
 from app.models import MercadoLivreIntegration
 from app.schemas import OAuth2TokenResponse, MercadoLivreIntegrationCreate
+from app.services.http_client import get_http_client
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Limite de IDs por requisição do multiget (/items?ids=)
+ITEMS_MULTIGET_LIMIT = 20
+
+# Campos do item que armazenamos/exibimos (projeção via attributes=)
+ITEM_ATTRIBUTES = [
+    "id", "title", "price", "base_price", "original_price", "sale_price", "currency_id",
+    "available_quantity", "sold_quantity", "initial_quantity", "condition", "status",
+    "sub_status", "permalink", "thumbnail", "listing_type_id", "category_id", "domain_id",
+    "site_id", "seller_id", "catalog_listing", "catalog_product_id", "family_name", "family_id",
+    "user_product_id", "inventory_id", "attributes", "pictures", "tags", "health", "shipping",
+    "date_created", "last_updated",
+]
+
+# Validade da verificação de conexão usada pelo /status (segundos)
+CONNECTION_CHECK_TTL_SECONDS = int(os.getenv("ML_CONNECTION_CHECK_TTL_SECONDS", "60"))
+
 class MercadoLivreService:
     """Serviço para integração com a API do Mercado Livre."""
     
@@ -17,12 +34,15 @@ class MercadoLivreService:
     TOKEN_URL = "https://api.mercadolibre.com/oauth/token"
     USER_INFO_URL = "https://api.mercadolibre.com/users/me"
     REFRESH_TOKEN_URL = "https://api.mercadolibre.com/oauth/token"
+    API_URL = "https://api.mercadolibre.com"
     
     def __init__(self):
         # Credenciais da aplicação (devem ser configuradas via variáveis de ambiente)
         self.client_id = os.getenv("MERCADO_LIVRE_CLIENT_ID")
         self.client_secret = os.getenv("MERCADO_LIVRE_CLIENT_SECRET")
         self.redirect_uri = os.getenv("MERCADO_LIVRE_REDIRECT_URI", "http://localhost:5173/account/integration/callback")
+        # access_token -> (conexão válida, verificado em)
+        self._connection_checks: Dict[str, Tuple[bool, datetime]] = {}
         
         if not self.client_id or not self.client_secret:
             logger.warning("Mercado Livre credentials not configured. Set MERCADO_LIVRE_CLIENT_ID and MERCADO_LIVRE_CLIENT_SECRET environment variables.")
@@ -43,61 +63,105 @@ class MercadoLivreService:
     
     async def exchange_code_for_token(self, code: str) -> OAuth2TokenResponse:
         """Troca o código de autorização por um access token."""
-        async with httpx.AsyncClient() as client:
-            data = {
-                "grant_type": "authorization_code",
-                "client_id": self.client_id,
-                "client_secret": self.client_secret,
-                "code": code,
-                "redirect_uri": self.redirect_uri,
-            }
-            
-            response = await client.post(self.TOKEN_URL, data=data)
-            response.raise_for_status()
-            
-            token_data = response.json()
-            
-            return OAuth2TokenResponse(
-                access_token=token_data["access_token"],
-                token_type=token_data.get("token_type", "Bearer"),
-                expires_in=token_data["expires_in"],
-                scope=token_data.get("scope", ""),
-                user_id=token_data.get("user_id"),
-                refresh_token=token_data.get("refresh_token")
-            )
+        client = get_http_client()
+        data = {
+            "grant_type": "authorization_code",
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "code": code,
+            "redirect_uri": self.redirect_uri,
+        }
+        
+        response = await client.post(self.TOKEN_URL, data=data)
+        response.raise_for_status()
+        
+        token_data = response.json()
+        
+        return OAuth2TokenResponse(
+            access_token=token_data["access_token"],
+            token_type=token_data.get("token_type", "Bearer"),
+            expires_in=token_data["expires_in"],
+            scope=token_data.get("scope", ""),
+            user_id=token_data.get("user_id"),
+            refresh_token=token_data.get("refresh_token")
+        )
     
     async def refresh_access_token(self, refresh_token: str) -> OAuth2TokenResponse:
         """Renova o access token usando o refresh token."""
-        async with httpx.AsyncClient() as client:
-            data = {
-                "grant_type": "refresh_token",
-                "client_id": self.client_id,
-                "client_secret": self.client_secret,
-                "refresh_token": refresh_token,
-            }
-            
-            response = await client.post(self.REFRESH_TOKEN_URL, data=data)
-            response.raise_for_status()
-            
-            token_data = response.json()
-            
-            return OAuth2TokenResponse(
-                access_token=token_data["access_token"],
-                token_type=token_data.get("token_type", "Bearer"),
-                expires_in=token_data["expires_in"],
-                scope=token_data.get("scope", ""),
-                user_id=token_data.get("user_id"),
-                refresh_token=token_data.get("refresh_token", refresh_token)
-            )
+        client = get_http_client()
+        data = {
+            "grant_type": "refresh_token",
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "refresh_token": refresh_token,
+        }
+        
+        response = await client.post(self.REFRESH_TOKEN_URL, data=data)
+        response.raise_for_status()
+        
+        token_data = response.json()
+        
+        return OAuth2TokenResponse(
+            access_token=token_data["access_token"],
+            token_type=token_data.get("token_type", "Bearer"),
+            expires_in=token_data["expires_in"],
+            scope=token_data.get("scope", ""),
+            user_id=token_data.get("user_id"),
+            refresh_token=token_data.get("refresh_token", refresh_token)
+        )
     
     async def get_user_info(self, access_token: str) -> Dict[str, Any]:
         """Obtém informações do usuário autenticado."""
-        async with httpx.AsyncClient() as client:
-            headers = {"Authorization": f"Bearer {access_token}"}
-            response = await client.get(self.USER_INFO_URL, headers=headers)
+        client = get_http_client()
+        headers = {"Authorization": f"Bearer {access_token}"}
+        response = await client.get(self.USER_INFO_URL, headers=headers)
+        response.raise_for_status()
+        
+        return response.json()
+    
+    async def get_items(
+        self,
+        client: httpx.AsyncClient,
+        headers: Dict[str, str],
+        item_ids: List[str],
+        attributes: Optional[List[str]] = None,
+        statuses: Optional[Dict[str, int]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Busca itens em lote via multiget (até 20 IDs por requisição).
+
+        Retorna um dicionário ``item_id -> dados``; itens com status diferente
+        de 200 dentro do lote são ignorados e, com ``statuses``, têm o status
+        registrado nele (ex.: 404 para itens que não existem mais).
+        """
+        items = {}
+        for start in range(0, len(item_ids), ITEMS_MULTIGET_LIMIT):
+            batch = item_ids[start:start + ITEMS_MULTIGET_LIMIT]
+            params = {"ids": ",".join(batch)}
+            if attributes:
+                params["attributes"] = ",".join(attributes)
+
+            response = await client.get(f"{self.API_URL}/items", headers=headers, params=params)
             response.raise_for_status()
-            
-            return response.json()
+
+            # As respostas vêm na mesma ordem dos IDs pedidos
+            for requested_id, entry in zip(batch, response.json()):
+                # Com attributes= o ML pode omitir o envelope code/body
+                if "code" in entry and "body" in entry:
+                    code = entry.get("code")
+                    body = entry.get("body") or {}
+                else:
+                    code, body = 200, entry
+
+                if code != 200:
+                    logger.warning(f"Item {requested_id} retornou status {code} no multiget: {body.get('message')}")
+                    if statuses is not None:
+                        statuses[requested_id] = code
+                    continue
+
+                if body.get("id"):
+                    items[body["id"]] = body
+
+        return items
     
     async def test_connection(self, access_token: str) -> bool:
         """Testa se a conexão com o Mercado Livre está funcionando."""
@@ -108,6 +172,25 @@ class MercadoLivreService:
             logger.error(f"Error testing Mercado Livre connection: {e}")
             return False
     
+    async def check_connection(self, access_token: str) -> bool:
+        """Como test_connection, mas reaproveita o resultado por CONNECTION_CHECK_TTL_SECONDS.
+        
+        Usado pelo /status, que o frontend consulta com frequência.
+        """
+        now = datetime.utcnow()
+        ttl = timedelta(seconds=CONNECTION_CHECK_TTL_SECONDS)
+        cached = self._connection_checks.get(access_token)
+        if cached and now - cached[1] < ttl:
+            return cached[0]
+        
+        is_valid = await self.test_connection(access_token)
+        # Tokens renovados não são consultados de novo; descarta as verificações vencidas
+        self._connection_checks = {
+            token: check for token, check in self._connection_checks.items() if now - check[1] < ttl
+        }
+        self._connection_checks[access_token] = (is_valid, now)
+        return is_valid
+    
     def save_integration(self, db: Session, company_id: int, token_response: OAuth2TokenResponse) -> MercadoLivreIntegration:
         """Salva ou atualiza a integração do Mercado Livre."""
         # Calcula a data de expiração
@@ -155,32 +238,11 @@ class MercadoLivreService:
             db.refresh(new_integration)
             return new_integration
     
-    def get_valid_token(self, db: Session, company_id: int) -> Optional[str]:
+    async def get_valid_token(self, db: Session, company_id: int) -> Optional[str]:
         """Obtém um token válido, renovando se necessário."""
-        integration = db.query(MercadoLivreIntegration).filter(
-            MercadoLivreIntegration.company_id == company_id,
-            MercadoLivreIntegration.is_active == True
-        ).first()
-        
-        if not integration:
-            return None
-        
-        # Verifica se o token ainda é válido (com margem de 5 minutos)
-        if integration.expires_at > datetime.utcnow() + timedelta(minutes=5):
-            return integration.access_token
-        
-        # Se tem refresh token, tenta renovar
-        if integration.refresh_token:
-            try:
-                # Aqui você poderia implementar a renovação automática
-                # Por simplicidade, retornamos None para forçar nova autenticação
-                logger.info(f"Token expired for company {company_id}, refresh needed")
-                return None
-            except Exception as e:
-                logger.error(f"Error refreshing token for company {company_id}: {e}")
-                return None
-        
-        return None
+        # Import local para evitar import circular (o TokenManager usa este serviço)
+        from app.services.token_manager import token_manager
+        return await token_manager.get_access_token(db, company_id)
 
 # Instância global do serviço
 mercado_livre_service = MercadoLivreService()
@@ -0,0 +1,373 @@
+import asyncio
+import os
+import re
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.database import SessionLocal, run_in_session
+from app.models import MercadoLivreIntegration, MercadoLivreNotification
+from app.services.announcement_sync import announcement_sync_service, parse_ml_datetime
+from app.services.http_client import get_http_client
+from app.services.order_sync import order_sync_service
+from app.services.token_manager import token_manager, TokenRefreshError
+
+logger = logging.getLogger(__name__)
+
+# Processamento das notificações
+NOTIFICATIONS_COALESCE_SECONDS = float(os.getenv("ML_NOTIFICATIONS_COALESCE_SECONDS", "2"))
+NOTIFICATIONS_POLL_INTERVAL = float(os.getenv("ML_NOTIFICATIONS_POLL_INTERVAL", "30"))
+NOTIFICATIONS_BATCH_SIZE = int(os.getenv("ML_NOTIFICATIONS_BATCH_SIZE", "500"))
+NOTIFICATIONS_MAX_ATTEMPTS = int(os.getenv("ML_NOTIFICATIONS_MAX_ATTEMPTS", "5"))
+# Espera antes de uma nova tentativa: dobra a cada falha, até o máximo (segundos)
+NOTIFICATIONS_RETRY_BASE_SECONDS = float(os.getenv("ML_NOTIFICATIONS_RETRY_BASE_SECONDS", "30"))
+NOTIFICATIONS_RETRY_MAX_SECONDS = float(os.getenv("ML_NOTIFICATIONS_RETRY_MAX_SECONDS", "3600"))
+# Reservas mais antigas que isto são consideradas abandonadas (processo parado)
+NOTIFICATIONS_CLAIM_TIMEOUT_SECONDS = float(os.getenv("ML_NOTIFICATIONS_CLAIM_TIMEOUT_SECONDS", "900"))
+NOTIFICATIONS_RETENTION_DAYS = int(os.getenv("ML_NOTIFICATIONS_RETENTION_DAYS", "7"))
+
+SUPPORTED_TOPICS = ("items", "orders_v2", "questions", "price_suggestion")
+
+# Extrai o ID do recurso alterado de cada tópico
+_ITEM_ID = re.compile(r"/(ML[A-Z]\d+)")
+_ORDER_ID = re.compile(r"^/orders/(\d+)")
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Espera antes da próxima tentativa de uma notificação que falhou ``attempts`` vezes."""
+    seconds = NOTIFICATIONS_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, NOTIFICATIONS_RETRY_MAX_SECONDS))
+
+
+def extract_resource_id(topic: str, resource: str) -> Optional[str]:
+    """Retorna o ID a buscar novamente: item (items, price_suggestion) ou pedido (orders_v2)."""
+    if topic in ("items", "price_suggestion"):
+        match = _ITEM_ID.search(resource)
+    elif topic == "orders_v2":
+        match = _ORDER_ID.match(resource)
+    else:
+        return None
+    return match.group(1) if match else None
+
+
+class NotificationService:
+    """Ingestão das notificações do Mercado Livre e atualização por recurso.
+
+    O callback apenas valida e grava a notificação (deduplicada por recurso e
+    horário de envio). Um worker no próprio processo agrupa as pendentes,
+    busca uma única vez cada item ou pedido alterado e atualiza o banco.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def parse(self, payload: Any) -> Optional[dict]:
+        """Valida o corpo do webhook e o converte para as colunas da tabela."""
+        if not isinstance(payload, dict):
+            return None
+
+        topic = payload.get("topic")
+        resource = payload.get("resource")
+        user_id = payload.get("user_id")
+        if topic not in SUPPORTED_TOPICS or not isinstance(resource, str) or not resource or not user_id:
+            return None
+
+        try:
+            sent = parse_ml_datetime(payload.get("sent"))
+        except (TypeError, ValueError):
+            sent = None
+
+        return {
+            "notification_id": payload.get("_id"),
+            "topic": topic,
+            "resource": resource[:255],
+            "ml_user_id": str(user_id),
+            "application_id": str(payload["application_id"]) if payload.get("application_id") else None,
+            "attempts": payload.get("attempts") or 1,
+            "sent": sent.replace(tzinfo=None) if sent else datetime.utcnow(),
+            "payload": payload,
+            "status": "pending",
+            "processing_attempts": 0,
+            "received_at": datetime.utcnow()
+        }
+
+    def store(self, db: Session, payload: Any) -> Optional[bool]:
+        """Grava a notificação sem acordar o worker (pode rodar fora do event loop).
+
+        Retorna None se inválida, False se repetida e True se nova.
+        """
+        row = self.parse(payload)
+        if row is None:
+            return None
+
+        stmt = insert(MercadoLivreNotification).values(row).on_conflict_do_nothing(
+            index_elements=["resource", "sent"]
+        ).returning(MercadoLivreNotification.id)
+        inserted = db.execute(stmt).first() is not None
+        db.commit()
+        return inserted
+
+    def wake(self) -> None:
+        """Acorda o worker para processar as notificações recém-gravadas."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        """Inicia o worker (chamado na inicialização da aplicação)."""
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+        logger.info("Worker de notificações do Mercado Livre iniciado")
+
+    async def stop(self) -> None:
+        """Encerra o worker (chamado no encerramento da aplicação)."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def _release_stale(self) -> None:
+        """Devolve à fila as notificações reservadas há mais que NOTIFICATIONS_CLAIM_TIMEOUT_SECONDS.
+
+        Só as reservas antigas são liberadas: as de outro processo ainda em
+        execução continuam com ele. Bloqueante: chamado no threadpool.
+        """
+        db = SessionLocal()
+        try:
+            cutoff = datetime.utcnow() - timedelta(seconds=NOTIFICATIONS_CLAIM_TIMEOUT_SECONDS)
+            count = db.query(MercadoLivreNotification).filter(
+                MercadoLivreNotification.status == "processing",
+                or_(
+                    MercadoLivreNotification.claimed_at.is_(None),
+                    MercadoLivreNotification.claimed_at < cutoff
+                )
+            ).update({"status": "pending"}, synchronize_session=False)
+            db.commit()
+            if count:
+                logger.warning(f"{count} notificações interrompidas devolvidas à fila")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Erro ao liberar notificações interrompidas: {e}")
+        finally:
+            db.close()
+
+    async def _loop(self) -> None:
+        await run_in_threadpool(self._release_stale)
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=NOTIFICATIONS_POLL_INTERVAL)
+                # Aguarda um pouco para agrupar notificações do mesmo recurso
+                await asyncio.sleep(NOTIFICATIONS_COALESCE_SECONDS)
+            except asyncio.TimeoutError:
+                await run_in_threadpool(self._release_stale)
+                await run_in_threadpool(self.purge_old)
+            self._wakeup.clear()
+
+            try:
+                while await self.process_pending() >= NOTIFICATIONS_BATCH_SIZE:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erro no worker de notificações: {e}")
+
+    def _claim_pending(self, db: Session) -> List[MercadoLivreNotification]:
+        """Reserva um lote de pendentes (SKIP LOCKED permite vários processos).
+
+        As que falharam só voltam depois de next_attempt_at.
+        """
+        notifications = db.query(MercadoLivreNotification).filter(
+            MercadoLivreNotification.status == "pending",
+            or_(
+                MercadoLivreNotification.next_attempt_at.is_(None),
+                MercadoLivreNotification.next_attempt_at <= datetime.utcnow()
+            )
+        ).order_by(MercadoLivreNotification.id).limit(NOTIFICATIONS_BATCH_SIZE).with_for_update(skip_locked=True).all()
+
+        now = datetime.utcnow()
+        for notification in notifications:
+            notification.status = "processing"
+            notification.claimed_at = now
+            notification.processing_attempts = (notification.processing_attempts or 0) + 1
+        db.commit()
+        return notifications
+
+    def _load_companies(self, db: Session, ml_user_ids: set) -> Dict[str, int]:
+        """Mapeia o ID do vendedor no ML para a empresa com integração ativa."""
+        integrations = db.query(
+            MercadoLivreIntegration.user_id,
+            MercadoLivreIntegration.company_id
+        ).filter(
+            MercadoLivreIntegration.user_id.in_(ml_user_ids),
+            MercadoLivreIntegration.is_active == True
+        ).all()
+        return {user_id: company_id for user_id, company_id in integrations}
+
+    async def _refresh_company(
+        self,
+        db: Session,
+        company_id: int,
+        item_ids: List[str],
+        order_ids: List[str]
+    ) -> Tuple[set, set]:
+        """Atualiza os itens e pedidos da empresa e grava tudo em um commit.
+
+        Retorna os IDs (itens, pedidos) que não puderam ser buscados no ML;
+        recursos que não existem mais (404) não contam como falha.
+        """
+        credentials = await token_manager.get_credentials(db, company_id)
+        if not credentials:
+            raise TokenRefreshError("Integração inativa")
+
+        client = get_http_client()
+        failed_items: List[str] = []
+        failed_orders: List[str] = []
+        if item_ids:
+            _, _, failed_items = await announcement_sync_service.refresh_items(
+                db, client, credentials.access_token, company_id, item_ids
+            )
+        if order_ids:
+            _, _, failed_orders = await order_sync_service.refresh_orders(
+                db, client, credentials.access_token, company_id, order_ids
+            )
+        await run_in_session(db, db.commit)
+        return set(failed_items), set(failed_orders)
+
+    async def process_pending(self) -> int:
+        """Processa um lote de notificações pendentes. Retorna quantas foram reservadas.
+
+        O acesso ao banco roda no threadpool; expire_on_commit=False evita que
+        a leitura dos atributos após cada commit volte a consultar o banco no
+        event loop.
+        """
+        db = SessionLocal(expire_on_commit=False)
+        try:
+            notifications = await run_in_session(db, self._claim_pending, db)
+            if not notifications:
+                return 0
+
+            companies = await run_in_session(db, self._load_companies, db, {n.ml_user_id for n in notifications})
+
+            # Agrupa por empresa; vários avisos do mesmo recurso viram uma única busca
+            groups: Dict[int, Tuple[set, set, List[Tuple[MercadoLivreNotification, str]]]] = {}
+            now = datetime.utcnow()
+            for notification in notifications:
+                company_id = companies.get(notification.ml_user_id)
+                resource_id = extract_resource_id(notification.topic, notification.resource)
+                if company_id is None or (resource_id is None and notification.topic != "questions"):
+                    notification.status = "ignored"
+                    notification.processed_at = now
+                    continue
+                if notification.topic == "questions":
+                    # Perguntas não têm tabela local: nada é atualizado
+                    notification.status = "ignored"
+                    notification.processed_at = now
+                    continue
+
+                item_ids, order_ids, members = groups.setdefault(company_id, (set(), set(), []))
+                if notification.topic == "orders_v2":
+                    order_ids.add(resource_id)
+                else:
+                    item_ids.add(resource_id)
+                members.append((notification, resource_id))
+            await run_in_session(db, db.commit)
+
+            for company_id, (item_ids, order_ids, members) in groups.items():
+                member_ids = [notification.id for notification, _ in members]
+                # Lido antes do rollback, que expira os objetos da sessão
+                attempts = {notification.id: notification.processing_attempts or 0 for notification, _ in members}
+                try:
+                    failed_items, failed_orders = await self._refresh_company(
+                        db, company_id, sorted(item_ids), sorted(order_ids)
+                    )
+                except asyncio.CancelledError:
+                    await run_in_session(db, db.rollback)
+                    await run_in_session(db, self._set_status, db, member_ids, {"status": "pending"})
+                    raise
+                except Exception as e:
+                    await run_in_session(db, db.rollback)
+                    logger.error(f"Erro ao processar notificações da empresa {company_id}: {e}")
+                    await run_in_session(db, self._schedule_retries, db, attempts, str(e)[:2000])
+                    continue
+
+                # Avisos de recursos que o ML não devolveu voltam para a fila
+                failed_ids = [
+                    notification.id for notification, resource_id in members
+                    if resource_id in (failed_orders if notification.topic == "orders_v2" else failed_items)
+                ]
+                if failed_ids:
+                    failed_resources = sorted(failed_items | failed_orders)
+                    error = f"Não foi possível buscar no ML: {', '.join(failed_resources[:10])}"
+                    logger.error(f"Notificações da empresa {company_id}: {error}")
+                    await run_in_session(
+                        db, self._schedule_retries, db,
+                        {notification_id: attempts[notification_id] for notification_id in failed_ids}, error
+                    )
+
+                processed_ids = [notification_id for notification_id in member_ids if notification_id not in failed_ids]
+                logger.info(
+                    f"Notificações da empresa {company_id}: {len(item_ids) - len(failed_items)} itens e "
+                    f"{len(order_ids) - len(failed_orders)} pedidos atualizados ({len(processed_ids)} avisos)"
+                )
+                if processed_ids:
+                    await run_in_session(
+                        db, self._set_status, db, processed_ids,
+                        {"status": "processed", "processed_at": datetime.utcnow(), "next_attempt_at": None, "error": None}
+                    )
+
+            return len(notifications)
+        finally:
+            await run_in_session(db, db.close)
+
+    def _set_status(self, db: Session, notification_ids: List[int], values: dict) -> None:
+        db.query(MercadoLivreNotification).filter(
+            MercadoLivreNotification.id.in_(notification_ids)
+        ).update(values, synchronize_session=False)
+        db.commit()
+
+    def _schedule_retries(self, db: Session, attempts: Dict[int, int], error: str) -> None:
+        """Devolve à fila com backoff as notificações que falharam, ou as marca como falhas
+        depois de NOTIFICATIONS_MAX_ATTEMPTS tentativas.
+        """
+        now = datetime.utcnow()
+        by_attempts: Dict[int, List[int]] = {}
+        for notification_id, attempt_count in attempts.items():
+            by_attempts.setdefault(attempt_count, []).append(notification_id)
+
+        for attempt_count, notification_ids in by_attempts.items():
+            if attempt_count >= NOTIFICATIONS_MAX_ATTEMPTS:
+                values = {"status": "failed", "processed_at": now, "next_attempt_at": None}
+            else:
+                values = {"status": "pending", "next_attempt_at": now + retry_delay(attempt_count)}
+            db.query(MercadoLivreNotification).filter(
+                MercadoLivreNotification.id.in_(notification_ids)
+            ).update({**values, "error": error}, synchronize_session=False)
+        db.commit()
+
+    def purge_old(self) -> None:
+        """Remove as notificações finalizadas há mais que o período de retenção."""
+        db = SessionLocal()
+        try:
+            cutoff = datetime.utcnow() - timedelta(days=NOTIFICATIONS_RETENTION_DAYS)
+            count = db.query(MercadoLivreNotification).filter(
+                MercadoLivreNotification.status.in_(("processed", "ignored")),
+                MercadoLivreNotification.received_at < cutoff
+            ).delete(synchronize_session=False)
+            db.commit()
+            if count:
+                logger.info(f"{count} notificações antigas removidas")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Erro ao remover notificações antigas: {e}")
+        finally:
+            db.close()
+
+
+# Instância global do serviço
+notification_service = NotificationService()
@@ -0,0 +1,618 @@
+import asyncio
+import os
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import httpx
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from app.database import run_in_session
+from app.models import MercadoLivreOrder
+from app.services.announcement_sync import parse_ml_datetime
+from app.services.bulk_upsert import bulk_upsert
+from app.services.etag import bump_versions
+from app.services.sync_checkpoint import sync_checkpoint_service
+
+logger = logging.getLogger(__name__)
+
+ML_API_URL = "https://api.mercadolibre.com"
+ORDERS_PAGE_LIMIT = 50  # Limite máximo permitido pela API
+
+# Buscas de /orders/{id} simultâneas por sincronização
+ORDERS_DETAIL_CONCURRENCY = int(os.getenv("ML_ORDERS_DETAIL_CONCURRENCY", "8"))
+
+# Janelas de data da busca de pedidos
+ORDERS_SEARCH_MAX_RESULTS = int(os.getenv("ML_ORDERS_SEARCH_MAX_RESULTS", "1000"))  # Limite de offset da busca
+ORDERS_WINDOW_DAYS = int(os.getenv("ML_ORDERS_WINDOW_DAYS", "7"))
+ORDERS_WINDOW_CONCURRENCY = int(os.getenv("ML_ORDERS_WINDOW_CONCURRENCY", "4"))
+ORDERS_HISTORY_DAYS = int(os.getenv("ML_ORDERS_HISTORY_DAYS", "365"))  # Primeira sincronização sem days_back
+ORDERS_MIN_WINDOW = timedelta(hours=1)
+ORDERS_HWM_OVERLAP = timedelta(minutes=10)  # Margem para atrasos de indexação da busca
+
+# Campos do resultado de /orders/search necessários para dispensar /orders/{id}
+ORDER_SEARCH_REQUIRED_FIELDS = (
+    "id", "status", "date_created", "date_last_updated", "total_amount",
+    "order_items", "payments", "buyer", "seller", "shipping"
+)
+
+
+def _format_phone(phone: Optional[dict]) -> Optional[str]:
+    if not phone:
+        return None
+    return f"{phone.get('area_code', '')}{phone.get('number', '')}"
+
+
+def _to_float(value: Any) -> Optional[float]:
+    return float(value) if value else None
+
+
+def to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Converte para UTC sem fuso, como as datas ficam gravadas no banco."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _parse_utc(value: Optional[str]) -> Optional[datetime]:
+    return to_utc_naive(parse_ml_datetime(value))
+
+
+def format_ml_datetime(value: datetime) -> str:
+    """Formata um datetime UTC no padrão aceito pelos filtros de data do ML."""
+    return value.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "-00:00"
+
+
+class OrderSyncError(Exception):
+    """Falha da API do Mercado Livre durante a sincronização de pedidos."""
+
+
+def has_complete_payload(order: dict) -> bool:
+    """Indica se o pedido retornado pela busca já traz os campos gravados no banco."""
+    return all(order.get(field) is not None for field in ORDER_SEARCH_REQUIRED_FIELDS)
+
+
+class OrderSyncService:
+    """Sincronização de pedidos do Mercado Livre com o banco local."""
+
+    def build_order_data(self, company_id: int, order_detail: dict) -> dict:
+        """Converte o payload de /orders/{id} para as colunas de MercadoLivreOrder."""
+        buyer = order_detail.get("buyer") or {}
+        seller = order_detail.get("seller") or {}
+        shipping = order_detail.get("shipping") or {}
+        payments = order_detail.get("payments") or []
+        payment = payments[0] if payments else {}
+        feedback = order_detail.get("feedback") or {}
+
+        if not order_detail.get("date_created"):
+            raise ValueError("Pedido sem date_created")
+
+        return {
+            "company_id": company_id,
+            "order_id": str(order_detail.get("id")),
+            "status": order_detail.get("status", ""),
+            "status_detail": order_detail.get("status_detail", {}).get("description") if order_detail.get("status_detail") else None,
+            "date_created": _parse_utc(order_detail.get("date_created")),
+            "date_closed": _parse_utc(order_detail.get("date_closed")),
+            "date_last_updated": _parse_utc(order_detail.get("date_last_updated")),
+            "total_amount": float(order_detail.get("total_amount", 0)),
+            "paid_amount": _to_float(order_detail.get("paid_amount")),
+            "currency_id": order_detail.get("currency_id", "BRL"),
+            "comment": order_detail.get("comment"),
+            "pack_id": str(order_detail.get("pack_id")) if order_detail.get("pack_id") else None,
+            "pickup_id": str(order_detail.get("pickup_id")) if order_detail.get("pickup_id") else None,
+            "fulfilled": order_detail.get("fulfilled"),
+
+            # Dados do comprador
+            "buyer_id": str(buyer.get("id", "")),
+            "buyer_nickname": buyer.get("nickname"),
+            "buyer_email": buyer.get("email"),
+            "buyer_first_name": buyer.get("first_name"),
+            "buyer_last_name": buyer.get("last_name"),
+            "buyer_phone": _format_phone(buyer.get("phone")),
+            "buyer_alternative_phone": _format_phone(buyer.get("alternative_phone")),
+            "buyer_registration_date": _parse_utc(buyer.get("registration_date")),
+            "buyer_user_type": buyer.get("user_type"),
+            "buyer_country_id": buyer.get("country_id"),
+            "buyer_site_id": buyer.get("site_id"),
+            "buyer_permalink": buyer.get("permalink"),
+            "buyer_address_state": buyer.get("address", {}).get("state"),
+            "buyer_address_city": buyer.get("address", {}).get("city"),
+            "buyer_address_address": buyer.get("address", {}).get("address"),
+            "buyer_address_zip_code": buyer.get("address", {}).get("zip_code"),
+            "buyer_identification_type": buyer.get("identification", {}).get("type"),
+            "buyer_identification_number": buyer.get("identification", {}).get("number"),
+
+            # Dados do vendedor
+            "seller_id": str(seller.get("id", "")),
+            "seller_nickname": seller.get("nickname"),
+            "seller_email": seller.get("email"),
+            "seller_first_name": seller.get("first_name"),
+            "seller_last_name": seller.get("last_name"),
+            "seller_phone": _format_phone(seller.get("phone")),
+            "seller_alternative_phone": _format_phone(seller.get("alternative_phone")),
+            "seller_registration_date": _parse_utc(seller.get("registration_date")),
+            "seller_user_type": seller.get("user_type"),
+            "seller_country_id": seller.get("country_id"),
+            "seller_site_id": seller.get("site_id"),
+            "seller_permalink": seller.get("permalink"),
+            "seller_address_state": seller.get("address", {}).get("state"),
+            "seller_address_city": seller.get("address", {}).get("city"),
+            "seller_address_address": seller.get("address", {}).get("address"),
+            "seller_address_zip_code": seller.get("address", {}).get("zip_code"),
+            "seller_identification_type": seller.get("identification", {}).get("type"),
+            "seller_identification_number": seller.get("identification", {}).get("number"),
+
+            # Dados de envio
+            "shipping_id": str(shipping.get("id")) if shipping.get("id") else None,
+            "shipping_status": shipping.get("status"),
+            "shipping_substatus": shipping.get("substatus"),
+            "shipping_cost": _to_float(shipping.get("cost")),
+            "shipping_tracking_number": shipping.get("tracking_number"),
+            "shipping_tracking_method": shipping.get("tracking_method"),
+            "shipping_declared_value": _to_float(shipping.get("declared_value")),
+
+            # Dados de pagamento (primeiro pagamento)
+            "payment_method_id": payment.get("payment_method_id"),
+            "payment_type": payment.get("payment_type"),
+            "payment_status": payment.get("status"),
+            "payment_installments": payment.get("installments"),
+            "payment_operation_type": payment.get("operation_type"),
+            "payment_status_code": payment.get("status_code"),
+            "payment_status_detail": payment.get("status_detail"),
+            "payment_transaction_amount": _to_float(payment.get("transaction_amount")),
+            "payment_transaction_amount_refunded": _to_float(payment.get("transaction_amount_refunded")),
+            "payment_taxes_amount": _to_float(payment.get("taxes_amount")),
+            "payment_coupon_amount": _to_float(payment.get("coupon_amount")),
+            "payment_overpaid_amount": _to_float(payment.get("overpaid_amount")),
+            "payment_installment_amount": _to_float(payment.get("installment_amount")),
+            "payment_authorization_code": payment.get("authorization_code"),
+            "payment_transaction_order_id": payment.get("transaction_order_id"),
+            "payment_date_approved": _parse_utc(payment.get("date_approved")),
+            "payment_date_last_modified": _parse_utc(payment.get("date_last_modified")),
+            "payment_collector_id": str(payment.get("collector", {}).get("id")) if payment.get("collector", {}).get("id") else None,
+            "payment_card_id": str(payment.get("card_id")) if payment.get("card_id") else None,
+            "payment_issuer_id": payment.get("issuer_id"),
+
+            # Feedback
+            "feedback_sale_rating": (feedback.get("sale") or {}).get("rating"),
+            "feedback_sale_fulfilled": (feedback.get("sale") or {}).get("fulfilled"),
+            "feedback_purchase_rating": (feedback.get("purchase") or {}).get("rating"),
+            "feedback_purchase_fulfilled": (feedback.get("purchase") or {}).get("fulfilled"),
+
+            # Tags e itens
+            "tags": order_detail.get("tags", []),
+            "order_items": order_detail.get("order_items", []),
+
+            "ml_date_created": datetime.utcnow(),
+            "ml_last_updated": datetime.utcnow()
+        }
+
+    def save_orders(self, db: Session, rows: List[dict]) -> Tuple[int, int]:
+        """Grava um lote de pedidos em um único upsert. Retorna (inseridos, atualizados).
+
+        Pedidos existentes só são reescritos (inclusive as colunas de comprador,
+        envio e pagamento) quando o date_last_updated recebido é mais recente;
+        dados mais antigos, como uma notificação atrasada, são descartados.
+        Pedidos idênticos aos gravados não são reescritos nem mudam a versão (ETag).
+        """
+        # ml_date_created registra a primeira sincronização e não é sobrescrito
+        update_columns = [
+            column.name for column in MercadoLivreOrder.__table__.c
+            if column.name != "ml_date_created"
+        ]
+        inserted, updated = bulk_upsert(
+            db,
+            MercadoLivreOrder,
+            rows,
+            conflict_columns=["company_id", "order_id"],
+            update_columns=update_columns,
+            where=lambda excluded: or_(
+                MercadoLivreOrder.date_last_updated.is_(None),
+                MercadoLivreOrder.date_last_updated < excluded.date_last_updated
+            ),
+            skip_unchanged=True,
+            # Preenchida com a hora da sincronização, não com dados do ML
+            ignored_columns=["ml_last_updated"]
+        )
+        if inserted or updated:
+            bump_versions(db, "orders", {row["company_id"] for row in rows})
+        return inserted, updated
+
+    def get_existing_order_versions(
+        self,
+        db: Session,
+        company_id: int,
+        order_ids: List[str]
+    ) -> Dict[str, Optional[datetime]]:
+        """Retorna, em uma única consulta, o date_last_updated dos pedidos já gravados."""
+        if not order_ids:
+            return {}
+        rows = db.query(MercadoLivreOrder.order_id, MercadoLivreOrder.date_last_updated).filter(
+            MercadoLivreOrder.company_id == company_id,
+            MercadoLivreOrder.order_id.in_(order_ids)
+        ).all()
+        return {row.order_id: row.date_last_updated for row in rows}
+
+    def is_unchanged(self, stored_last_updated: Optional[datetime], order_data: dict) -> bool:
+        """Compara o date_last_updated da busca com o gravado no banco."""
+        if stored_last_updated is None:
+            return False
+        try:
+            incoming = _parse_utc(order_data.get("date_last_updated"))
+        except (TypeError, ValueError):
+            return False
+        return incoming is not None and incoming == stored_last_updated
+
+    async def fetch_order_detail(
+        self,
+        client: httpx.AsyncClient,
+        headers: dict,
+        order_id: str,
+        not_found: Optional[set] = None
+    ) -> Optional[dict]:
+        """Busca os detalhes completos de um pedido. Com ``not_found``, registra nele os 404."""
+        try:
+            response = await client.get(f"{ML_API_URL}/orders/{order_id}", headers=headers)
+            if response.status_code == 200:
+                return response.json()
+            logger.warning(f"Erro ao buscar detalhes do pedido {order_id}: {response.status_code}")
+            if response.status_code == 404 and not_found is not None:
+                not_found.add(order_id)
+        except Exception as e:
+            logger.error(f"Erro ao buscar detalhes do pedido {order_id}: {e}")
+        return None
+
+    async def fetch_order_details(
+        self,
+        client: httpx.AsyncClient,
+        headers: dict,
+        order_ids: List[str],
+        not_found: Optional[set] = None
+    ) -> Dict[str, dict]:
+        """Busca os detalhes de vários pedidos em paralelo (até ORDERS_DETAIL_CONCURRENCY).
+
+        Pedidos que falharem ficam fora do resultado.
+        """
+        semaphore = asyncio.Semaphore(ORDERS_DETAIL_CONCURRENCY)
+
+        async def fetch_with_limit(order_id: str) -> Optional[dict]:
+            async with semaphore:
+                return await self.fetch_order_detail(client, headers, order_id, not_found)
+
+        details = await asyncio.gather(*(fetch_with_limit(order_id) for order_id in order_ids))
+        return {
+            order_id: detail for order_id, detail in zip(order_ids, details)
+            if detail is not None
+        }
+
+    async def resolve_order_details(
+        self,
+        client: httpx.AsyncClient,
+        headers: dict,
+        orders: List[dict]
+    ) -> List[dict]:
+        """Usa o payload da busca quando completo e busca /orders/{id} só para o restante.
+
+        Levanta OrderSyncError se algum detalhe não puder ser obtido, para que
+        a janela não seja dada como concluída com pedidos faltando.
+        """
+        missing_ids = [str(order.get("id")) for order in orders if not has_complete_payload(order)]
+        fetched = await self.fetch_order_details(client, headers, missing_ids) if missing_ids else {}
+
+        failed_ids = [order_id for order_id in missing_ids if order_id not in fetched]
+        if failed_ids:
+            raise OrderSyncError(
+                f"Não foi possível obter os detalhes de {len(failed_ids)} pedido(s): {', '.join(failed_ids[:10])}"
+            )
+
+        return [
+            order if has_complete_payload(order) else fetched[str(order.get("id"))]
+            for order in orders
+        ]
+
+    async def refresh_orders(
+        self,
+        db: Session,
+        client: httpx.AsyncClient,
+        access_token: str,
+        company_id: int,
+        order_ids: List[str]
+    ) -> Tuple[int, int, List[str]]:
+        """Busca novamente e regrava apenas os pedidos informados (ex.: notificações).
+
+        Não faz commit. Retorna (inseridos, atualizados, IDs que não puderam ser
+        buscados ou gravados). Pedidos que não existem mais (404) não contam como falha.
+        """
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json"
+        }
+        rows = []
+        not_found = set()
+        details = await self.fetch_order_details(client, headers, order_ids, not_found)
+        failed_ids = [order_id for order_id in order_ids if order_id not in details and order_id not in not_found]
+        for order_id, order_detail in details.items():
+            try:
+                rows.append(self.build_order_data(company_id, order_detail))
+            except Exception as e:
+                logger.error(f"Erro ao processar pedido {order_id}: {e}")
+                failed_ids.append(order_id)
+        if not rows:
+            return 0, 0, failed_ids
+        inserted, updated = await run_in_session(db, self.save_orders, db, rows)
+        return inserted, updated, failed_ids
+
+    async def _search_orders_page(
+        self,
+        client: httpx.AsyncClient,
+        headers: dict,
+        semaphore: asyncio.Semaphore,
+        params: dict
+    ) -> dict:
+        """Busca uma página de /orders/search. Levanta exceção se a API falhar."""
+        async with semaphore:
+            response = await client.get(f"{ML_API_URL}/orders/search", params=params, headers=headers)
+        if response.status_code != 200:
+            logger.error(f"Erro na API do Mercado Livre: {response.status_code} - {response.text}")
+            raise OrderSyncError(f"Erro na API do Mercado Livre: {response.status_code}")
+        return response.json()
+
+    async def _sync_window(
+        self,
+        db: Session,
+        client: httpx.AsyncClient,
+        headers: dict,
+        semaphore: asyncio.Semaphore,
+        company_id: int,
+        seller_id: str,
+        date_field: str,
+        window_from: datetime,
+        window_to: datetime,
+        stats: dict,
+        progress: Optional[Callable[[int, Optional[int]], None]]
+    ) -> None:
+        """Sincroniza uma janela de datas, dividindo-a enquanto exceder o limite de offset."""
+        params = {
+            "seller": seller_id,
+            "sort": "date_asc",
+            f"{date_field}.from": format_ml_datetime(window_from),
+            f"{date_field}.to": format_ml_datetime(window_to - timedelta(milliseconds=1)),
+            "limit": ORDERS_PAGE_LIMIT,
+            "offset": 0
+        }
+        data = await self._search_orders_page(client, headers, semaphore, params)
+        total = data.get("paging", {}).get("total", 0)
+
+        if total > ORDERS_SEARCH_MAX_RESULTS:
+            if window_to - window_from > ORDERS_MIN_WINDOW:
+                middle = window_from + (window_to - window_from) / 2
+                await asyncio.gather(
+                    self._sync_window(db, client, headers, semaphore, company_id, seller_id, date_field,
+                                      window_from, middle, stats, progress),
+                    self._sync_window(db, client, headers, semaphore, company_id, seller_id, date_field,
+                                      middle, window_to, stats, progress)
+                )
+                return
+            logger.warning(
+                f"Janela {window_from} - {window_to} com {total} pedidos excede o limite de "
+                f"{ORDERS_SEARCH_MAX_RESULTS}; pedidos além do limite não serão obtidos"
+            )
+            stats["truncated"] += total - ORDERS_SEARCH_MAX_RESULTS
+
+        stats["total_available"] += total
+        if progress:
+            progress(stats["processed"], stats["total_available"])
+
+        while True:
+            orders = data.get("results", [])
+            if not orders:
+                break
+
+            await self._save_orders_page(db, client, headers, company_id, orders, stats)
+            await run_in_session(db, db.commit)
+
+            stats["processed"] += len(orders)
+            if progress:
+                progress(stats["processed"], stats["total_available"])
+
+            next_offset = params["offset"] + ORDERS_PAGE_LIMIT
+            if next_offset >= min(total, ORDERS_SEARCH_MAX_RESULTS):
+                break
+            params["offset"] = next_offset
+            data = await self._search_orders_page(client, headers, semaphore, params)
+
+    async def _save_orders_page(
+        self,
+        db: Session,
+        client: httpx.AsyncClient,
+        headers: dict,
+        company_id: int,
+        orders: List[dict],
+        stats: dict
+    ) -> None:
+        """Grava os pedidos novos ou alterados de uma página em um único upsert (sem commit)."""
+        page_order_ids = [str(order_data.get("id")) for order_data in orders]
+        existing_versions = await run_in_session(
+            db, self.get_existing_order_versions, db, company_id, page_order_ids
+        )
+
+        changed_orders = []
+        for order_data in orders:
+            order_id = str(order_data.get("id"))
+            if order_id in existing_versions and self.is_unchanged(existing_versions[order_id], order_data):
+                stats["unchanged"] += 1
+                continue
+            changed_orders.append(order_data)
+        details = await self.resolve_order_details(client, headers, changed_orders)
+
+        rows = []
+        for order_detail in details:
+            order_id = str(order_detail.get("id"))
+            try:
+                rows.append(self.build_order_data(company_id, order_detail))
+            except Exception as e:
+                logger.error(f"Erro ao processar pedido {order_id}: {e}")
+                continue
+
+            stats["sync_results"].append({
+                "order_id": order_id,
+                "action": "updated" if order_id in existing_versions else "created",
+                "status": order_detail.get("status", ""),
+                "total_amount": float(order_detail.get("total_amount", 0))
+            })
+
+        if rows:
+            inserted, updated = await run_in_session(db, self.save_orders, db, rows)
+            stats["created"] += inserted
+            stats["updated"] += updated
+
+    async def sync_orders(
+        self,
+        db: Session,
+        client: httpx.AsyncClient,
+        access_token: str,
+        company_id: int,
+        seller_id: str,
+        days_back: Optional[int] = None,
+        full: bool = False,
+        progress: Optional[Callable[[int, Optional[int]], None]] = None,
+        resume: bool = True
+    ) -> Dict[str, Any]:
+        """Sincroniza os pedidos do vendedor em janelas de datas.
+
+        Na primeira execução (ou com ``full``) busca por ``order.date_created``
+        nos últimos ``days_back`` dias; depois disso busca apenas os pedidos com
+        ``order.date_last_updated`` a partir da marca d'água (high-water mark)
+        da última sincronização concluída.
+
+        O período é dividido em janelas de ORDERS_WINDOW_DAYS, processadas em
+        paralelo; janelas com mais pedidos do que o limite de offset da busca
+        são subdivididas. Pedidos já gravados com o mesmo date_last_updated
+        são ignorados; os novos e alterados de cada página são gravados em um
+        único upsert. Cada janela concluída entra no checkpoint; com ``resume`` uma execução que
+        falhou ou foi interrompida refaz apenas as janelas pendentes. A marca
+        d'água só avança quando todas as janelas foram obtidas por completo.
+        """
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json"
+        }
+
+        # O acesso ao banco roda no threadpool (run_in_session) para não bloquear o
+        # event loop; a sessão é compartilhada pelas janelas, uma chamada por vez
+        checkpoint = await run_in_session(db, sync_checkpoint_service.start, db, company_id, "orders", resume=resume)
+        checkpoint_id = checkpoint.id
+        previous_high_water_mark = checkpoint.high_water_mark
+        resumed = sync_checkpoint_service.is_resuming(checkpoint) and "date_field" in checkpoint.cursor
+
+        if resumed:
+            cursor = dict(checkpoint.cursor)
+        else:
+            started_at = datetime.utcnow()
+            if previous_high_water_mark and not full:
+                date_field = "order.date_last_updated"
+                range_from = previous_high_water_mark - ORDERS_HWM_OVERLAP
+            else:
+                date_field = "order.date_created"
+                range_from = started_at - timedelta(days=days_back or ORDERS_HISTORY_DAYS)
+            cursor = {
+                "date_field": date_field,
+                "from": range_from.isoformat(),
+                "to": started_at.isoformat(),
+                "started_at": started_at.isoformat(),
+                "completed_windows": [],
+                "truncated": 0
+            }
+
+        date_field = cursor["date_field"]
+        range_from = datetime.fromisoformat(cursor["from"])
+        range_to = datetime.fromisoformat(cursor["to"])
+        completed_windows = set(cursor["completed_windows"])
+
+        windows = []
+        window_from = range_from
+        while window_from < range_to:
+            window_to = min(window_from + timedelta(days=ORDERS_WINDOW_DAYS), range_to)
+            if window_from.isoformat() not in completed_windows:
+                windows.append((window_from, window_to))
+            window_from = window_to
+
+        logger.info(
+            f"Sincronizando pedidos da empresa {company_id} por {date_field} de {range_from} a {range_to} "
+            f"({len(windows)} janelas{', retomando' if resumed else ''})"
+        )
+
+        semaphore = asyncio.Semaphore(ORDERS_WINDOW_CONCURRENCY)
+        stats = {
+            "created": 0, "updated": 0, "unchanged": 0, "processed": 0, "total_available": 0,
+            # Pedidos perdidos em janelas concluídas por execuções anteriores também contam
+            "truncated": cursor.get("truncated", 0), "sync_results": []
+        }
+
+        async def sync_base_window(window_from: datetime, window_to: datetime) -> None:
+            await self._sync_window(
+                db, client, headers, semaphore, company_id, seller_id, date_field,
+                window_from, window_to, stats, progress
+            )
+            completed_windows.add(window_from.isoformat())
+            window_cursor = {**cursor, "completed_windows": sorted(completed_windows), "truncated": stats["truncated"]}
+
+            def save_checkpoint() -> None:
+                sync_checkpoint_service.advance(checkpoint, window_cursor, last_processed_id=window_to.isoformat())
+                db.commit()
+
+            await run_in_session(db, save_checkpoint)
+
+        tasks = [asyncio.create_task(sync_base_window(*window)) for window in windows]
+        error_message = None
+        try:
+            await asyncio.gather(*tasks)
+            # A marca d'água só avança quando nenhum pedido do período ficou de fora;
+            # caso contrário a próxima execução parte da marca anterior
+            high_water_mark = None
+            if stats["truncated"]:
+                logger.warning(
+                    f"{stats['truncated']} pedidos da empresa {company_id} não puderam ser obtidos; "
+                    f"marca d'água mantida em {previous_high_water_mark}"
+                )
+            else:
+                high_water_mark = datetime.fromisoformat(cursor["started_at"])
+            await run_in_session(db, sync_checkpoint_service.complete, db, checkpoint, high_water_mark=high_water_mark)
+        except OrderSyncError as e:
+            # Janelas concluídas ficam no checkpoint; as demais são refeitas na próxima execução
+            error_message = str(e)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await run_in_session(db, sync_checkpoint_service.fail, db, checkpoint_id, error_message)
+        except BaseException as e:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await run_in_session(db, sync_checkpoint_service.fail, db, checkpoint_id, str(e) or e.__class__.__name__)
+            raise
+
+        total_processed = stats["created"] + stats["updated"]
+        logger.info(f"Sincronização concluída: {total_processed} pedidos processados")
+
+        return {
+            "success": error_message is None,
+            "message": error_message or f"Sincronização concluída com sucesso",
+            "total_processed": total_processed,
+            "total_available": stats["total_available"],
+            "created": stats["created"],
+            "updated": stats["updated"],
+            "unchanged": stats["unchanged"],
+            "truncated": stats["truncated"],
+            "date_field": date_field,
+            "date_from": range_from.isoformat(),
+            "date_to": range_to.isoformat(),
+            "windows": len(windows),
+            "resumed": resumed,
+            "sync_results": stats["sync_results"],
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+
+# Instância global do serviço
+order_sync_service = OrderSyncService()
@@ -0,0 +1,138 @@
+import base64
+import json
+import operator
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Hashable, List, Optional, Sequence, Tuple
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import defer
+
+# Totais das listagens (COUNT exato) reaproveitados por alguns segundos
+COUNT_CACHE_TTL_SECONDS = int(os.getenv("PAGINATION_COUNT_CACHE_TTL_SECONDS", "60"))
+COUNT_CACHE_MAX_SIZE = 1000
+
+
+class InvalidCursorError(ValueError):
+    """Cursor de paginação malformado ou de outra listagem."""
+
+
+class InvalidIncludeError(ValueError):
+    """Campo pedido em ``include`` que a listagem não oferece."""
+
+
+def parse_include(include: Optional[str], allowed: Sequence[str]) -> List[str]:
+    """Lê o parâmetro ``include`` (campos separados por vírgula) das listagens."""
+    fields = list(dict.fromkeys(field.strip() for field in (include or "").split(",") if field.strip()))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise InvalidIncludeError(
+            f"Campos inválidos em include: {', '.join(unknown)}. Disponíveis: {', '.join(allowed)}"
+        )
+    return fields
+
+
+def defer_columns(model, heavy_fields: Sequence[str], included: Sequence[str]) -> list:
+    """Opções que deixam de fora do SELECT as colunas pesadas não pedidas.
+
+    ``raiseload`` faz o acesso acidental a uma coluna adiada falhar em vez de
+    disparar uma consulta por registro.
+    """
+    return [
+        defer(getattr(model, field), raiseload=True)
+        for field in heavy_fields if field not in included
+    ]
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Gera o token opaco com os valores da chave de ordenação do último registro."""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> List[Any]:
+    """Lê um token de ``encode_cursor``, convertendo cada valor para o tipo da coluna."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError("quantidade de valores diferente da chave")
+        return [
+            datetime.fromisoformat(value) if value_type is datetime else value_type(value)
+            for value, value_type in zip(payload, types)
+        ]
+    except Exception as e:
+        raise InvalidCursorError("Cursor de paginação inválido") from e
+
+
+def keyset_condition(columns: Sequence, values: Sequence[Any], descending: bool = False):
+    """Condição "depois do cursor" para uma listagem ordenada por ``columns``.
+
+    Equivale a (c1, c2, ...) > (v1, v2, ...) (ou < quando decrescente). Com
+    chave composta, o limite na primeira coluna é repetido para que o planner
+    possa usá-lo como condição de índice.
+    """
+    after = operator.lt if descending else operator.gt
+    clauses = []
+    for position, column in enumerate(columns):
+        equal = [previous == value for previous, value in zip(columns[:position], values[:position])]
+        clauses.append(and_(*equal, after(column, values[position])))
+    condition = or_(*clauses)
+    if len(columns) > 1:
+        bound = operator.le if descending else operator.ge
+        condition = and_(bound(columns[0], values[0]), condition)
+    return condition
+
+
+def page_rows(rows: Sequence, limit: int, cursor_values) -> Tuple[List, Optional[str]]:
+    """Recorta a página de uma consulta feita com ``limit + 1`` e gera o próximo cursor.
+
+    ``cursor_values`` recebe o último registro da página e devolve os valores da chave.
+    """
+    rows = list(rows)
+    if len(rows) <= limit or limit == 0:
+        return rows[:limit], None
+    rows = rows[:limit]
+    return rows, encode_cursor(cursor_values(rows[-1]))
+
+
+class CountCache:
+    """Cache em memória dos totais das listagens, por empresa e filtros.
+
+    O total deixa de ser recalculado a cada página; pode ficar até
+    COUNT_CACHE_TTL_SECONDS desatualizado.
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[Hashable, Tuple[int, float]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[int]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        total, stored_at = entry
+        if time.monotonic() - stored_at >= COUNT_CACHE_TTL_SECONDS:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return total
+
+    def set(self, key: Hashable, total: int) -> None:
+        self._entries[key] = (total, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > COUNT_CACHE_MAX_SIZE:
+            self._entries.popitem(last=False)
+
+    async def count(self, db, key: Hashable, query) -> int:
+        """Total de ``query`` (sem ordenação/paginação), usando o cache quando possível."""
+        total = self.get(key)
+        if total is None:
+            total = await db.scalar(select(func.count()).select_from(query.subquery()))
+            self.set(key, total)
+        return total
+
+
+# Instância global do cache de totais
+count_cache = CountCache()
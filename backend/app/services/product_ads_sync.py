@@ -0,0 +1,648 @@
+import asyncio
+import os
+import time
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import httpx
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from app.database import run_in_session
+from app.models import ProductAdsData, ProductAdsDailyMetric
+from app.services.bulk_upsert import bulk_upsert
+
+logger = logging.getLogger(__name__)
+
+ML_API_URL = "https://api.mercadolibre.com"
+ADS_PERIODS = [7, 15, 30, 60, 90]  # Todos os períodos para sincronizar
+ADS_SEARCH_PAGE_LIMIT = 100  # Anúncios por página na busca do anunciante
+
+# Tempo de cache do anunciante de cada empresa (segundos)
+ADS_ADVERTISER_CACHE_TTL = int(os.getenv("ML_ADS_ADVERTISER_CACHE_TTL", "3600"))
+
+# Métricas diárias: histórico inicial e dias rebuscados a cada sincronização
+# (o ML ainda ajusta as métricas dos últimos dias)
+ADS_DAILY_HISTORY_DAYS = max(ADS_PERIODS)
+ADS_DAILY_REFRESH_DAYS = int(os.getenv("ML_ADS_DAILY_REFRESH_DAYS", "3"))
+
+# Anúncios com métricas diárias buscadas em paralelo na sincronização da empresa
+ADS_DAILY_FETCH_CONCURRENCY = int(os.getenv("ML_ADS_DAILY_FETCH_CONCURRENCY", "8"))
+
+# Colunas somáveis de ProductAdsDailyMetric
+DAILY_METRIC_COLUMNS = [
+    "clicks", "prints", "cost",
+    "direct_items_quantity", "indirect_items_quantity", "advertising_items_quantity",
+    "direct_units_quantity", "indirect_units_quantity", "units_quantity",
+    "direct_amount", "indirect_amount", "total_amount",
+    "organic_units_quantity", "organic_units_amount", "organic_items_quantity"
+]
+
+ADS_METRICS = (
+    "clicks,prints,ctr,cost,cpc,acos,organic_units_quantity,organic_units_amount,organic_items_quantity,"
+    "direct_items_quantity,indirect_items_quantity,advertising_items_quantity,cvr,roas,sov,"
+    "direct_units_quantity,indirect_units_quantity,units_quantity,direct_amount,indirect_amount,total_amount"
+)
+
+
+def period_range(period_days: int) -> Tuple[datetime, datetime]:
+    """Retorna (date_from, date_to) do período, em dias inteiros até hoje."""
+    date_to = datetime.strptime(datetime.utcnow().strftime("%Y-%m-%d"), "%Y-%m-%d")
+    return date_to - timedelta(days=period_days), date_to
+
+
+def period_ranges() -> Dict[int, Tuple[date, date]]:
+    """Intervalos de ADS_PERIODS em datas (ambos inclusivos), para as somas diárias."""
+    return {
+        period_days: tuple(value.date() for value in period_range(period_days))
+        for period_days in ADS_PERIODS
+    }
+
+
+def compute_rates(totals: dict) -> dict:
+    """Calcula CTR, CPC, ACOS, ROAS, CVR e TACOS a partir das métricas somadas."""
+    clicks = totals.get("clicks") or 0
+    prints = totals.get("prints") or 0
+    cost = totals.get("cost") or 0
+    total_amount = totals.get("total_amount") or 0
+    conversions = (totals.get("direct_items_quantity") or 0) + (totals.get("indirect_items_quantity") or 0)
+    total_revenue = total_amount + (totals.get("organic_units_amount") or 0)
+    return {
+        **totals,
+        "ctr": clicks / prints * 100 if prints else None,
+        "cpc": cost / clicks if clicks else None,
+        "acos": cost / total_amount * 100 if total_amount else None,
+        "roas": total_amount / cost if cost else None,
+        "cvr": conversions / clicks * 100 if clicks else None,
+        "tacos": cost / total_revenue * 100 if total_revenue else None
+    }
+
+
+def extract_metrics(metrics_data: Any) -> Optional[dict]:
+    """Localiza as métricas na resposta do Product Ads (o formato varia por versão)."""
+    if not metrics_data:
+        return None
+    if "metrics_summary" in metrics_data:
+        return metrics_data["metrics_summary"]
+    if "metrics" in metrics_data:
+        return metrics_data["metrics"]
+    if isinstance(metrics_data, dict) and any(key in metrics_data for key in ["clicks", "prints", "cost"]):
+        return metrics_data
+    return None
+
+
+class ProductAdsSyncError(Exception):
+    """Erro de negócio na sincronização do Product Ads (anunciante ou anúncio inexistente)."""
+
+
+class ProductAdsSyncService:
+    """Persistência dos dados de Product Ads por anúncio e período."""
+
+    def __init__(self):
+        # Anunciante por empresa: (advertiser_id, site_id, expira_em)
+        self._advertisers: Dict[int, Tuple[Any, str, float]] = {}
+        self._advertiser_locks: Dict[int, asyncio.Lock] = {}
+
+    def build_ads_data(
+        self,
+        company_id: int,
+        item_id: str,
+        advertiser_id: Optional[int],
+        ads_data: dict,
+        metrics_data: dict,
+        period_days: int,
+        date_from: datetime,
+        date_to: datetime
+    ) -> dict:
+        """Converte o anúncio e as métricas de um período para as colunas de ProductAdsData."""
+        row = {
+            "company_id": company_id,
+            "item_id": item_id,
+            "campaign_id": ads_data.get("campaign_id"),
+            "advertiser_id": advertiser_id,
+            "title": ads_data.get("title", ""),
+            "price": ads_data.get("price", 0),
+            "status": ads_data.get("status", ""),
+            "period_days": period_days,
+            "data_period_start": date_from,
+            "data_period_end": date_to,
+            "full_data": ads_data,
+            "metrics_data": metrics_data,
+            "ml_date_created": datetime.utcnow(),
+            "ml_last_updated": datetime.utcnow()
+        }
+
+        metrics = extract_metrics(metrics_data)
+        if metrics:
+            row.update({
+                "clicks": metrics.get("clicks", 0),
+                "prints": metrics.get("prints", 0),
+                "ctr": metrics.get("ctr"),
+                "cost": metrics.get("cost", 0),
+                "cpc": metrics.get("cpc"),
+                "acos": metrics.get("acos"),
+                "tacos": metrics.get("tacos"),
+                "organic_units_quantity": metrics.get("organic_units_quantity", 0),
+                "organic_units_amount": metrics.get("organic_units_amount", 0),
+                "organic_items_quantity": metrics.get("organic_items_quantity", 0),
+                "direct_items_quantity": metrics.get("direct_items_quantity", 0),
+                "direct_units_quantity": metrics.get("direct_units_quantity", 0),
+                "direct_amount": metrics.get("direct_amount", 0),
+                "indirect_items_quantity": metrics.get("indirect_items_quantity", 0),
+                "indirect_units_quantity": metrics.get("indirect_units_quantity", 0),
+                "indirect_amount": metrics.get("indirect_amount", 0),
+                "advertising_items_quantity": metrics.get("advertising_items_quantity", 0),
+                "units_quantity": metrics.get("units_quantity", 0),
+                "total_amount": metrics.get("total_amount", 0),
+                "cvr": metrics.get("cvr"),
+                "roas": metrics.get("roas"),
+                "sov": metrics.get("sov")
+            })
+
+            # Calcular TACOS se não estiver disponível
+            if row["tacos"] is None and row["cost"] and row["total_amount"]:
+                total_revenue = float(row["total_amount"]) + float(row["organic_units_amount"] or 0)
+                if total_revenue > 0:
+                    row["tacos"] = (float(row["cost"]) / total_revenue) * 100
+
+        return row
+
+    def build_daily_rows(self, company_id: int, item_id: str, daily_data: Any) -> List[dict]:
+        """Converte a resposta com aggregation_type=DAILY para linhas de ProductAdsDailyMetric."""
+        entries = daily_data.get("results", []) if isinstance(daily_data, dict) else (daily_data or [])
+        rows = []
+        for entry in entries:
+            day = entry.get("date")
+            if not day:
+                continue
+            metrics = entry.get("metrics") or entry
+            row = {
+                "company_id": company_id,
+                "item_id": item_id,
+                "date": datetime.strptime(day[:10], "%Y-%m-%d").date()
+            }
+            for column in DAILY_METRIC_COLUMNS:
+                row[column] = metrics.get(column) or 0
+            rows.append(row)
+        return rows
+
+    def save_daily_metrics(self, db: Session, rows: List[dict]) -> Tuple[int, int]:
+        """Grava as métricas diárias em um único upsert. Retorna (inseridos, atualizados)."""
+        return bulk_upsert(
+            db,
+            ProductAdsDailyMetric,
+            rows,
+            conflict_columns=["company_id", "item_id", "date"]
+        )
+
+    def get_daily_sync_starts(
+        self,
+        db: Session,
+        company_id: int,
+        item_ids: List[str],
+        today: date
+    ) -> Dict[str, date]:
+        """Primeiro dia a buscar por anúncio, em uma única consulta.
+
+        Últimos dias ainda abertos, ou todo o histórico na primeira vez.
+        """
+        last_days = dict(
+            db.query(ProductAdsDailyMetric.item_id, func.max(ProductAdsDailyMetric.date)).filter(
+                ProductAdsDailyMetric.company_id == company_id,
+                ProductAdsDailyMetric.item_id.in_(item_ids)
+            ).group_by(ProductAdsDailyMetric.item_id).all()
+        ) if item_ids else {}
+        history_start = today - timedelta(days=ADS_DAILY_HISTORY_DAYS)
+        return {
+            item_id: history_start if last_days.get(item_id) is None
+            else max(history_start, last_days[item_id] - timedelta(days=ADS_DAILY_REFRESH_DAYS))
+            for item_id in item_ids
+        }
+
+    def get_daily_sync_start(self, db: Session, company_id: int, item_id: str, today: date) -> date:
+        """Primeiro dia a buscar: últimos dias ainda abertos ou todo o histórico na primeira vez."""
+        return self.get_daily_sync_starts(db, company_id, [item_id], today)[item_id]
+
+    def rollup_items_daily_metrics(
+        self,
+        db: Session,
+        company_id: int,
+        item_ids: List[str],
+        ranges: Dict[Any, Tuple[date, date]]
+    ) -> Dict[str, Dict[Any, Optional[dict]]]:
+        """Soma as métricas diárias de vários anúncios e intervalos em uma única consulta.
+
+        ``ranges`` mapeia uma chave (ex.: período em dias) para (início, fim),
+        ambos inclusivos. Retorna, por anúncio, as métricas com as taxas
+        calculadas por chave, ou None para intervalos sem nenhum dia gravado.
+        """
+        table = ProductAdsDailyMetric
+        columns = [table.item_id]
+        for key_index, (date_from, date_to) in enumerate(ranges.values()):
+            in_range = table.date.between(date_from, date_to)
+            columns.append(func.count(case((in_range, table.id))).label(f"r{key_index}_days"))
+            for column in DAILY_METRIC_COLUMNS:
+                columns.append(
+                    func.coalesce(func.sum(case((in_range, getattr(table, column)))), 0).label(f"r{key_index}_{column}")
+                )
+
+        rows = db.query(*columns).filter(
+            table.company_id == company_id,
+            table.item_id.in_(item_ids),
+            table.date.between(min(r[0] for r in ranges.values()), max(r[1] for r in ranges.values()))
+        ).group_by(table.item_id).all() if item_ids else []
+        rows_by_item = {row.item_id: row._mapping for row in rows}
+
+        rollups = {}
+        for item_id in item_ids:
+            row = rows_by_item.get(item_id)
+            rollups[item_id] = {}
+            for key_index, (key, (date_from, date_to)) in enumerate(ranges.items()):
+                days = row[f"r{key_index}_days"] if row is not None else 0
+                if not days:
+                    rollups[item_id][key] = None
+                    continue
+                totals = {column: float(row[f"r{key_index}_{column}"]) for column in DAILY_METRIC_COLUMNS}
+                for column in DAILY_METRIC_COLUMNS:
+                    if not column.endswith(("cost", "amount")):
+                        totals[column] = int(totals[column])
+                rollups[item_id][key] = {
+                    **compute_rates(totals),
+                    "days_with_data": days,
+                    "date_from": date_from.isoformat(),
+                    "date_to": date_to.isoformat()
+                }
+        return rollups
+
+    def rollup_daily_metrics(
+        self,
+        db: Session,
+        company_id: int,
+        item_id: str,
+        ranges: Dict[Any, Tuple[date, date]]
+    ) -> Dict[Any, Optional[dict]]:
+        """Soma as métricas diárias de um anúncio em vários intervalos (ver rollup_items_daily_metrics)."""
+        return self.rollup_items_daily_metrics(db, company_id, [item_id], ranges)[item_id]
+
+    def store_daily_metrics(
+        self,
+        db: Session,
+        company_id: int,
+        item_ids: List[str],
+        daily_rows: List[dict]
+    ) -> Dict[str, Dict[int, Optional[dict]]]:
+        """Grava as métricas diárias e devolve as somas de ADS_PERIODS por anúncio.
+
+        Bloqueante: chamado via run_in_session.
+        """
+        if daily_rows:
+            self.save_daily_metrics(db, daily_rows)
+        return self.rollup_items_daily_metrics(db, company_id, item_ids, period_ranges())
+
+    def commit_ads(self, db: Session, rows: List[dict]) -> None:
+        """Grava os períodos e confirma a transação. Bloqueante: chamado via run_in_session."""
+        if rows:
+            self.save_ads(db, rows)
+        db.commit()
+
+    def build_rollup_rows(
+        self,
+        company_id: int,
+        item_id: str,
+        advertiser_id: Any,
+        ads_data: dict,
+        rollups: Dict[int, Optional[dict]]
+    ) -> List[dict]:
+        """Linhas de ProductAdsData de cada período a partir das somas diárias."""
+        return [
+            self.build_ads_data(
+                company_id, item_id, advertiser_id, ads_data,
+                {"metrics": rollups[period_days] or {}},
+                period_days, *period_range(period_days)
+            )
+            for period_days in ADS_PERIODS
+        ]
+
+    async def fetch_daily_metrics(
+        self,
+        client: httpx.AsyncClient,
+        headers: dict,
+        site_id: str,
+        item_id: str,
+        date_from: date,
+        date_to: date
+    ) -> Optional[Any]:
+        """Busca as métricas do anúncio dia a dia (aggregation_type=DAILY)."""
+        response = await client.get(
+            f"{ML_API_URL}/marketplace/advertising/{site_id}/product_ads/ads/{item_id}",
+            params={
+                "date_from": date_from.isoformat(),
+                "date_to": date_to.isoformat(),
+                "metrics": ADS_METRICS,
+                "aggregation_type": "DAILY"
+            },
+            headers=headers
+        )
+        if response.status_code != 200:
+            logger.warning(f"Erro ao obter métricas diárias do item {item_id}: {response.status_code} - {response.text}")
+            return None
+        return response.json()
+
+    def save_ads(self, db: Session, rows: List[dict]) -> Tuple[int, int]:
+        """Grava os períodos em um único upsert. Retorna (inseridos, atualizados)."""
+        # ml_date_created registra a primeira sincronização e não é sobrescrito
+        update_columns = [
+            column.name for column in ProductAdsData.__table__.c
+            if column.name != "ml_date_created"
+        ]
+        return bulk_upsert(
+            db,
+            ProductAdsData,
+            rows,
+            conflict_columns=["company_id", "item_id", "period_days"],
+            update_columns=update_columns
+        )
+
+    async def get_advertiser(
+        self,
+        client: httpx.AsyncClient,
+        access_token: str,
+        company_id: int,
+        ml_user_id: str
+    ) -> Tuple[Any, str]:
+        """Obtém (advertiser_id, site_id) da empresa, com cache em memória.
+
+        Levanta ProductAdsSyncError quando não há anunciante.
+        """
+        cached = self._advertisers.get(company_id)
+        if cached and cached[2] > time.monotonic():
+            return cached[0], cached[1]
+
+        lock = self._advertiser_locks.setdefault(company_id, asyncio.Lock())
+        async with lock:
+            # Outra sincronização pode ter buscado enquanto aguardávamos
+            cached = self._advertisers.get(company_id)
+            if cached and cached[2] > time.monotonic():
+                return cached[0], cached[1]
+
+            advertisers_response = await client.get(
+                f"{ML_API_URL}/advertising/advertisers",
+                params={"product_id": "PADS", "user_id": ml_user_id},
+                headers={
+                    "Authorization": f"Bearer {access_token}",
+                    "Content-Type": "application/json",
+                    "Api-Version": "1"
+                }
+            )
+
+            if advertisers_response.status_code != 200:
+                logger.error(f"Erro ao buscar anunciantes: {advertisers_response.status_code} - {advertisers_response.text}")
+                raise ProductAdsSyncError("Não foi possível obter informações do anunciante")
+
+            advertisers = advertisers_response.json().get("advertisers", [])
+            if not advertisers:
+                logger.error("Nenhum anunciante encontrado na resposta")
+                raise ProductAdsSyncError("Nenhum anunciante encontrado")
+
+            advertiser = advertisers[0]
+            advertiser_id = advertiser.get("advertiser_id")
+            site_id = advertiser.get("site_id", "MLB")
+            self._advertisers[company_id] = (advertiser_id, site_id, time.monotonic() + ADS_ADVERTISER_CACHE_TTL)
+            return advertiser_id, site_id
+
+    def invalidate_advertiser(self, company_id: int) -> None:
+        """Remove o anunciante da empresa do cache (ex.: nova integração)."""
+        self._advertisers.pop(company_id, None)
+
+    async def fetch_period_rows(
+        self,
+        client: httpx.AsyncClient,
+        headers: dict,
+        site_id: str,
+        company_id: int,
+        item_id: str,
+        advertiser_id: Any,
+        ads_data: dict
+    ) -> List[dict]:
+        """Busca as métricas agregadas de cada período diretamente no ML, em paralelo."""
+
+        async def fetch_period(period_days: int) -> Optional[dict]:
+            date_from, date_to = period_range(period_days)
+            logger.info(f"Buscando métricas do período: {date_from:%Y-%m-%d} até {date_to:%Y-%m-%d} ({period_days} dias)")
+
+            metrics_response = await client.get(
+                f"{ML_API_URL}/marketplace/advertising/{site_id}/product_ads/ads/{item_id}",
+                params={
+                    "date_from": f"{date_from:%Y-%m-%d}",
+                    "date_to": f"{date_to:%Y-%m-%d}",
+                    "metrics": ADS_METRICS
+                },
+                headers=headers
+            )
+
+            if metrics_response.status_code != 200:
+                logger.warning(f"Erro ao obter métricas para {period_days} dias: {metrics_response.status_code} - {metrics_response.text}")
+                return None
+
+            return self.build_ads_data(
+                company_id, item_id, advertiser_id, ads_data, metrics_response.json(),
+                period_days, date_from, date_to
+            )
+
+        results = await asyncio.gather(*(fetch_period(period_days) for period_days in ADS_PERIODS))
+        return [row for row in results if row is not None]
+
+    async def sync_item(
+        self,
+        db: Session,
+        client: httpx.AsyncClient,
+        access_token: str,
+        company_id: int,
+        ml_user_id: str,
+        item_id: str,
+        progress: Optional[Callable[[int, Optional[int]], None]] = None
+    ) -> Dict[str, Any]:
+        """Sincroniza os dados de publicidade do anúncio para todos os períodos.
+
+        As métricas são buscadas dia a dia (apenas os dias novos ou ainda em
+        aberto) e os períodos de ADS_PERIODS são calculados no banco a partir
+        delas. Se a busca diária falhar, os períodos são buscados diretamente
+        no ML, em paralelo. Levanta ProductAdsSyncError quando o anunciante ou
+        o anúncio não existem.
+        """
+        advertiser_id, site_id = await self.get_advertiser(client, access_token, company_id, ml_user_id)
+        ads_headers = {
+            "Authorization": f"Bearer {access_token}",
+            "api-version": "2"
+        }
+        if progress:
+            progress(0, 2)
+
+        ads_response = await client.get(
+            f"{ML_API_URL}/marketplace/advertising/{site_id}/product_ads/ads/{item_id}",
+            headers=ads_headers
+        )
+
+        if ads_response.status_code != 200:
+            if ads_response.status_code == 404:
+                logger.error(f"Anúncio não encontrado: {item_id}")
+                raise ProductAdsSyncError("Anúncio não encontrado no Product Ads")
+            logger.error(f"Erro ao buscar anúncio: {ads_response.status_code} - {ads_response.text}")
+            raise ProductAdsSyncError(f"Erro ao buscar anúncio no Product Ads: {ads_response.text}")
+
+        ads_data = ads_response.json()
+        if progress:
+            progress(1)
+
+        today = datetime.utcnow().date()
+        # O acesso ao banco roda no threadpool (run_in_session) para não bloquear o event loop
+        daily_from = await run_in_session(db, self.get_daily_sync_start, db, company_id, item_id, today)
+        daily_data = await self.fetch_daily_metrics(client, ads_headers, site_id, item_id, daily_from, today)
+
+        daily_rows = []
+        if daily_data is not None:
+            daily_rows = self.build_daily_rows(company_id, item_id, daily_data)
+
+            # Períodos calculados a partir das métricas diárias, em uma única consulta
+            rollups = await run_in_session(db, self.store_daily_metrics, db, company_id, [item_id], daily_rows)
+            ads_rows = self.build_rollup_rows(company_id, item_id, advertiser_id, ads_data, rollups[item_id])
+        else:
+            ads_rows = await self.fetch_period_rows(
+                client, ads_headers, site_id, company_id, item_id, advertiser_id, ads_data
+            )
+        if progress:
+            progress(2)
+
+        # Gravar todos os períodos em um único upsert
+        sync_results = [{"period_days": row["period_days"], "success": True} for row in ads_rows]
+        await run_in_session(db, self.commit_ads, db, ads_rows)
+
+        return {
+            "success": True,
+            "message": f"Dados de publicidade sincronizados com sucesso para {len(sync_results)} períodos",
+            "item_id": item_id,
+            "advertiser_id": advertiser_id,
+            "site_id": site_id,
+            "ads_data": ads_data,
+            "daily_days_synced": len(daily_rows),
+            "sync_results": sync_results,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    async def sync_company(
+        self,
+        db: Session,
+        client: httpx.AsyncClient,
+        access_token: str,
+        company_id: int,
+        ml_user_id: str,
+        progress: Optional[Callable[[int, Optional[int]], None]] = None
+    ) -> Dict[str, Any]:
+        """Sincroniza todos os anúncios com publicidade da empresa.
+
+        A busca do anunciante (product_ads/ads/search) lista os anúncios em
+        páginas. As métricas de cada anúncio são buscadas dia a dia uma única
+        vez (apenas os dias novos ou em aberto, ou o período mais longo na
+        primeira sincronização) e gravadas em ProductAdsDailyMetric; os
+        períodos de ADS_PERIODS são calculados no banco em uma consulta por
+        página, como em sync_item. Cada página é confirmada (commit) ao final.
+        """
+        advertiser_id, site_id = await self.get_advertiser(client, access_token, company_id, ml_user_id)
+        ads_headers = {
+            "Authorization": f"Bearer {access_token}",
+            "api-version": "2"
+        }
+        search_url = f"{ML_API_URL}/marketplace/advertising/{site_id}/advertisers/{advertiser_id}/product_ads/ads/search"
+        semaphore = asyncio.Semaphore(ADS_DAILY_FETCH_CONCURRENCY)
+        today = datetime.utcnow().date()
+
+        stats = {"items": 0, "daily_days": 0, "fallback_items": 0, "saved": 0}
+
+        async def fetch_page(offset: int) -> dict:
+            response = await client.get(
+                search_url,
+                params={"limit": ADS_SEARCH_PAGE_LIMIT, "offset": offset},
+                headers=ads_headers
+            )
+            if response.status_code != 200:
+                logger.error(f"Erro ao buscar anúncios do anunciante {advertiser_id}: {response.status_code} - {response.text}")
+                raise ProductAdsSyncError(f"Erro ao buscar anúncios no Product Ads: {response.status_code}")
+            return response.json()
+
+        async def fetch_daily(item_id: str, date_from: date) -> Optional[Any]:
+            async with semaphore:
+                return await self.fetch_daily_metrics(client, ads_headers, site_id, item_id, date_from, today)
+
+        async def fetch_periods(item_id: str, ads_data: dict) -> List[dict]:
+            async with semaphore:
+                return await self.fetch_period_rows(
+                    client, ads_headers, site_id, company_id, item_id, advertiser_id, ads_data
+                )
+
+        async def save_page(results: List[dict]) -> None:
+            ads_by_item = {
+                result["item_id"]: {key: value for key, value in result.items() if key != "metrics"}
+                for result in results if result.get("item_id")
+            }
+            item_ids = list(ads_by_item)
+            starts = await run_in_session(db, self.get_daily_sync_starts, db, company_id, item_ids, today)
+            daily_results = await asyncio.gather(
+                *(fetch_daily(item_id, starts[item_id]) for item_id in item_ids)
+            )
+
+            daily_rows = []
+            rolled_up_ids = []
+            fallback_ids = []
+            for item_id, daily_data in zip(item_ids, daily_results):
+                if daily_data is None:
+                    fallback_ids.append(item_id)
+                    continue
+                daily_rows.extend(self.build_daily_rows(company_id, item_id, daily_data))
+                rolled_up_ids.append(item_id)
+
+            # Períodos de todos os anúncios da página em uma única consulta
+            rollups = await run_in_session(db, self.store_daily_metrics, db, company_id, rolled_up_ids, daily_rows)
+            rows = []
+            for item_id in rolled_up_ids:
+                rows.extend(self.build_rollup_rows(company_id, item_id, advertiser_id, ads_by_item[item_id], rollups[item_id]))
+
+            # Sem métricas diárias, os períodos são buscados diretamente no ML
+            for period_rows in await asyncio.gather(
+                *(fetch_periods(item_id, ads_by_item[item_id]) for item_id in fallback_ids)
+            ):
+                rows.extend(period_rows)
+
+            await run_in_session(db, self.commit_ads, db, rows)
+            stats["items"] += len(item_ids)
+            stats["daily_days"] += len(daily_rows)
+            stats["fallback_items"] += len(fallback_ids)
+            stats["saved"] += len(rows)
+
+        first_page = await fetch_page(0)
+        total = first_page.get("paging", {}).get("total", 0)
+        total_pages = max(1, -(-total // ADS_SEARCH_PAGE_LIMIT))
+        await save_page(first_page.get("results", []))
+        if progress:
+            progress(1, total_pages)
+
+        for page_index, offset in enumerate(range(ADS_SEARCH_PAGE_LIMIT, total, ADS_SEARCH_PAGE_LIMIT), start=2):
+            page = await fetch_page(offset)
+            await save_page(page.get("results", []))
+            if progress:
+                progress(page_index, total_pages)
+
+        return {
+            "success": True,
+            "message": f"Dados de publicidade sincronizados para {stats['items']} anúncios",
+            "advertiser_id": advertiser_id,
+            "site_id": site_id,
+            "items": stats["items"],
+            "periods": ADS_PERIODS,
+            "daily_days_synced": stats["daily_days"],
+            "fallback_items": stats["fallback_items"],
+            "rows_saved": stats["saved"],
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+
+# Instância global do serviço
+product_ads_sync_service = ProductAdsSyncService()
@@ -0,0 +1,223 @@
+import asyncio
+import os
+import random
+import time
+import logging
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Optional, Dict, Tuple
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Limites por aplicação e por vendedor (requisições por segundo e rajada)
+ML_RATE_LIMIT_APP_PER_SECOND = float(os.getenv("ML_RATE_LIMIT_APP_PER_SECOND", "25"))
+ML_RATE_LIMIT_APP_BURST = int(os.getenv("ML_RATE_LIMIT_APP_BURST", "50"))
+ML_RATE_LIMIT_SELLER_PER_SECOND = float(os.getenv("ML_RATE_LIMIT_SELLER_PER_SECOND", "10"))
+ML_RATE_LIMIT_SELLER_BURST = int(os.getenv("ML_RATE_LIMIT_SELLER_BURST", "20"))
+
+# Novas tentativas com backoff exponencial (com jitter)
+ML_HTTP_MAX_RETRIES = int(os.getenv("ML_HTTP_MAX_RETRIES", "3"))
+ML_HTTP_BACKOFF_BASE = float(os.getenv("ML_HTTP_BACKOFF_BASE", "0.5"))
+ML_HTTP_BACKOFF_MAX = float(os.getenv("ML_HTTP_BACKOFF_MAX", "30"))
+
+RETRYABLE_STATUS_CODES = {500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class TokenBucket:
+    """Token bucket assíncrono com taxa adaptativa.
+
+    Ao receber 429 a taxa cai pela metade (até 10% da configurada) e volta a
+    subir gradualmente a cada resposta bem-sucedida.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self) -> float:
+        """Aguarda um token disponível. Retorna o tempo total de espera."""
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                else:
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return waited
+                    delay = (1 - self.tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+
+    def penalize(self, retry_after: Optional[float]) -> None:
+        """Reduz a taxa após um 429 e bloqueia pelo Retry-After informado."""
+        self.rate = max(self.max_rate * 0.1, self.rate / 2)
+        self.tokens = 0
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def reward(self) -> None:
+        """Recupera a taxa gradualmente após respostas bem-sucedidas."""
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class RateLimiter:
+    """Limitador por aplicação e por vendedor para a API do Mercado Livre."""
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self.stats = {
+            "requests": 0,
+            "throttled": 0,
+            "throttled_seconds": 0.0,
+            "rate_limited": 0,
+            "retried": 0,
+            "failed": 0,
+        }
+
+    def _bucket(self, scope: str, key: str) -> TokenBucket:
+        bucket = self._buckets.get((scope, key))
+        if bucket is None:
+            if scope == "app":
+                bucket = TokenBucket(ML_RATE_LIMIT_APP_PER_SECOND, ML_RATE_LIMIT_APP_BURST)
+            else:
+                bucket = TokenBucket(ML_RATE_LIMIT_SELLER_PER_SECOND, ML_RATE_LIMIT_SELLER_BURST)
+            self._buckets[(scope, key)] = bucket
+        return bucket
+
+    def buckets_for(self, request: httpx.Request) -> Tuple[TokenBucket, ...]:
+        """Identifica os buckets da requisição a partir do token de acesso.
+
+        Tokens do ML têm o formato APP_USR-<app_id>-<data>-<hash>-<user_id>.
+        """
+        app_id = os.getenv("MERCADO_LIVRE_CLIENT_ID") or "default"
+        seller_id = None
+
+        authorization = request.headers.get("Authorization", "")
+        if authorization.startswith("Bearer "):
+            parts = authorization[len("Bearer "):].split("-")
+            if len(parts) >= 5:
+                if parts[1].isdigit():
+                    app_id = parts[1]
+                if parts[-1].isdigit():
+                    seller_id = parts[-1]
+
+        buckets = (self._bucket("app", app_id),)
+        if seller_id:
+            buckets += (self._bucket("seller", seller_id),)
+        return buckets
+
+    async def acquire(self, request: httpx.Request) -> Tuple[TokenBucket, ...]:
+        buckets = self.buckets_for(request)
+        waited = 0.0
+        for bucket in buckets:
+            waited += await bucket.acquire()
+        self.stats["requests"] += 1
+        if waited > 0:
+            self.stats["throttled"] += 1
+            self.stats["throttled_seconds"] += waited
+        return buckets
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "throttled_seconds": round(self.stats["throttled_seconds"], 3),
+            "buckets": {
+                f"{scope}:{key}": {"rate": round(bucket.rate, 2), "max_rate": bucket.max_rate}
+                for (scope, key), bucket in self._buckets.items()
+            },
+        }
+
+
+def parse_retry_after(response: httpx.Response) -> Optional[float]:
+    """Lê o header Retry-After (segundos ou data HTTP)."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Backoff exponencial com jitter completo, respeitando o Retry-After."""
+    delay = random.uniform(0, min(ML_HTTP_BACKOFF_MAX, ML_HTTP_BACKOFF_BASE * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, ML_HTTP_BACKOFF_MAX))
+    return delay
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """Transport que aplica o rate limit e refaz requisições após 429/5xx."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiter: RateLimiter):
+        self._transport = transport
+        self._limiter = limiter
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        attempt = 0
+        while True:
+            buckets = await self._limiter.acquire(request)
+            try:
+                response = await self._transport.handle_async_request(request)
+            except (httpx.ConnectError, httpx.ReadTimeout, httpx.RemoteProtocolError) as e:
+                if request.method not in IDEMPOTENT_METHODS or attempt >= ML_HTTP_MAX_RETRIES:
+                    self._limiter.stats["failed"] += 1
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning(f"Erro de conexão em {request.url.path} ({e}); nova tentativa em {delay:.2f}s")
+            else:
+                retry_after = None
+                if response.status_code == 429:
+                    self._limiter.stats["rate_limited"] += 1
+                    retry_after = parse_retry_after(response)
+                    for bucket in buckets:
+                        bucket.penalize(retry_after)
+                elif response.status_code in RETRYABLE_STATUS_CODES and request.method in IDEMPOTENT_METHODS:
+                    pass
+                else:
+                    for bucket in buckets:
+                        bucket.reward()
+                    return response
+
+                if attempt >= ML_HTTP_MAX_RETRIES:
+                    self._limiter.stats["failed"] += 1
+                    return response
+
+                await response.aclose()
+                delay = backoff_delay(attempt, retry_after)
+                logger.warning(
+                    f"Mercado Livre retornou {response.status_code} em {request.url.path}; "
+                    f"nova tentativa em {delay:.2f}s"
+                )
+
+            attempt += 1
+            self._limiter.stats["retried"] += 1
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+# Instância global do limitador
+rate_limiter = RateLimiter()
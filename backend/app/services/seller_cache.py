@@ -0,0 +1,179 @@
+import asyncio
+import os
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import httpx
+from starlette.concurrency import run_in_threadpool
+from app.database import SessionLocal
+from app.models import MercadoLivreSeller
+from app.services.bulk_upsert import bulk_upsert
+
+logger = logging.getLogger(__name__)
+
+ML_API_URL = "https://api.mercadolibre.com"
+SELLERS_MULTIGET_LIMIT = 20  # IDs por requisição em /users?ids=
+
+# Cache de perfis de vendedores
+SELLER_CACHE_TTL_SECONDS = int(os.getenv("ML_SELLER_CACHE_TTL_SECONDS", "43200"))
+SELLER_CACHE_MAX_SIZE = int(os.getenv("ML_SELLER_CACHE_MAX_SIZE", "10000"))
+SELLER_FETCH_CONCURRENCY = int(os.getenv("ML_SELLER_FETCH_CONCURRENCY", "4"))
+
+
+def build_seller_info(seller_data: dict) -> dict:
+    """Extrai apelido e reputação do payload de /users/{id}."""
+    seller_reputation = seller_data.get("seller_reputation") or {}
+    transactions = seller_reputation.get("transactions") or {}
+    return {
+        "nickname": seller_data.get("nickname"),
+        "reputation_level": seller_reputation.get("level_id"),
+        "power_status": seller_reputation.get("power_seller_status"),
+        "transactions_total": transactions.get("total", 0),
+        "transactions": transactions
+    }
+
+
+class SellerCacheService:
+    """Cache dos perfis de vendedores em dois níveis: LRU em memória e tabela ml_sellers.
+
+    Perfis dentro do TTL são servidos do cache; os desconhecidos ou vencidos são
+    buscados em lotes (/users?ids=) com concorrência limitada. Se a busca falhar,
+    o perfil vencido ainda é usado.
+    """
+
+    def __init__(self):
+        # seller_id -> (perfil, fetched_at), do menos para o mais usado
+        self._lru: "OrderedDict[str, Tuple[dict, datetime]]" = OrderedDict()
+
+    def _remember(self, seller_id: str, info: dict, fetched_at: datetime) -> None:
+        self._lru[seller_id] = (info, fetched_at)
+        self._lru.move_to_end(seller_id)
+        while len(self._lru) > SELLER_CACHE_MAX_SIZE:
+            self._lru.popitem(last=False)
+
+    def _is_fresh(self, fetched_at: datetime, now: datetime) -> bool:
+        return now - fetched_at < timedelta(seconds=SELLER_CACHE_TTL_SECONDS)
+
+    def _load_from_db(self, seller_ids: List[str]) -> Dict[str, Tuple[dict, datetime]]:
+        db = SessionLocal()
+        try:
+            rows = db.query(MercadoLivreSeller).filter(MercadoLivreSeller.seller_id.in_(seller_ids)).all()
+            return {
+                row.seller_id: ({
+                    "nickname": row.nickname,
+                    "reputation_level": row.reputation_level,
+                    "power_status": row.power_status,
+                    "transactions_total": row.transactions_total or 0,
+                    "transactions": row.transactions or {}
+                }, row.fetched_at)
+                for row in rows
+            }
+        finally:
+            db.close()
+
+    def _store(self, sellers: Dict[str, dict], fetched_at: datetime) -> None:
+        """Grava os perfis buscados em uma sessão própria."""
+        db = SessionLocal()
+        try:
+            bulk_upsert(
+                db,
+                MercadoLivreSeller,
+                [{"seller_id": seller_id, **info, "fetched_at": fetched_at} for seller_id, info in sellers.items()],
+                conflict_columns=["seller_id"]
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Erro ao gravar perfis de vendedores: {e}")
+        finally:
+            db.close()
+
+    async def _fetch_batch(self, client: httpx.AsyncClient, headers: dict, batch: List[str]) -> Dict[str, dict]:
+        """Busca um lote via multiget; em caso de falha, busca um a um."""
+        try:
+            response = await client.get(f"{ML_API_URL}/users", headers=headers, params={"ids": ",".join(batch)})
+            if response.status_code == 200:
+                sellers = {}
+                for entry in response.json():
+                    body = entry.get("body") if "body" in entry else entry
+                    if entry.get("code", 200) == 200 and body and body.get("id") is not None:
+                        sellers[str(body["id"])] = build_seller_info(body)
+                return sellers
+            logger.warning(f"Multiget de vendedores retornou {response.status_code}; buscando individualmente")
+        except Exception as e:
+            logger.warning(f"Erro no multiget de vendedores: {e}")
+
+        sellers = {}
+        for seller_id in batch:
+            try:
+                response = await client.get(f"{ML_API_URL}/users/{seller_id}", headers=headers)
+                if response.status_code == 200:
+                    sellers[seller_id] = build_seller_info(response.json())
+            except Exception as e:
+                logger.warning(f"Erro ao obter informações do vendedor {seller_id}: {e}")
+        return sellers
+
+    async def get_sellers(
+        self,
+        client: httpx.AsyncClient,
+        headers: dict,
+        seller_ids: Iterable[Any]
+    ) -> Dict[str, dict]:
+        """Retorna os perfis dos vendedores (seller_id -> perfil). Vendedores sem dados ficam de fora."""
+        now = datetime.utcnow()
+        wanted = list(dict.fromkeys(str(seller_id) for seller_id in seller_ids if seller_id))
+        result: Dict[str, dict] = {}
+        stale: Dict[str, dict] = {}
+
+        missing = []
+        for seller_id in wanted:
+            cached = self._lru.get(seller_id)
+            if cached and self._is_fresh(cached[1], now):
+                self._lru.move_to_end(seller_id)
+                result[seller_id] = cached[0]
+            else:
+                missing.append(seller_id)
+
+        if missing:
+            # Leitura e gravação da tabela rodam no threadpool, fora do event loop
+            for seller_id, (info, fetched_at) in (await run_in_threadpool(self._load_from_db, missing)).items():
+                if self._is_fresh(fetched_at, now):
+                    self._remember(seller_id, info, fetched_at)
+                    result[seller_id] = info
+                else:
+                    stale[seller_id] = info
+            missing = [seller_id for seller_id in missing if seller_id not in result]
+
+        if missing:
+            semaphore = asyncio.Semaphore(SELLER_FETCH_CONCURRENCY)
+
+            async def fetch_with_limit(batch: List[str]) -> Dict[str, dict]:
+                async with semaphore:
+                    return await self._fetch_batch(client, headers, batch)
+
+            batches = await asyncio.gather(*(
+                fetch_with_limit(missing[start:start + SELLERS_MULTIGET_LIMIT])
+                for start in range(0, len(missing), SELLERS_MULTIGET_LIMIT)
+            ))
+            fetched = {seller_id: info for batch in batches for seller_id, info in batch.items()}
+            if fetched:
+                await run_in_threadpool(self._store, fetched, now)
+                for seller_id, info in fetched.items():
+                    self._remember(seller_id, info, now)
+                result.update(fetched)
+
+            # Perfil vencido é melhor do que nenhum quando a busca falha
+            for seller_id in missing:
+                if seller_id not in result and seller_id in stale:
+                    result[seller_id] = stale[seller_id]
+
+            logger.info(
+                f"Vendedores: {len(wanted) - len(missing)} do cache, {len(fetched)} buscados no ML"
+            )
+
+        return result
+
+
+# Instância global do cache
+seller_cache = SellerCacheService()
@@ -0,0 +1,101 @@
+import logging
+from datetime import datetime
+from typing import Optional
+from sqlalchemy.orm import Session
+from app.models import SyncCheckpoint
+
+logger = logging.getLogger(__name__)
+
+
+class SyncCheckpointService:
+    """Ponto de retomada das sincronizações longas, por empresa e recurso.
+
+    O checkpoint é gravado na mesma transação de cada página sincronizada, de
+    modo que a posição salva nunca fica à frente dos dados já persistidos.
+    Uma execução que falha ou é interrompida deixa o checkpoint com status
+    diferente de "completed" e a próxima execução continua dele.
+    """
+
+    def start(self, db: Session, company_id: int, resource: str, resume: bool = True) -> SyncCheckpoint:
+        """Inicia uma execução, retomando o checkpoint pendente quando houver.
+
+        Com resume=False, ou se a última execução terminou, o cursor é zerado.
+        """
+        checkpoint = db.query(SyncCheckpoint).filter(
+            SyncCheckpoint.company_id == company_id,
+            SyncCheckpoint.resource == resource
+        ).first()
+
+        now = datetime.utcnow()
+        if checkpoint is None:
+            checkpoint = SyncCheckpoint(company_id=company_id, resource=resource)
+            db.add(checkpoint)
+
+        if resume and checkpoint.status not in (None, "completed") and checkpoint.cursor is not None:
+            logger.info(
+                f"Retomando sincronização de {resource} da empresa {company_id} "
+                f"a partir de {checkpoint.cursor} ({checkpoint.processed_count or 0} já processados)"
+            )
+        else:
+            checkpoint.cursor = None
+            checkpoint.last_processed_id = None
+            checkpoint.processed_count = 0
+            checkpoint.started_at = now
+
+        checkpoint.status = "running"
+        checkpoint.error = None
+        checkpoint.finished_at = None
+        checkpoint.updated_at = now
+        db.commit()
+        db.refresh(checkpoint)
+        return checkpoint
+
+    def is_resuming(self, checkpoint: SyncCheckpoint) -> bool:
+        """Indica se a execução continua de um checkpoint anterior."""
+        return checkpoint.cursor is not None
+
+    def advance(
+        self,
+        checkpoint: SyncCheckpoint,
+        cursor: Optional[dict],
+        last_processed_id: Optional[str] = None,
+        processed: int = 0
+    ) -> None:
+        """Move o cursor. Não faz commit: deve entrar na transação da página."""
+        checkpoint.cursor = cursor
+        if last_processed_id is not None:
+            checkpoint.last_processed_id = str(last_processed_id)
+        checkpoint.processed_count = (checkpoint.processed_count or 0) + processed
+        checkpoint.updated_at = datetime.utcnow()
+
+    def complete(
+        self,
+        db: Session,
+        checkpoint: SyncCheckpoint,
+        high_water_mark: Optional[datetime] = None
+    ) -> None:
+        """Finaliza a execução; a próxima começa do início (ou da marca d'água)."""
+        checkpoint.status = "completed"
+        if high_water_mark is not None:
+            checkpoint.high_water_mark = high_water_mark
+        checkpoint.cursor = None
+        checkpoint.finished_at = datetime.utcnow()
+        checkpoint.updated_at = checkpoint.finished_at
+        db.commit()
+
+    def fail(self, db: Session, checkpoint_id: int, error: str) -> None:
+        """Registra a falha preservando o cursor da última página gravada."""
+        try:
+            db.rollback()
+            db.query(SyncCheckpoint).filter(SyncCheckpoint.id == checkpoint_id).update(
+                {"status": "failed", "error": error[:2000], "updated_at": datetime.utcnow()},
+                synchronize_session=False
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Erro ao registrar falha no checkpoint {checkpoint_id}: {e}")
+
+
+# Instância global do serviço
+sync_checkpoint_service = SyncCheckpointService()
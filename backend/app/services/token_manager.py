@@ -0,0 +1,197 @@
+import asyncio
+import os
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Optional, Dict
+from fastapi import Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.auth import get_current_user
+from app.database import SessionLocal, run_in_session
+from app.models import MercadoLivreIntegration
+from app.services.mercado_livre import mercado_livre_service
+
+logger = logging.getLogger(__name__)
+
+# Renova o token antes de expirar (margem) e revalida o cache periodicamente
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.getenv("ML_TOKEN_REFRESH_MARGIN_SECONDS", "300"))
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv("ML_TOKEN_CACHE_TTL_SECONDS", "60"))
+
+
+class TokenRefreshError(Exception):
+    """Erro ao renovar um token expirado do Mercado Livre."""
+
+
+@dataclass
+class MercadoLivreCredentials:
+    """Credenciais válidas de uma empresa no Mercado Livre."""
+    company_id: int
+    access_token: str
+    user_id: Optional[str]
+    expires_at: datetime
+    cached_at: datetime = field(default_factory=datetime.utcnow)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.access_token}"}
+
+
+class TokenManager:
+    """Cache em memória de tokens por empresa com renovação única (single-flight).
+
+    Requisições simultâneas da mesma empresa aguardam a mesma renovação em vez
+    de disputar o refresh token (que o Mercado Livre invalida após o uso).
+    """
+
+    def __init__(self):
+        self._cache: Dict[int, MercadoLivreCredentials] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    def _is_fresh(self, credentials: MercadoLivreCredentials) -> bool:
+        now = datetime.utcnow()
+        return (
+            credentials.expires_at > now + timedelta(seconds=TOKEN_REFRESH_MARGIN_SECONDS)
+            and credentials.cached_at > now - timedelta(seconds=TOKEN_CACHE_TTL_SECONDS)
+        )
+
+    def _get_lock(self, company_id: int) -> asyncio.Lock:
+        lock = self._locks.get(company_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[company_id] = lock
+        return lock
+
+    def invalidate(self, company_id: int) -> None:
+        """Remove as credenciais da empresa do cache (desconexão, nova autorização)."""
+        self._cache.pop(company_id, None)
+
+    async def get_credentials(
+        self,
+        db: Optional[Session],
+        company_id: int,
+        rejected_token: Optional[str] = None
+    ) -> Optional[MercadoLivreCredentials]:
+        """Obtém credenciais válidas, renovando o token quando próximo da expiração.
+
+        ``rejected_token`` força a renovação quando a API recusou (401) o token
+        informado; se outra requisição já o substituiu, o novo token é reutilizado.
+        Sem ``db``, uma sessão própria é aberta apenas quando o cache não serve.
+
+        Retorna None quando a empresa não tem integração ativa e levanta
+        TokenRefreshError quando o token expirou e não pôde ser renovado.
+        """
+        cached = self._cache.get(company_id)
+        if cached and self._is_fresh(cached) and cached.access_token != rejected_token:
+            return cached
+
+        async with self._get_lock(company_id):
+            # Outra requisição pode ter renovado enquanto aguardávamos
+            cached = self._cache.get(company_id)
+            if cached and self._is_fresh(cached) and cached.access_token != rejected_token:
+                return cached
+
+            credentials = await self._load_or_refresh(db, company_id, rejected_token)
+            if credentials is None:
+                self.invalidate(company_id)
+            else:
+                self._cache[company_id] = credentials
+            return credentials
+
+    async def get_access_token(self, db: Optional[Session], company_id: int) -> Optional[str]:
+        """Atalho que retorna apenas o access token (None se indisponível)."""
+        try:
+            credentials = await self.get_credentials(db, company_id)
+        except TokenRefreshError as e:
+            logger.error(f"Error refreshing token for company {company_id}: {e}")
+            return None
+        return credentials.access_token if credentials else None
+
+    async def _load_or_refresh(
+        self,
+        db: Optional[Session],
+        company_id: int,
+        rejected_token: Optional[str]
+    ) -> Optional[MercadoLivreCredentials]:
+        if db is None:
+            db = SessionLocal()
+            try:
+                return await self._load_or_refresh(db, company_id, rejected_token)
+            finally:
+                await run_in_threadpool(db.close)
+
+        # Consultas e gravações rodam no threadpool para não bloquear o event loop
+        integration = await run_in_session(db, self._load_integration, db, company_id)
+        if not integration:
+            return None
+
+        current = self._to_credentials(integration)
+        refresh_token = integration.refresh_token
+        now = datetime.utcnow()
+        margin = timedelta(seconds=TOKEN_REFRESH_MARGIN_SECONDS)
+        force_refresh = rejected_token is not None and current.access_token == rejected_token
+        if not force_refresh and current.expires_at > now + margin:
+            return current
+
+        if not refresh_token:
+            if current.expires_at > now:
+                return current
+            raise TokenRefreshError("Refresh token indisponível")
+
+        try:
+            token_response = await mercado_livre_service.refresh_access_token(refresh_token)
+            integration = await run_in_session(
+                db, mercado_livre_service.save_integration, db, company_id, token_response
+            )
+            logger.info(f"Token renovado para a empresa {company_id}")
+            return self._to_credentials(integration)
+        except Exception as e:
+            await run_in_session(db, db.rollback)
+            # Renovação proativa falhou, mas o token atual ainda vale
+            if not force_refresh and current.expires_at > now:
+                logger.warning(f"Erro ao renovar token da empresa {company_id}, usando token atual: {e}")
+                return current
+            raise TokenRefreshError(str(e)) from e
+
+    def _load_integration(self, db: Session, company_id: int) -> Optional[MercadoLivreIntegration]:
+        return db.query(MercadoLivreIntegration).filter(
+            MercadoLivreIntegration.company_id == company_id,
+            MercadoLivreIntegration.is_active == True
+        ).first()
+
+    def _to_credentials(self, integration: MercadoLivreIntegration) -> MercadoLivreCredentials:
+        return MercadoLivreCredentials(
+            company_id=integration.company_id,
+            access_token=integration.access_token,
+            user_id=integration.user_id,
+            expires_at=integration.expires_at
+        )
+
+
+# Instância global do gerenciador
+token_manager = TokenManager()
+
+
+async def get_ml_credentials(
+    current_user = Depends(get_current_user)
+) -> MercadoLivreCredentials:
+    """Dependência que fornece credenciais válidas do Mercado Livre da empresa do usuário.
+
+    Com o token em cache nenhuma sessão do banco é aberta.
+    """
+    try:
+        credentials = await token_manager.get_credentials(None, current_user.company_id)
+    except TokenRefreshError as e:
+        logger.error(f"Erro ao renovar token: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Erro ao renovar token de acesso"
+        )
+
+    if not credentials:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Integração com Mercado Livre não encontrada"
+        )
+
+    return credentials
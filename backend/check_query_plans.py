@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""Verifica se as consultas dos routers usam os índices esperados.
+
+Popula o banco (DATABASE_URL) com dados sintéticos dentro de uma transação,
+roda ANALYZE e EXPLAIN em cada consulta e desfaz tudo no final. Retorna
+código 1 se algum plano não usar o índice esperado.
+
+Uso: python check_query_plans.py [--rows 50000] [--companies 20] [--verbose]
+"""
+
+import sys
+import os
+import argparse
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects import postgresql
+from app.database import engine
+from app.models import (
+    CatalogCompetitor, CatalogCompetitorObservation, MercadoLivreAnnouncement,
+    MercadoLivreOrder, ProductAdsData
+)
+from app.services.pagination import keyset_condition
+
+SEED_SQL = [
+    # Anúncios, pedidos e publicidade distribuídos entre as empresas sintéticas
+    """
+    INSERT INTO mercado_livre_announcements (company_id, ml_item_id, title, price, condition, status)
+    SELECT (:company_ids)[g % :companies + 1], 'SEEDA' || g, 'Anúncio ' || g, 100, 'new', 'active'
+    FROM generate_series(1, :rows) g
+    """,
+    """
+    INSERT INTO mercado_livre_orders (company_id, order_id, status, date_created, total_amount, buyer_id, seller_id)
+    SELECT (:company_ids)[g % :companies + 1], 'SEEDO' || g,
+           (ARRAY['paid', 'confirmed', 'cancelled'])[g % 3 + 1],
+           now() - g * interval '10 minutes', 100, 'seed-buyer', 'seed-seller'
+    FROM generate_series(1, :rows) g
+    """,
+    """
+    INSERT INTO product_ads_data (company_id, item_id, period_days, title, price, status)
+    SELECT (:company_ids)[g % :companies + 1], 'SEEDA' || (g / 4), (ARRAY[7, 15, 30, 60])[g % 4 + 1],
+           'Anúncio', 100, 'active'
+    FROM generate_series(1, :rows) g
+    """,
+    # Cerca de 10 concorrentes por produto de catálogo
+    """
+    INSERT INTO catalog_competitors (company_id, catalog_product_id, item_id, title, price, condition, seller_id)
+    SELECT (:company_ids)[1], 'SEEDP' || (g / 10), 'SEEDC' || g, 'Concorrente', 50 + g % 100, 'new', 'seed'
+    FROM generate_series(1, :rows) g
+    """,
+    """
+    INSERT INTO catalog_competitor_observations (catalog_product_id, item_id, observed_at, price)
+    SELECT 'SEEDP' || (g / 50), 'SEEDC' || (g / 5), now() - g * interval '1 minute', 50 + g % 100
+    FROM generate_series(1, :rows) g
+    """,
+]
+
+SEEDED_TABLES = [
+    "mercado_livre_announcements", "mercado_livre_orders", "product_ads_data",
+    "catalog_competitors", "catalog_competitor_observations",
+]
+
+
+def build_checks(company_id: int):
+    """Consultas equivalentes às dos routers e os índices aceitos para cada uma."""
+    now = datetime.utcnow()
+    active_announcements = select(MercadoLivreAnnouncement).where(
+        MercadoLivreAnnouncement.company_id == company_id,
+        MercadoLivreAnnouncement.ml_removed_at.is_(None)
+    )
+    orders = select(MercadoLivreOrder).where(
+        MercadoLivreOrder.company_id == company_id,
+        MercadoLivreOrder.status == "paid",
+        MercadoLivreOrder.date_created >= now - timedelta(days=7),
+        MercadoLivreOrder.date_created <= now
+    )
+    # Mesma ordenação e limite (página + 1) da listagem paginada por cursor
+    orders_page = orders.order_by(
+        MercadoLivreOrder.date_created.desc(), MercadoLivreOrder.id.desc()
+    ).limit(51)
+    return [
+        (
+            "GET /announcements/{id}",
+            select(MercadoLivreAnnouncement).where(
+                MercadoLivreAnnouncement.ml_item_id == f"SEEDA{company_id}",
+                MercadoLivreAnnouncement.company_id == company_id
+            ),
+            {"ix_ml_announcements_company_item", "ix_mercado_livre_announcements_ml_item_id"}
+        ),
+        (
+            "GET /announcements (total)",
+            select(func.count()).select_from(active_announcements.subquery()),
+            {"ix_ml_announcements_company_item"}
+        ),
+        (
+            "GET /orders/db",
+            orders_page,
+            {"ix_ml_orders_company_date_status"}
+        ),
+        (
+            "GET /orders/db (cursor)",
+            orders_page.where(keyset_condition(
+                [MercadoLivreOrder.date_created, MercadoLivreOrder.id],
+                [now - timedelta(days=3), 0], descending=True
+            )),
+            {"ix_ml_orders_company_date_status"}
+        ),
+        (
+            "GET /orders/db (total)",
+            select(func.count()).select_from(orders.subquery()),
+            {"ix_ml_orders_company_date_status"}
+        ),
+        (
+            "GET /orders/{order_id}",
+            select(MercadoLivreOrder).where(
+                MercadoLivreOrder.company_id == company_id,
+                MercadoLivreOrder.order_id == f"SEEDO{company_id}"
+            ),
+            {"uq_ml_orders_company_order"}
+        ),
+        (
+            "GET /product-ads/db/{item_id}",
+            select(ProductAdsData).where(
+                ProductAdsData.company_id == company_id,
+                ProductAdsData.item_id == "SEEDA1",
+                ProductAdsData.period_days == 15
+            ),
+            {"uq_product_ads_company_item_period"}
+        ),
+        (
+            "GET /catalog-competitors/db/{id}",
+            select(CatalogCompetitor).where(
+                CatalogCompetitor.catalog_product_id == "SEEDP1"
+            ).order_by(CatalogCompetitor.price.asc()),
+            {"ix_catalog_competitors_product_price"}
+        ),
+        (
+            "GET /catalog-competitors/db/{id}/history",
+            select(CatalogCompetitorObservation).where(
+                CatalogCompetitorObservation.catalog_product_id == "SEEDP1",
+                CatalogCompetitorObservation.observed_at >= now - timedelta(days=30),
+                CatalogCompetitorObservation.observed_at <= now
+            ).order_by(CatalogCompetitorObservation.item_id, CatalogCompetitorObservation.observed_at),
+            {"ix_catalog_competitor_observations_product_observed"}
+        ),
+    ]
+
+
+def collect_index_names(plan: dict) -> set:
+    """Índices usados em qualquer nó do plano."""
+    names = set()
+    if plan.get("Index Name"):
+        names.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        names |= collect_index_names(child)
+    return names
+
+
+def explain(connection, statement) -> dict:
+    compiled = statement.compile(dialect=postgresql.dialect())
+    result = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params)
+    return result.scalar()[0]["Plan"]
+
+
+def check_query_plans(rows: int, companies: int, verbose: bool = False) -> bool:
+    print(f"Populando {rows} linhas por tabela em {companies} empresas (transação desfeita no final)...")
+    ok = True
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            company_ids = [
+                company_id for (company_id,) in connection.execute(
+                    text(
+                        "INSERT INTO companies (name, cnpj) "
+                        "SELECT 'Empresa ' || g, 'S' || lpad(g::text, 4, '0') || left(md5(random()::text), 13) "
+                        "FROM generate_series(1, :companies) g RETURNING id"
+                    ),
+                    {"companies": companies}
+                )
+            ]
+            params = {"company_ids": company_ids, "companies": companies, "rows": rows}
+            for sql in SEED_SQL:
+                connection.execute(text(sql), params)
+            for table in SEEDED_TABLES:
+                connection.exec_driver_sql(f"ANALYZE {table}")
+
+            for name, statement, expected in build_checks(company_ids[0]):
+                plan = explain(connection, statement)
+                used = collect_index_names(plan)
+                passed = bool(used & expected)
+                ok = ok and passed
+                print(f"{'✅' if passed else '❌'} {name}: {', '.join(sorted(used)) or plan['Node Type']}")
+                if not passed:
+                    print(f"   esperado: {', '.join(sorted(expected))}")
+                if verbose or not passed:
+                    print(f"   {plan['Node Type']} (custo {plan['Total Cost']}, {plan['Plan Rows']} linhas)")
+        finally:
+            transaction.rollback()
+
+    print("Todos os planos usam os índices esperados." if ok else "Há consultas sem o índice esperado.")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000, help="Linhas sintéticas por tabela")
+    parser.add_argument("--companies", type=int, default=20, help="Empresas sintéticas")
+    parser.add_argument("--verbose", action="store_true", help="Mostra o nó principal de todos os planos")
+    args = parser.parse_args()
+    sys.exit(0 if check_query_plans(args.rows, args.companies, args.verbose) else 1)
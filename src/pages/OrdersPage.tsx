@@ -211,7 +211,9 @@ export default function OrdersPage() {
     try {
       const params: any = {
         limit: ordersPerPage,
-        offset: (currentPage - 1) * ordersPerPage
+        offset: (currentPage - 1) * ordersPerPage,
+        // O modal de detalhes usa a linha da listagem
+        include: "order_items,context_flows"
       };
       
       if (statusFilter && statusFilter !== "all") params.status = statusFilter;
@@ -31,6 +31,9 @@ import {
 import { useToast } from "@/hooks/use-toast";
 import { mercadoLivreApi } from "@/services/mercadoLivreApi";
 
+// Campos JSON que a listagem só devolve quando pedidos; usados pelo modal do produto
+const ANNOUNCEMENT_INCLUDE = "attributes,catalog_position_info";
+
 interface MercadoLivreProduct {
   id: string;
   title: string;
@@ -163,11 +166,12 @@ export const ProductsPage = () => {
       if (loadAll) {
         // Carregar todos os produtos para filtros
         const allProducts = [];
-        let currentOffset = 0;
+        let cursor: string | null = null;
         let hasMore = true;
         
         while (hasMore) {
-          const response = await fetch(`${API_BASE_URL}/api/mercado-livre/announcements?limit=100&offset=${currentOffset}`, {
+          const cursorParam = cursor ? `&cursor=${encodeURIComponent(cursor)}` : '';
+          const response = await fetch(`${API_BASE_URL}/api/mercado-livre/announcements?limit=100&include_total=false&include=${ANNOUNCEMENT_INCLUDE}${cursorParam}`, {
             headers: {
               'Authorization': `Bearer ${token}`
             }
@@ -177,11 +181,8 @@ export const ProductsPage = () => {
             const data = await response.json();
             allProducts.push(...(data.products || []));
             
-            if (data.products && data.products.length < 100) {
-              hasMore = false;
-            } else {
-              currentOffset += 100;
-            }
+            cursor = data.next_cursor || null;
+            hasMore = Boolean(cursor);
           } else {
             hasMore = false;
           }
@@ -195,7 +196,7 @@ export const ProductsPage = () => {
         // Carregamento normal com paginação
         const offset = (page - 1) * productsPerPage;
         
-        const response = await fetch(`${API_BASE_URL}/api/mercado-livre/announcements?limit=${productsPerPage}&offset=${offset}`, {
+        const response = await fetch(`${API_BASE_URL}/api/mercado-livre/announcements?limit=${productsPerPage}&offset=${offset}&include=${ANNOUNCEMENT_INCLUDE}`, {
           headers: {
             'Authorization': `Bearer ${token}`
           }
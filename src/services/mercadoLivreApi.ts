@@ -265,6 +265,9 @@ class MercadoLivreApiService {
     date_to?: string;
     limit?: number;
     offset?: number;
+    cursor?: string;
+    include_total?: boolean;
+    include?: string;
   } = {}): Promise<any> {
     const queryParams = new URLSearchParams();
     
@@ -273,6 +276,9 @@ class MercadoLivreApiService {
     if (params.date_to) queryParams.append('date_to', params.date_to);
     if (params.limit) queryParams.append('limit', params.limit.toString());
     if (params.offset) queryParams.append('offset', params.offset.toString());
+    if (params.cursor) queryParams.append('cursor', params.cursor);
+    if (params.include_total === false) queryParams.append('include_total', 'false');
+    if (params.include) queryParams.append('include', params.include);
 
     const queryString = queryParams.toString();
     const url = `/api/mercado-livre/orders/db${queryString ? `?${queryString}` : ''}`;